@@ -1,12 +1,12 @@
 from django.contrib import admin
-from .models import Dispositivo, UsuarioDispositivo, AsistenciaCruda
+from .models import Dispositivo, UsuarioDispositivo, AsistenciaCruda, ArchivoAsistencia, PaqueteADMS
 
 
 @admin.register(Dispositivo)
 class DispositivoAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'ip', 'puerto', 'protocolo', 'ubicacion', 'activo')
-    list_filter = ('protocolo', 'activo', 'ubicacion')
-    search_fields = ('nombre', 'ip', 'ubicacion')
+    list_display = ('nombre', 'ip', 'puerto', 'protocolo', 'ubicacion', 'activo', 'envio_adms')
+    list_filter = ('protocolo', 'activo', 'envio_adms', 'ubicacion')
+    search_fields = ('nombre', 'ip', 'ubicacion', 'numero_serie')
 
 
 @admin.register(UsuarioDispositivo)
@@ -38,6 +38,8 @@ class AsistenciaCrudaAdmin(admin.ModelAdmin):
                 deleted_count, _ = AsistenciaCruda.objects.filter(
                     ts__date__range=[start_date, end_date]
                 ).delete()
+                # Los terminales conservan esos marcajes: la próxima sincronización debe releerlos
+                Dispositivo.objects.update(contador_registros=None)
                 
                 self.message_user(request, 
                                   _(f"Se eliminaron {deleted_count} registros de asistencia entre {start_date} y {end_date}."), 
@@ -52,3 +54,28 @@ class AsistenciaCrudaAdmin(admin.ModelAdmin):
         })
     
     delete_by_date_range.short_description = "Eliminar registros por rango de fechas"
+
+
+@admin.register(ArchivoAsistencia)
+class ArchivoAsistenciaAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'dispositivo', 'filas', 'tamano', 'ruta', 'actualizado_en')
+    list_filter = ('dispositivo',)
+    date_hierarchy = 'mes'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PaqueteADMS)
+class PaqueteADMSAdmin(admin.ModelAdmin):
+    list_display = ('recibido_en', 'dispositivo')
+    list_filter = ('dispositivo',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,174 @@
+"""
+Recepción de marcajes por ADMS (protocolo "iclock" de ZKTeco por HTTP).
+
+Los terminales con envio_adms no se consultan: ellos llaman al servidor.
+- GET  /iclock/cdata?SN=...            arranque: el servidor responde las opciones
+- POST /iclock/cdata?SN=...&table=ATTLOG   marcajes, una línea por registro:
+  PIN \\t AAAA-MM-DD HH:MM:SS \\t estado \\t verificación \\t ...
+- GET  /iclock/getrequest?SN=...       sondeo de órdenes (no se envía ninguna)
+- POST /iclock/devicecmd?SN=...        resultado de órdenes
+
+El terminal se identifica por su número de serie (SN), que debe ser el de un
+Dispositivo activo con envio_adms. Cada envío ATTLOG se guarda tal cual como
+un PaqueteADMS (una sola inserción por petición, así el terminal solo da el
+envío por bueno cuando ya está en la base de datos) y volcar_pendientes(),
+que el scheduler corre cada pocos segundos, los pasa en lote a
+AsistenciaCruda. Como estos terminales no se consultan, sus usuarios se dan
+de alta al llegar: con las líneas "USER PIN=..." de OPERLOG, o al volcar el
+primer marcaje de un PIN desconocido, vinculados al empleado con ese doc_id
+como en la sincronización programada. El resto de OPERLOG y las demás
+tablas (ATTPHOTO...) se aceptan y se descartan.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.utils import timezone
+
+from empleados.models import Empleado
+from zkmanager import metricas
+
+from . import captura
+from .models import Dispositivo, PaqueteADMS, UsuarioDispositivo
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500          # paquetes por volcado
+RETRASO = 10        # segundos entre envíos que pedimos al terminal
+RETRASO_ERROR = 30  # y tras un error
+
+
+def dispositivo(sn: str) -> Dispositivo | None:
+    if not sn:
+        return None
+    return Dispositivo.objects.filter(numero_serie=sn, activo=True, envio_adms=True).first()
+
+
+def opciones(d: Dispositivo) -> str:
+    """
+    Respuesta al arranque: enviar marcajes en tiempo real (Realtime=1) con la
+    hora local. Con ATTLOGStamp=0 el terminal envía también lo que tenga
+    pendiente; lo ya guardado o archivado se descarta al volcar.
+    """
+    desfase = timezone.localtime().utcoffset()
+    horas = int(desfase.total_seconds() // 3600) if desfase else 0
+    return "\n".join([
+        f"GET OPTION FROM: {d.numero_serie}",
+        "ATTLOGStamp=0",
+        "OPERLOGStamp=9999",
+        "ATTPHOTOStamp=None",
+        f"ErrorDelay={RETRASO_ERROR}",
+        f"Delay={RETRASO}",
+        "TransTimes=00:00;14:05",
+        "TransInterval=1",
+        "TransFlag=TransData AttLog",
+        f"TimeZone={horas}",
+        "Realtime=1",
+        "Encrypt=None",
+    ]) + "\n"
+
+
+def encolar(d: Dispositivo, cuerpo: str) -> int:
+    """Guarda un envío ATTLOG. Devuelve las líneas recibidas (el terminal espera 'OK: n')."""
+    lineas = sum(1 for linea in cuerpo.splitlines() if linea.strip())
+    if lineas:
+        PaqueteADMS.objects.create(dispositivo=d, cuerpo=cuerpo)
+        metricas.inc("zk_adms_registros_recibidos_total", lineas, dispositivo=d.nombre)
+    return lineas
+
+
+def _nuevos_usuarios(dispositivo_id: int, datos: Dict[str, dict]) -> List[UsuarioDispositivo]:
+    """UsuarioDispositivo sin guardar para los user_id de `datos` que el dispositivo aún no tiene."""
+    existentes = set(
+        UsuarioDispositivo.objects.filter(dispositivo_id=dispositivo_id, user_id__in=list(datos))
+        .values_list("user_id", flat=True)
+    )
+    faltan = [u for u in datos if u not in existentes]
+    if not faltan:
+        return []
+    empleados = dict(Empleado.objects.filter(doc_id__in=faltan, activo=True).values_list("doc_id", "pk"))
+    out = []
+    for user_id in faltan:
+        ud = UsuarioDispositivo(
+            dispositivo_id=dispositivo_id, user_id=user_id, empleado_id=empleados.get(user_id), **datos[user_id],
+        )
+        ud.busqueda = ud.texto_busqueda()
+        out.append(ud)
+    return out
+
+
+def usuarios(d: Dispositivo, cuerpo: str) -> int:
+    """Altas y cambios de nombre/privilegio de las líneas 'USER PIN=...' de OPERLOG. Devuelve las líneas USER."""
+    datos: Dict[str, dict] = {}
+    for linea in cuerpo.splitlines():
+        if not linea.startswith("USER "):
+            continue
+        campos = dict(p.split("=", 1) for p in linea[5:].strip().split("\t") if "=" in p)
+        pin = campos.get("PIN", "").strip()[:32]
+        if pin:
+            priv = campos.get("Pri", "").strip()
+            datos[pin] = {"nombre": campos.get("Name", "").strip()[:64], "privilegio": int(priv) if priv.isdigit() else None}
+    if not datos:
+        return 0
+    UsuarioDispositivo.objects.bulk_create(_nuevos_usuarios(d.pk, datos), ignore_conflicts=True)
+    cambiados = []
+    for ud in UsuarioDispositivo.objects.filter(dispositivo=d, user_id__in=list(datos)):
+        valores = datos[ud.user_id]
+        if any(getattr(ud, k) != v for k, v in valores.items()):
+            for k, v in valores.items():
+                setattr(ud, k, v)
+            ud.busqueda = ud.texto_busqueda()
+            cambiados.append(ud)
+    UsuarioDispositivo.objects.bulk_update(cambiados, ["nombre", "privilegio", "busqueda"])
+    return len(datos)
+
+
+def _alta_desconocidos(lista: Iterable[captura.Evento]):
+    por_dispositivo: Dict[int, Dict[str, dict]] = {}
+    for ev in lista:
+        por_dispositivo.setdefault(ev.dispositivo_id, {})[ev.user_id] = {}
+    nuevos = [ud for dispositivo_id, datos in por_dispositivo.items() for ud in _nuevos_usuarios(dispositivo_id, datos)]
+    UsuarioDispositivo.objects.bulk_create(nuevos, ignore_conflicts=True)
+
+
+def eventos(dispositivo_id: int, cuerpo: str) -> List[captura.Evento]:
+    """
+    Líneas ATTLOG como eventos. El estado (entrada/salida) es el `punch` de
+    pyzk y el modo de verificación su `status`, como en la descarga por TCP,
+    para que la restricción de marcaje único coincida con ambos caminos.
+    """
+    tz = timezone.get_current_timezone()
+    out = []
+    for linea in cuerpo.splitlines():
+        campos = linea.strip().split("\t")
+        if not campos[0]:
+            continue
+        try:
+            ts = timezone.make_aware(datetime.strptime(campos[1].strip(), "%Y-%m-%d %H:%M:%S"), tz)
+            punch = int(campos[2]) if len(campos) > 2 and campos[2].strip() else 0
+            status = int(campos[3]) if len(campos) > 3 and campos[3].strip() else 0
+        except (IndexError, ValueError):
+            logger.warning("Línea ATTLOG inválida del dispositivo %s: %r", dispositivo_id, linea)
+            continue
+        out.append(captura.Evento(dispositivo_id, campos[0].strip(), ts, status, punch, None))
+    return out
+
+
+def volcar_pendientes(lote: int = LOTE) -> int:
+    """Pasa los paquetes pendientes a AsistenciaCruda, `lote` paquetes por transacción. Devuelve los insertados."""
+    insertados = 0
+    while True:
+        paquetes = list(PaqueteADMS.objects.order_by("pk").values_list("pk", "dispositivo_id", "cuerpo")[:lote])
+        if not paquetes:
+            return insertados
+        lista = [ev for _, dispositivo_id, cuerpo in paquetes for ev in eventos(dispositivo_id, cuerpo)]
+        with transaction.atomic():
+            if lista:
+                _alta_desconocidos(lista)
+                insertados += captura.volcar(lista, metrica="zk_adms_insertados_total")
+            PaqueteADMS.objects.filter(pk__in=[pk for pk, _, _ in paquetes]).delete()
+        if len(paquetes) < lote:
+            return insertados
@@ -0,0 +1,228 @@
+"""
+Archivo histórico de AsistenciaCruda.
+
+Los marcajes más antiguos que ASISTENCIA_RETENCION_MESES se mueven a un archivo
+por mes y dispositivo, de modo que la tabla de trabajo se mantenga pequeña.
+
+Formato: JSON por columnas comprimido con xz (`AAAA/AAAA-MM_dispN.json.xz`).
+Cada columna es una lista; `ts` y `creado_en` se guardan como microsegundos
+UTC y `ts` además en diferencias sucesivas (las filas van ordenadas por `ts`),
+lo que comprime muy bien. Solo usa la librería estándar.
+
+La lectura (`marcajes`, `resumen_diario`) es transparente para los reportes por
+trabajador: sólo se abren los archivos de los meses del rango pedido.
+"""
+from __future__ import annotations
+
+import json
+import lzma
+import os
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from .models import ArchivoAsistencia, AsistenciaCruda
+
+FORMATO = 1
+COLUMNAS = ("user_id", "uid", "usuario_id", "ts", "status", "punch", "raw_status", "creado_en")
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_US = timedelta(microseconds=1)
+
+
+def _directorio() -> Path:
+    return Path(settings.ASISTENCIA_ARCHIVO_DIR)
+
+
+def _mes_siguiente(mes: date) -> date:
+    return date(mes.year + 1, 1, 1) if mes.month == 12 else date(mes.year, mes.month + 1, 1)
+
+
+def _inicio(d: date) -> datetime:
+    return make_aware(datetime(d.year, d.month, d.day))
+
+
+def ruta_relativa(dispositivo_id: int, mes: date) -> str:
+    return f"{mes:%Y}/{mes:%Y-%m}_disp{dispositivo_id}.json.xz"
+
+
+# --------------------------------------------------------------------------------------
+# Codificación
+# --------------------------------------------------------------------------------------
+def _a_us(dt: datetime | None) -> int | None:
+    return None if dt is None else (dt - _EPOCA) // _US
+
+
+def _de_us(v: int | None) -> datetime | None:
+    return None if v is None else _EPOCA + timedelta(microseconds=v)
+
+
+def _codificar(filas: List[tuple]) -> bytes:
+    """`filas`: tuplas en el orden de COLUMNAS, ordenadas por ts."""
+    columnas = {c: list(v) for c, v in zip(COLUMNAS, zip(*filas))} if filas else {c: [] for c in COLUMNAS}
+    ts = [_a_us(t) for t in columnas["ts"]]
+    columnas["ts"] = [b - a for a, b in zip([0] + ts, ts)]
+    columnas["creado_en"] = [_a_us(t) for t in columnas["creado_en"]]
+    doc = {"formato": FORMATO, "filas": len(filas), "columnas": columnas}
+    return lzma.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+
+
+def _decodificar(data: bytes) -> Dict[str, list]:
+    doc = json.loads(lzma.decompress(data))
+    if doc.get("formato") != FORMATO:
+        raise ValueError(f"Formato de archivo de asistencia no soportado: {doc.get('formato')}")
+    columnas = doc["columnas"]
+    acumulado, ts = 0, []
+    for delta in columnas["ts"]:
+        acumulado += delta
+        ts.append(_de_us(acumulado))
+    columnas["ts"] = ts
+    columnas["creado_en"] = [_de_us(v) for v in columnas["creado_en"]]
+    return columnas
+
+
+@lru_cache(maxsize=32)
+def _leer_cacheado(ruta: str, mtime_ns: int) -> Dict[str, list]:
+    return _decodificar(Path(ruta).read_bytes())
+
+
+def leer(ruta: str) -> Dict[str, list]:
+    """Columnas de un archivo (ruta relativa). Se cachea mientras no cambie en disco."""
+    absoluta = _directorio() / ruta
+    return _leer_cacheado(str(absoluta), absoluta.stat().st_mtime_ns)
+
+
+def _filas(columnas: Dict[str, list]) -> List[tuple]:
+    return list(zip(*(columnas[c] for c in COLUMNAS)))
+
+
+def _escribir(ruta: str, filas: List[tuple]) -> int:
+    """Escritura atómica (archivo temporal + replace). Devuelve el tamaño en bytes."""
+    destino = _directorio() / ruta
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_suffix(destino.suffix + ".tmp")
+    data = _codificar(filas)
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, destino)
+    return len(data)
+
+
+# --------------------------------------------------------------------------------------
+# Archivado
+# --------------------------------------------------------------------------------------
+def corte_retencion(meses: int) -> date:
+    """Primer día del mes a partir del cual los marcajes se quedan en la tabla."""
+    hoy = timezone.localdate()
+    total = hoy.year * 12 + (hoy.month - 1) - meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def meses_pendientes(corte: date, dispositivo_id: int | None = None) -> List[Tuple[int, date]]:
+    """Pares (dispositivo_id, mes) con marcajes anteriores a `corte`."""
+    qs = AsistenciaCruda.objects.filter(ts__lt=_inicio(corte))
+    if dispositivo_id:
+        qs = qs.filter(dispositivo_id=dispositivo_id)
+    pares = (
+        qs.annotate(mes=TruncMonth("ts"))
+        .values_list("dispositivo_id", "mes")
+        .distinct()
+    )
+    return sorted({(did, timezone.localtime(mes).date()) for did, mes in pares})
+
+
+def archivar_mes(dispositivo_id: int, mes: date, simular: bool = False) -> int:
+    """
+    Mueve al archivo los marcajes del mes y dispositivo. Devuelve cuántos salen
+    de la tabla. Si el mes ya tenía archivo, se fusiona sin duplicar (misma clave
+    que uq_marcaje_unico). Las filas solo se borran después de escribir y
+    verificar el archivo.
+    """
+    inicio, fin = _inicio(mes), _inicio(_mes_siguiente(mes))
+    qs = AsistenciaCruda.objects.filter(dispositivo_id=dispositivo_id, ts__gte=inicio, ts__lt=fin)
+    nuevas = list(qs.order_by("ts").values_list("id", *COLUMNAS))
+    if not nuevas or simular:
+        return len(nuevas)
+
+    ruta = ruta_relativa(dispositivo_id, mes)
+    previo = ArchivoAsistencia.objects.filter(dispositivo_id=dispositivo_id, mes=mes).first()
+    por_clave: Dict[tuple, tuple] = {}
+    if previo:
+        for f in _filas(leer(previo.ruta)):
+            por_clave[(f[0], f[3], f[4])] = f
+    for f in nuevas:
+        por_clave.setdefault((f[1], f[4], f[5]), f[1:])
+    filas = sorted(por_clave.values(), key=lambda f: f[3])
+
+    tamano = _escribir(ruta, filas)
+    if len(leer(ruta)["ts"]) != len(filas):
+        raise RuntimeError(f"Verificación fallida del archivo {ruta}")
+
+    ids = [f[0] for f in nuevas]
+    with transaction.atomic():
+        ArchivoAsistencia.objects.update_or_create(
+            dispositivo_id=dispositivo_id, mes=mes,
+            defaults={"ruta": ruta, "filas": len(filas), "tamano": tamano},
+        )
+        for i in range(0, len(ids), 5000):
+            # el rango de ts permite a PostgreSQL limitar el borrado a la partición del mes
+            qs.filter(id__in=ids[i:i + 5000]).delete()
+    return len(ids)
+
+
+def limite_archivado(dispositivo_id: int) -> datetime | None:
+    """
+    Inicio del mes siguiente al último archivado. Los marcajes anteriores ya
+    están en el archivo y la sincronización no debe volver a insertarlos.
+    """
+    ultimo = ArchivoAsistencia.objects.filter(dispositivo_id=dispositivo_id).aggregate(m=Max("mes"))["m"]
+    return _inicio(_mes_siguiente(ultimo)) if ultimo else None
+
+
+# --------------------------------------------------------------------------------------
+# Lectura
+# --------------------------------------------------------------------------------------
+def marcajes(d1: date, d2: date, dispositivo_ids=None) -> Iterator[Tuple[int, str, int | None, datetime]]:
+    """(dispositivo_id, user_id, usuario_id, ts) archivados entre los días locales d1 y d2."""
+    archivos = ArchivoAsistencia.objects.filter(mes__gte=d1.replace(day=1), mes__lte=d2)
+    if dispositivo_ids is not None:
+        archivos = archivos.filter(dispositivo_id__in=dispositivo_ids)
+    inicio, fin = _inicio(d1), _inicio(d2 + timedelta(days=1))
+    for did, ruta in archivos.values_list("dispositivo_id", "ruta"):
+        col = leer(ruta)
+        ts = col["ts"]
+        a, b = bisect_left(ts, inicio), bisect_left(ts, fin)
+        for i in range(a, b):
+            yield did, col["user_id"][i], col["usuario_id"][i], ts[i]
+
+
+def resumen_diario(
+    d1: date,
+    d2: date,
+    coincide: Callable[[int, str, int | None], bool],
+    dispositivo_ids=None,
+) -> Dict[date, list]:
+    """{fecha_local: [min_ts, max_ts, n]} de los marcajes archivados que cumplen `coincide`."""
+    out: Dict[date, list] = {}
+    for did, uid, usuario_id, ts in marcajes(d1, d2, dispositivo_ids):
+        if not coincide(did, uid, usuario_id):
+            continue
+        fecha = timezone.localtime(ts).date()
+        dia = out.get(fecha)
+        if dia is None:
+            out[fecha] = [ts, ts, 1]
+        else:
+            dia[0] = min(dia[0], ts)
+            dia[1] = max(dia[1], ts)
+            dia[2] += 1
+    return out
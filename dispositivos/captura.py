@@ -0,0 +1,280 @@
+"""
+Captura de marcajes en tiempo real.
+
+Cada dispositivo activo (salvo los que envían por ADMS) tiene un hilo con una sesión live_capture de pyzk
+abierta: el terminal envía cada marcaje en cuanto se registra y el hilo lo
+deja en una cola. El hilo principal vuelca la cola en AsistenciaCruda cada
+`intervalo` segundos con un solo bulk_create por dispositivo.
+
+Mientras no hay sesión abierta (arranque, corte de red, terminal apagado)
+los marcajes se quedan en el terminal. Por eso, antes de cada sesión, el
+hilo hace la descarga incremental de la sincronización programada (solo se
+insertan los marcajes que faltan) y después vuelve a la captura. Los
+reintentos de conexión esperan cada vez el doble, hasta RETRASO_MAX, con un
+poco de azar para que los terminales no reconecten todos a la vez.
+
+Las descargas de recuperación usan la base de datos desde el hilo del
+dispositivo; como mucho DB_POOL_SCHEDULER a la vez (el pool de este proceso
+tiene una conexión más, para el volcado). Los dispositivos activos
+se vuelven a leer cada RELECTURA segundos: se abren sesiones para los nuevos
+y se cierran las de los desactivados.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from zkmanager import metricas
+
+from . import archivo
+from .models import AsistenciaCruda, Dispositivo, UsuarioDispositivo
+
+logger = logging.getLogger(__name__)
+
+INTERVALO = 5          # segundos entre volcados a la base de datos
+ESPERA_EVENTO = 10     # timeout de lectura de live_capture; también marca cuánto tarda en parar
+RETRASO_MIN = 2
+RETRASO_MAX = 300
+RELECTURA = 60
+
+
+@dataclass(frozen=True)
+class Evento:
+    dispositivo_id: int
+    user_id: str
+    ts: datetime         # con zona
+    status: int
+    punch: int
+    uid: int | None
+
+
+class CapturaDispositivo(threading.Thread):
+    """Sesión live_capture de un dispositivo, con reconexión y recuperación de huecos."""
+
+    def __init__(self, dispositivo: Dispositivo, cola: queue.Queue, descargas: threading.Semaphore):
+        super().__init__(name=f"captura-{dispositivo.nombre}", daemon=True)
+        self.dispositivo = dispositivo
+        self.cola = cola
+        self.descargas = descargas
+        self.parada = threading.Event()
+        self.conectado = False
+        self._conn = None
+        self._hueco = True   # al arrancar no se sabe qué se perdió
+
+    def detener(self):
+        self.parada.set()
+        conn = self._conn
+        if conn is not None:
+            # live_capture lo comprueba tras cada evento o timeout y cierra la sesión ordenadamente
+            conn.end_live_capture = True
+
+    def run(self):
+        retraso = RETRASO_MIN
+        while not self.parada.is_set():
+            try:
+                if self._hueco:
+                    self._recuperar()
+                self._capturar()
+                retraso = RETRASO_MIN
+            except Exception as e:
+                self._hueco = True
+                logger.warning("Captura de %s interrumpida: %s", self.dispositivo.nombre, e)
+                metricas.inc("zk_captura_reconexiones_total", dispositivo=self.dispositivo.nombre)
+                self.parada.wait(retraso * random.uniform(0.8, 1.2))
+                retraso = min(retraso * 2, RETRASO_MAX)
+            finally:
+                self._fijar_conectado(False)
+
+    def _conectar(self):
+        from .views import _conn_with_fallbacks
+
+        conn, _ = _conn_with_fallbacks(self.dispositivo)
+        return conn
+
+    def _recuperar(self):
+        """Descarga incremental de lo que el terminal guardó sin sesión abierta."""
+        from .management.commands.sync_biometricos import Command as SyncCommand
+
+        with self.descargas:
+            if self.parada.is_set():
+                return
+            inicio = time.perf_counter()
+            try:
+                conn = self._conectar()
+                # Desconecta al terminar
+                SyncCommand(stdout=io.StringIO())._sincronizar_usuarios_y_registros(conn, self.dispositivo)
+            finally:
+                # Con CONN_MAX_AGE la conexión quedaría abierta en este hilo; el pool del proceso
+                # solo cuenta con DB_POOL_SCHEDULER descargas a la vez
+                connection.close()
+            logger.info("Recuperado el hueco de %s en %.1f s", self.dispositivo.nombre, time.perf_counter() - inicio)
+            metricas.inc("zk_captura_recuperaciones_total", dispositivo=self.dispositivo.nombre)
+            self._hueco = False
+
+    def _capturar(self):
+        conn = self._conectar()
+        self._conn = conn
+        try:
+            if self.parada.is_set():
+                return
+            self._fijar_conectado(True)
+            logger.info("Captura en vivo de %s iniciada", self.dispositivo.nombre)
+            tz = timezone.get_current_timezone()
+            for att in conn.live_capture(new_timeout=ESPERA_EVENTO):
+                if att is None or not att.user_id or not att.timestamp:
+                    continue   # timeout sin eventos, o evento incompleto
+                ts = att.timestamp
+                if timezone.is_naive(ts):
+                    ts = timezone.make_aware(ts, tz)
+                self.cola.put(Evento(self.dispositivo.pk, str(att.user_id), ts, att.status, att.punch, att.uid))
+                metricas.inc("zk_captura_eventos_total", dispositivo=self.dispositivo.nombre)
+        finally:
+            self._conn = None
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+        if not self.parada.is_set():
+            # Sin detener(), live_capture solo termina si se corta la sesión
+            raise ConnectionError("la sesión de captura terminó")
+
+    def _fijar_conectado(self, valor: bool):
+        self.conectado = valor
+        metricas.fijar("zk_captura_conectado", 1 if valor else 0, dispositivo=self.dispositivo.nombre)
+
+
+def volcar(eventos: List[Evento], metrica: str = "zk_captura_insertados_total") -> int:
+    """
+    Guarda los eventos (una consulta por dispositivo para los ya existentes),
+    salvo los anteriores al límite de archivado del dispositivo. Devuelve los insertados, que se suman también al contador `metrica`.
+    """
+    por_dispositivo: Dict[int, List[Evento]] = {}
+    for ev in eventos:
+        por_dispositivo.setdefault(ev.dispositivo_id, []).append(ev)
+
+    nombres = dict(Dispositivo.objects.filter(pk__in=list(por_dispositivo)).values_list("pk", "nombre"))
+    insertados = 0
+    for dispositivo_id, lista in por_dispositivo.items():
+        # Como en la sincronización: lo anterior al último mes archivado ya está en el archivo
+        limite = archivo.limite_archivado(dispositivo_id)
+        if limite is not None:
+            lista = [ev for ev in lista if ev.ts >= limite]
+            if not lista:
+                continue
+        user_ids = {ev.user_id for ev in lista}
+        usuarios = dict(
+            UsuarioDispositivo.objects.filter(dispositivo_id=dispositivo_id, user_id__in=user_ids)
+            .values_list("user_id", "pk")
+        )
+        rango = [min(ev.ts for ev in lista), max(ev.ts for ev in lista)]
+        existentes = AsistenciaCruda.objects.filter(dispositivo_id=dispositivo_id, user_id__in=user_ids, ts__range=rango)
+        vistos = set(existentes.values_list("user_id", "ts", "status"))
+        antes = len(vistos)
+        nuevos = []
+        for ev in lista:
+            clave = (ev.user_id, ev.ts, ev.status)
+            if clave in vistos:
+                continue
+            vistos.add(clave)
+            nuevos.append(AsistenciaCruda(
+                dispositivo_id=dispositivo_id, usuario_id=usuarios.get(ev.user_id), user_id=ev.user_id,
+                uid=ev.uid, ts=ev.ts, status=ev.status, punch=ev.punch,
+            ))
+        n = 0
+        if nuevos:
+            AsistenciaCruda.objects.bulk_create(nuevos, ignore_conflicts=True)
+            # ignore_conflicts no dice cuántas entraron (otro proceso pudo insertar las mismas)
+            n = existentes.count() - antes
+            insertados += n
+        nombre = nombres.get(dispositivo_id, str(dispositivo_id))
+        metricas.inc(metrica, n, dispositivo=nombre)
+        metricas.fijar("zk_ingesta_ultimo_marcaje_timestamp", rango[1].timestamp(), dispositivo=nombre)
+    return insertados
+
+
+class Servicio:
+    """Una CapturaDispositivo por dispositivo activo y el volcado periódico de sus eventos."""
+
+    def __init__(self, intervalo: float = INTERVALO, nombres: List[str] | None = None):
+        self.intervalo = intervalo
+        self.nombres = nombres or []
+        self.cola: queue.Queue = queue.Queue()
+        self.capturas: Dict[int, CapturaDispositivo] = {}
+        self.parada = threading.Event()
+        self._descargas = threading.Semaphore(max(1, settings.DB_POOL_SCHEDULER))
+
+    def _activos(self) -> Dict[int, Dispositivo]:
+        qs = Dispositivo.objects.filter(activo=True, envio_adms=False)
+        if self.nombres:
+            qs = qs.filter(nombre__in=self.nombres)
+        return {d.pk: d for d in qs}
+
+    def actualizar(self):
+        """Abre capturas para los dispositivos activos nuevos o modificados y cierra las sobrantes."""
+        activos = self._activos()
+        for pk, captura in list(self.capturas.items()):
+            d = activos.get(pk)
+            if d is None or (d.ip, d.puerto, d.protocolo, d.password) != (
+                captura.dispositivo.ip, captura.dispositivo.puerto,
+                captura.dispositivo.protocolo, captura.dispositivo.password,
+            ):
+                captura.detener()
+                del self.capturas[pk]
+        for pk, d in activos.items():
+            if pk not in self.capturas:
+                self.capturas[pk] = CapturaDispositivo(d, self.cola, self._descargas)
+                self.capturas[pk].start()
+
+    def volcar(self) -> int:
+        eventos = []
+        while True:
+            try:
+                eventos.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+        if not eventos:
+            return 0
+        try:
+            return volcar(eventos)
+        except Exception:
+            # Se reintentan en el siguiente volcado
+            logger.exception("No se pudieron guardar %s marcajes capturados", len(eventos))
+            for ev in eventos:
+                self.cola.put(ev)
+            close_old_connections()
+            return 0
+
+    def ejecutar(self):
+        """Bucle principal hasta detener() (o Ctrl+C)."""
+        self.actualizar()
+        ultima_lectura = time.monotonic()
+        try:
+            while not self.parada.wait(self.intervalo):
+                self.volcar()
+                if time.monotonic() - ultima_lectura >= RELECTURA:
+                    self.actualizar()
+                    ultima_lectura = time.monotonic()
+                metricas.guardar()
+        finally:
+            self.detener()
+
+    def detener(self):
+        self.parada.set()
+        for captura in self.capturas.values():
+            captura.detener()
+        for captura in self.capturas.values():
+            captura.join(ESPERA_EVENTO + 5)
+        self.capturas.clear()
+        self.volcar()
+        metricas.guardar()
@@ -1,4 +1,5 @@
 from django import forms
+from . import transferencia
 from .models import Dispositivo
 
 class DispositivoForm(forms.ModelForm):
@@ -9,7 +10,8 @@ class DispositivoForm(forms.ModelForm):
         model = Dispositivo
         fields = [
             'nombre','ip','puerto','protocolo','password','timeout',
-            'omitir_ping','max_size_tcp','max_size_udp','tz','ubicacion','activo'
+            'omitir_ping','max_size_tcp','max_size_udp','tz','ubicacion','activo',
+            'numero_serie','envio_adms'
         ]
 
     def clean_puerto(self):
@@ -18,8 +20,35 @@ class DispositivoForm(forms.ModelForm):
             raise forms.ValidationError("Puerto inválido")
         return p
 
+    def clean_max_size_tcp(self):
+        return self._tamano_bloque('max_size_tcp', transferencia.MAX_TCP)
+
+    def clean_max_size_udp(self):
+        return self._tamano_bloque('max_size_udp', transferencia.MAX_UDP)
+
+    def _tamano_bloque(self, campo, maximo):
+        v = self.cleaned_data[campo]
+        if not (transferencia.BLOQUE_MIN <= v <= maximo):
+            raise forms.ValidationError(f"Entre {transferencia.BLOQUE_MIN} y {maximo} bytes")
+        return v
+
     def clean_timeout(self):
         t = self.cleaned_data['timeout']
         if t == 0 or t > 60:
             raise forms.ValidationError("Timeout entre 1 y 60 segundos")
         return t
+
+    def save(self, commit=True):
+        # Otro equipo en esa dirección: sus contadores no son comparables con los guardados
+        if {'ip', 'puerto'} & set(self.changed_data):
+            self.instance.contador_usuarios = self.instance.contador_registros = None
+        # Y el tamaño de bloque aprendido depende del enlace y del transporte
+        if {'ip', 'puerto', 'protocolo', 'max_size_tcp', 'max_size_udp'} & set(self.changed_data):
+            self.instance.bloque_transferencia = None
+        return super().save(commit)
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get('envio_adms') and not datos.get('numero_serie'):
+            self.add_error('numero_serie', "Indique el número de serie del equipo para recibir sus envíos ADMS")
+        return datos
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dispositivos import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los marcajes más antiguos que N meses a archivos comprimidos por mes y dispositivo "
+        "(ASISTENCIA_ARCHIVO_DIR). Los reportes por trabajador siguen leyéndolos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=settings.ASISTENCIA_RETENCION_MESES,
+            help="Meses completos que se conservan en la tabla, además del actual (por defecto ASISTENCIA_RETENCION_MESES).",
+        )
+        parser.add_argument('--dispositivo', type=int, help="Archivar solo este dispositivo (id).")
+        parser.add_argument('--dry-run', action='store_true', help="Solo muestra lo que se archivaría.")
+
+    def handle(self, *args, **options):
+        corte = archivo.corte_retencion(options['meses'])
+        pendientes = archivo.meses_pendientes(corte, options['dispositivo'])
+        if not pendientes:
+            self.stdout.write(f"No hay marcajes anteriores a {corte:%Y-%m-%d} para archivar.")
+            return
+
+        simular = options['dry_run']
+        total = 0
+        for did, mes in pendientes:
+            n = archivo.archivar_mes(did, mes, simular=simular)
+            total += n
+            self.stdout.write(f"  {mes:%Y-%m} · dispositivo {did}: {n} marcajes")
+
+        accion = "se archivarían" if simular else "archivados"
+        self.stdout.write(self.style.SUCCESS(f"Total: {total} marcajes {accion} (anteriores a {corte:%Y-%m-%d})."))
@@ -0,0 +1,39 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dispositivos import captura
+from dispositivos.models import Dispositivo
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Servicio de captura de marcajes en tiempo real: mantiene una sesión live_capture con cada "
+        "dispositivo activo y guarda los marcajes cada pocos segundos. Tras un corte recupera lo "
+        "perdido con la descarga incremental. Ver dispositivos/captura.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=captura.INTERVALO,
+                            help=f"Segundos entre escrituras en la base de datos (por defecto {captura.INTERVALO}).")
+        parser.add_argument('--dispositivo', action='append', default=[],
+                            help="Solo este dispositivo, por nombre (repetible; por defecto todos los activos).")
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError("--intervalo debe ser mayor que cero.")
+        nombres = options['dispositivo']
+        if nombres:
+            faltan = set(nombres) - set(Dispositivo.objects.filter(nombre__in=nombres).values_list('nombre', flat=True))
+            if faltan:
+                raise CommandError(f"Dispositivos desconocidos: {', '.join(sorted(faltan))}.")
+
+        servicio = captura.Servicio(intervalo=options['intervalo'], nombres=nombres)
+        self.stdout.write(self.style.SUCCESS("Captura en vivo iniciada. Presiona Ctrl+C para salir."))
+        try:
+            servicio.ejecutar()
+        except KeyboardInterrupt:
+            logger.info("Deteniendo captura en vivo...")
+        self.stdout.write(self.style.SUCCESS("Captura en vivo detenida."))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from dispositivos import sintetico
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos a escala (dispositivos, empleados, marcajes con dobles marcajes, "
+        "salidas ausentes, turnos de noche y bajas) para medir reportes. Ver dispositivos/sintetico.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dispositivos', type=int, default=3, help="Dispositivos a crear (por defecto 3).")
+        parser.add_argument('--empleados', type=int, default=300, help="Empleados a crear (por defecto 300).")
+        parser.add_argument('--anios', type=float, default=1.0, help="Años de marcajes hacia atrás (por defecto 1).")
+        parser.add_argument('--hasta', help="Último día con marcajes, YYYY-MM-DD (por defecto hoy).")
+        parser.add_argument('--semilla', type=int, default=42, help="Semilla aleatoria (por defecto 42).")
+        parser.add_argument('--limpiar', action='store_true', help="Borra antes los datos sintéticos existentes.")
+        parser.add_argument('--solo-limpiar', action='store_true', help="Solo borra los datos sintéticos.")
+
+    def handle(self, *args, **options):
+        if options['limpiar'] or options['solo_limpiar']:
+            borrados = sintetico.limpiar()
+            self.stdout.write("Borrados: " + ", ".join(f"{v} {k}" for k, v in borrados.items()))
+            if options['solo_limpiar']:
+                return
+
+        if options['dispositivos'] < 1 or options['empleados'] < 1 or options['anios'] <= 0:
+            raise CommandError("Dispositivos, empleados y años deben ser mayores que cero.")
+        hasta = None
+        if options['hasta']:
+            hasta = parse_date(options['hasta'])
+            if hasta is None:
+                raise CommandError("Fecha --hasta inválida (YYYY-MM-DD).")
+
+        try:
+            total = sintetico.generar(
+                options['dispositivos'], options['empleados'], options['anios'],
+                hasta=hasta, semilla=options['semilla'],
+                progreso=lambda n: self.stdout.write(f"  {n} marcajes..."),
+            )
+        except ValueError as e:
+            raise CommandError(f"{e} Use --limpiar.")
+        self.stdout.write(self.style.SUCCESS(
+            "Creados: " + ", ".join(f"{v} {k}" for k, v in total.items())
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from dispositivos import particiones
+
+
+class Command(BaseCommand):
+    help = "Crea por adelantado las particiones mensuales de AsistenciaCruda (PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3, help="Meses futuros a crear además del actual (por defecto 3).")
+        parser.add_argument('--listar', action='store_true', help="Solo lista las particiones existentes.")
+
+    def handle(self, *args, **options):
+        if not particiones.soportado(connection):
+            self.stdout.write(self.style.WARNING("El particionado solo aplica a PostgreSQL. Nada que hacer."))
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not particiones.esta_particionada(cursor):
+                raise CommandError("La tabla de asistencias no está particionada. Ejecute 'migrate' primero.")
+
+            if options['listar']:
+                for nombre in particiones.particiones_existentes(cursor):
+                    self.stdout.write(nombre)
+                return
+
+            creadas = particiones.asegurar_particiones(cursor, options['meses'])
+
+        if creadas:
+            self.stdout.write(self.style.SUCCESS(f"Particiones creadas: {', '.join(creadas)}"))
+        else:
+            self.stdout.write("Las particiones ya existían.")
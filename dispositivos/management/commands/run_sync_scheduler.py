@@ -1,6 +1,8 @@
 import logging
 from django.conf import settings
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from django_apscheduler.jobstores import DjangoJobStore
@@ -8,20 +10,47 @@ from django_apscheduler.models import DjangoJobExecution
 from django_apscheduler import util
 from django.utils import timezone
 
+from dispositivos import adms
+from zkmanager import conexiones, metricas
+
 logger = logging.getLogger(__name__)
 
 # Import the logic we already have
 from dispositivos.management.commands.sync_biometricos import Command as SyncCommand
 
+@util.close_old_connections
 def sync_biometricos_job():
     """
     Este es el 'job' que ejecuta APScheduler. Llama directamente al handle del comando 'sync_biometricos'.
+    El decorador aplica CONN_MAX_AGE y la comprobación de salud a la conexión persistente del hilo.
     """
     try:
         cmd = SyncCommand()
         cmd.handle()
     except Exception as e:
         logger.error(f"Error corriendo el trabajo programado de sincronización: {e}")
+    logger.info("Conexiones BD del scheduler: %s", conexiones.estadisticas())
+
+@util.close_old_connections
+def volcar_adms_job():
+    """
+    Pasa a AsistenciaCruda los envíos ADMS recibidos por la web (ver dispositivos/adms.py).
+    """
+    try:
+        adms.volcar_pendientes()
+    except Exception as e:
+        logger.error(f"Error volcando envíos ADMS: {e}")
+    metricas.guardar()
+
+@util.close_old_connections
+def particiones_asistencia_job():
+    """
+    Mantiene creadas por adelantado las particiones mensuales de asistencias (solo PostgreSQL).
+    """
+    try:
+        call_command("particiones_asistencia")
+    except Exception as e:
+        logger.error(f"Error creando particiones de asistencia: {e}")
 
 @util.close_old_connections
 def delete_old_job_executions(max_age=604_800):
@@ -35,20 +64,35 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         # Usamos Use_TZ timezone para apscheduler
-        scheduler = BlockingScheduler(timezone=settings.TIME_ZONE)
+        # Un hilo por conexión: DB_POOL_SCHEDULER limita las conexiones del scheduler
+        scheduler = BlockingScheduler(
+            timezone=settings.TIME_ZONE,
+            executors={"default": ThreadPoolExecutor(settings.DB_POOL_SCHEDULER)},
+        )
         scheduler.add_jobstore(DjangoJobStore(), "default")
 
-        # Configurar la tarea principal: ejecutar cada 1 hora.
-        # Puedes cambiar 'hours=1' por 'minutes=60' o usar CronTrigger
+        # Configurar la tarea principal: cada SYNC_INTERVALO_MINUTOS (60 por defecto).
+        # Con captura_en_vivo en marcha es solo la red de seguridad y puede espaciarse.
         scheduler.add_job(
             sync_biometricos_job,
-            trigger=IntervalTrigger(hours=1),
+            trigger=IntervalTrigger(minutes=settings.SYNC_INTERVALO_MINUTOS),
             id="sync_biometricos_cada_hora",
             max_instances=1,
             replace_existing=True,
         )
         logger.info("Añadido el trabajo 'sync_biometricos_cada_hora' al scheduler.")
 
+        # Envíos ADMS: los terminales ya los mandan en tiempo real, se guardan cada pocos segundos
+        scheduler.add_job(
+            volcar_adms_job,
+            trigger=IntervalTrigger(seconds=settings.ADMS_VOLCADO_SEGUNDOS),
+            id="volcar_adms",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True,
+        )
+        logger.info("Añadida tarea 'volcar_adms'.")
+
         # Configurar la tarea de limpieza: cada lunes a la medianoche (opcional, buena limpieza)
         scheduler.add_job(
             delete_old_job_executions,
@@ -59,6 +103,16 @@ class Command(BaseCommand):
         )
         logger.info("Añadida tarea de limpieza 'delete_old_job_executions'.")
 
+        # Particiones mensuales de asistencias: se revisan a diario (la operación es idempotente)
+        scheduler.add_job(
+            particiones_asistencia_job,
+            trigger=IntervalTrigger(days=1),
+            id="particiones_asistencia",
+            max_instances=1,
+            replace_existing=True,
+        )
+        logger.info("Añadida tarea 'particiones_asistencia'.")
+
         try:
             logger.info("Iniciando scheduler...")
             self.stdout.write(self.style.SUCCESS("Scheduler iniciado. Presiona Ctrl+C para salir."))
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from dispositivos import sintetico
+from dispositivos.models import Dispositivo
+from dispositivos.simulador import FALLOS_AUTH, Config, Simulador
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta terminales ZKTeco simulados (TCP y UDP) con usuarios y marcajes sintéticos para "
+        "probar la sincronización sin hardware. Ejemplo con 50 terminales: "
+        "simular_terminales --terminales 50 --registrar, y en otra consola sync_biometricos. "
+        "Ver dispositivos/simulador.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terminales', type=int, default=1, help="Terminales a simular (por defecto 1).")
+        parser.add_argument('--host', default='127.0.0.1', help="Dirección de escucha (por defecto 127.0.0.1).")
+        parser.add_argument('--puerto', type=int, default=4370,
+                            help="Puerto del primer terminal; el terminal i usa puerto+i (por defecto 4370).")
+        parser.add_argument('--usuarios', type=int, default=300, help="Usuarios por terminal (por defecto 300).")
+        parser.add_argument('--registros', type=int, default=20000, help="Marcajes por terminal (por defecto 20000).")
+        parser.add_argument('--latencia', type=float, default=0.0, help="Retardo por respuesta en ms (por defecto 0).")
+        parser.add_argument('--perdida', type=float, default=0.0,
+                            help="Probabilidad 0-1 de no responder a un comando (por defecto 0).")
+        parser.add_argument('--perdida-datos', type=float, default=0.0,
+                            help="Probabilidad 0-1 de perder cada datagrama UDP de datos de una descarga (por defecto 0).")
+        parser.add_argument('--password', default='', help="Clave de comunicación numérica (por defecto ninguna).")
+        parser.add_argument('--fallo-auth', choices=FALLOS_AUTH, default='unauth',
+                            help="Respuesta a una clave incorrecta (por defecto unauth).")
+        parser.add_argument('--protocolo', choices=['tcp', 'udp', 'ambos'], default='ambos',
+                            help="Transporte a escuchar (por defecto ambos).")
+        parser.add_argument('--hasta', help="Último día con marcajes, YYYY-MM-DD (por defecto hoy).")
+        parser.add_argument('--semilla', type=int, default=42, help="Semilla del primer terminal (por defecto 42).")
+        parser.add_argument('--eventos', type=float, default=0.0,
+                            help="Marcajes nuevos por minuto y terminal, enviados a las sesiones live_capture (por defecto 0).")
+        parser.add_argument('--registrar', action='store_true',
+                            help=f"Crea o activa un Dispositivo {sintetico.PREFIJO}-SIM-nn por terminal.")
+
+    def handle(self, *args, **options):
+        if options['terminales'] < 1 or options['usuarios'] < 0 or options['registros'] < 0:
+            raise CommandError("Terminales debe ser mayor que cero; usuarios y registros, no negativos.")
+        if options['eventos'] < 0:
+            raise CommandError("--eventos no puede ser negativo.")
+        if not 0 <= options['perdida'] < 1:
+            raise CommandError("--perdida debe estar entre 0 y 1.")
+        if not 0 <= options['perdida_datos'] < 1:
+            raise CommandError("--perdida-datos debe estar entre 0 y 1.")
+        if options['password'] and not options['password'].isdigit():
+            raise CommandError("--password debe ser numérica (clave de comunicación del terminal).")
+        hasta = None
+        if options['hasta']:
+            hasta = parse_date(options['hasta'])
+            if hasta is None:
+                raise CommandError("Fecha --hasta inválida (YYYY-MM-DD).")
+
+        protocolos = ('tcp', 'udp') if options['protocolo'] == 'ambos' else (options['protocolo'],)
+        simuladores = []
+        try:
+            for i in range(options['terminales']):
+                nombre = f"{sintetico.PREFIJO}-SIM-{i + 1:02d}"
+                puerto = options['puerto'] + i
+                config = Config(
+                    usuarios=options['usuarios'], registros=options['registros'],
+                    latencia_ms=options['latencia'], perdida=options['perdida'], perdida_datos=options['perdida_datos'],
+                    password=options['password'], fallo_auth=options['fallo_auth'],
+                    semilla=options['semilla'] + i, hasta=hasta, eventos_por_minuto=options['eventos'],
+                )
+                try:
+                    simuladores.append(Simulador(nombre, options['host'], puerto, config, protocolos).iniciar())
+                except OSError as e:
+                    raise CommandError(f"No se pudo escuchar en {options['host']}:{puerto}: {e}")
+                if options['registrar']:
+                    Dispositivo.objects.update_or_create(
+                        ip=options['host'], puerto=puerto,
+                        defaults={
+                            'nombre': nombre, 'protocolo': protocolos[0], 'password': options['password'],
+                            'omitir_ping': True, 'activo': True, 'ubicacion': "Simulador",
+                        },
+                    )
+                self.stdout.write(
+                    f"  {nombre} en {options['host']}:{puerto}/{'+'.join(protocolos)}: "
+                    f"{len(simuladores[-1].terminal.usuarios)} usuarios, "
+                    f"{len(simuladores[-1].terminal.marcajes)} marcajes"
+                )
+
+            self.stdout.write(self.style.SUCCESS(f"{len(simuladores)} terminales simulados. Ctrl+C para terminar."))
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for s in simuladores:
+                s.detener()
@@ -1,19 +1,27 @@
 import logging
+import time
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from dispositivos import archivo, transferencia
 from dispositivos.models import Dispositivo
 from dispositivos.views import _conn_with_fallbacks, descargar_usuarios, descargar_asistencia
 from zk import ZK
 from django.db import transaction
+from zkmanager import metricas
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Sincroniza usuarios y registros de asistencia para todos los dispositivos activos.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--completa', action='store_true',
+                            help="Descarga usuarios y marcajes aunque los contadores del terminal no hayan cambiado.")
+
     def handle(self, *args, **options):
         self.stdout.write("Iniciando tarea de sincronización automática de biométricos...")
-        dispositivos_activos = Dispositivo.objects.filter(activo=True)
+        # Los que envían por ADMS no se consultan (ver dispositivos/adms.py)
+        dispositivos_activos = Dispositivo.objects.filter(activo=True, envio_adms=False)
 
         if not dispositivos_activos.exists():
             self.stdout.write(self.style.WARNING("No hay dispositivos activos configurados."))
@@ -24,19 +32,26 @@ class Command(BaseCommand):
 
         for dispositivo in dispositivos_activos:
             self.stdout.write(f"--- Procesando dispositivo: {dispositivo.nombre} ({dispositivo.ip}) ---")
+            inicio, resultado = time.perf_counter(), "error"
             
             try:
                 # 1. Probar la conexión primero
-                conn, pwd_usada = _conn_with_fallbacks(dispositivo)
+                try:
+                    conn, pwd_usada = _conn_with_fallbacks(dispositivo)
+                except Exception as e:
+                    logger.warning("No se pudo conectar con %s: %s", dispositivo.nombre, e)
+                    conn = None
                 if not conn:
                     self.stdout.write(self.style.ERROR(f"Error de conexión con {dispositivo.nombre}. Saltando."))
+                    metricas.inc("zk_sync_fallos_conexion_total", dispositivo=dispositivo.nombre)
+                    resultado = "sin_conexion"
                     total_errores += 1
                     continue
                 
                 # 2. Descargar Usuarios (Opcional, pero recomendado para mantener consistencia)
                 # Al ser un script de fondo, replicaremos parte de la lógica de views.py aquí
                 # para no depender de objetos 'request' simulados.
-                self._sincronizar_usuarios_y_registros(conn, dispositivo)
+                self._sincronizar_usuarios_y_registros(conn, dispositivo, completa=options.get('completa', False))
                 
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f"Error inesperado procesando {dispositivo.nombre}: {e}"))
@@ -45,132 +60,216 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.SUCCESS(f"Sincronización completa para {dispositivo.nombre}."))
                 total_descargados += 1
+                resultado = "ok"
+                metricas.fijar("zk_sync_ultimo_ok_timestamp", time.time(), dispositivo=dispositivo.nombre)
+            finally:
+                metricas.observar("zk_sync_duracion_segundos", time.perf_counter() - inicio, dispositivo=dispositivo.nombre)
+                metricas.inc("zk_sync_total", dispositivo=dispositivo.nombre, resultado=resultado)
 
+        # El scheduler corre aparte del servidor web: se publican las métricas ya
+        metricas.guardar()
         self.stdout.write("===============================================")
         self.stdout.write(self.style.SUCCESS(f"Resumen: {total_descargados} dispositivos exitosos, {total_errores} con errores."))
 
-    def _sincronizar_usuarios_y_registros(self, conn, dispositivo):
+    def _sincronizar_usuarios_y_registros(self, conn, dispositivo, completa=False):
         """
         Extrae la lógica de comunicación con ZK para sincronizar 
         usuarios y sus registros de asistencia.
+
+        Primero lee los contadores del terminal (una petición pequeña): la lista
+        de usuarios o el registro de asistencia solo se descargan si su número
+        cambió desde la última sincronización, salvo con `completa`.
+
+        Dos fases: la captura (terminal deshabilitado solo mientras se
+        transfieren usuarios y marcajes a memoria) y el procesado en la base de
+        datos, con el terminal ya habilitado y desconectado. El tiempo
+        bloqueado se registra en zk_sync_bloqueo_segundos.
         """
-        from dispositivos.models import UsuarioDispositivo, AsistenciaCruda
-        from empleados.models import Empleado
-        from pyzk.zk import const
-        
         try:
-            # Deshabilitar dispositivo temporalmente mientras leemos
+            usuarios_dev = registros_dev = None
+            try:
+                conn.read_sizes()
+                usuarios_dev, registros_dev = conn.users, conn.records
+            except Exception as e:
+                logger.warning("No se pudieron leer los contadores de %s: %s", dispositivo.nombre, e)
+            leer_usuarios = completa or usuarios_dev is None or usuarios_dev != dispositivo.contador_usuarios
+            leer_registros = completa or registros_dev is None or registros_dev != dispositivo.contador_registros
+
+            zk_users = registros = None
+            if leer_usuarios or leer_registros:
+                zk_users, registros = self._capturar(conn, dispositivo, leer_usuarios, leer_registros)
+        finally:
             try:
-                conn.disable_device()
+                conn.disconnect()
             except Exception:
                 pass
-                
-            # 1. Usuarios
-            self.stdout.write("    Descargando usuarios...")
-            zk_users = conn.get_users()
-            nuevos = 0
-            actualizados = 0
-            
-            # Formateadores (similares a views.py)
-            def _to_int(v): return int(v) if str(v).isdigit() else None
-            def _to_str(v, mx=32): return str(v or "")[:mx]
-
-            for u in zk_users:
-                # pyzk normalmente devuelve objetos con atributos definidos o dicts
-                # Algunos pyzk tienen u.uid, u.user_id, etc.
-                uid_val = getattr(u, "uid", None) or u.get("uid") if isinstance(u, dict) else _to_int(getattr(u, "uid", ""))
-                user_id_val = getattr(u, "user_id", None) or u.get("user_id") if isinstance(u, dict) else _to_str(getattr(u, "user_id", ""))
-                
-                if not user_id_val: 
-                    continue
-                    
-                nombre_val = getattr(u, "name", None) or u.get("name") if isinstance(u, dict) else getattr(u, "name", "")
-                priv_val = getattr(u, "privilege", None) or u.get("privilege") if isinstance(u, dict) else _to_int(getattr(u, "privilege", 0))
 
-                ud, created = UsuarioDispositivo.objects.get_or_create(
-                    dispositivo=dispositivo,
-                    user_id=str(user_id_val),
-                    defaults={
-                        'uid': uid_val,
-                        'nombre': str(nombre_val or "")[:64],
-                        'privilegio': priv_val,
-                    }
-                )
-                if created:
-                    nuevos += 1
-                    # Auto-vincular si existe un Empleado con ese doc_id o numero que coincida en user_id
-                    emp = Empleado.objects.filter(doc_id=user_id_val, activo=True).first()
-                    if emp:
-                        ud.empleado = emp
-                        ud.save()
-                else:
-                    actualizados += 1
-            
-            self.stdout.write(f"    Usuarios: {nuevos} nuevos, {actualizados} actualizados/existentes.")
+        # Procesado, sin bloquear el terminal
+        campos = ['ultimo_descarga']
+        if leer_usuarios:
+            self._guardar_usuarios(zk_users, dispositivo)
+            # Se guarda el contador leído antes de descargar: si algo cambió
+            # entretanto, la próxima vez no coincidirá y se vuelve a leer
+            dispositivo.contador_usuarios = usuarios_dev
+            campos.append('contador_usuarios')
+        else:
+            self.stdout.write("    Usuarios sin cambios en el dispositivo; no se descargan.")
+            metricas.inc("zk_sync_omitidos_total", dispositivo=dispositivo.nombre, parte="usuarios")
+        if leer_registros:
+            self._guardar_registros(registros, dispositivo)
+            dispositivo.contador_registros = registros_dev
+            campos.append('contador_registros')
+        else:
+            self.stdout.write("    Marcajes sin cambios en el dispositivo; no se descargan.")
+            metricas.inc("zk_sync_omitidos_total", dispositivo=dispositivo.nombre, parte="registros")
 
-            # 2. Asistencia
-            self.stdout.write("    Descargando registros de asistencia...")
-            try:
-                registros = conn.get_attendance()
-            except Exception as e:
-                # Algunos terminales (ej: MA04) no devuelven listas clásicas o fallan en empty
-                if "No attendances" in str(e):
-                    registros = []
-                else:
-                    raise e
-                    
-            marcajes_nuevos = 0
-            
-            # Bulk create list
-            asist_to_create = []
-            existentes_query = set(AsistenciaCruda.objects.filter(dispositivo=dispositivo).values_list('user_id', 'ts', 'status'))
-            
-            for att in registros:
-                # att es un objeto de pyzk Attendance
-                att_uid = str(getattr(att, "user_id", ""))
-                att_ts = getattr(att, "timestamp", None)
-                att_status = getattr(att, "status", 0)
-                att_punch = getattr(att, "punch", 0)
-                
-                if not att_uid or not att_ts:
-                    continue
-                    
-                # Convertir a timezone aware para guardar en DB
-                if timezone.is_naive(att_ts):
-                    att_ts = timezone.make_aware(att_ts, timezone.get_current_timezone())
-                    
-                key_eval = (att_uid, att_ts, att_status)
-                if key_eval not in existentes_query:
-                    # Encontrar el UD asociado
-                    ud_asoc = UsuarioDispositivo.objects.filter(dispositivo=dispositivo, user_id=att_uid).first()
-                    
-                    asist_to_create.append(AsistenciaCruda(
-                        dispositivo=dispositivo,
-                        usuario=ud_asoc,
-                        user_id=att_uid,
-                        ts=att_ts,
-                        status=att_status,
-                        punch=att_punch,
-                    ))
-                    existentes_query.add(key_eval)
-                    
-            if asist_to_create:
-                # Hacer bulk create ignorando conflictos por si acaso
-                AsistenciaCruda.objects.bulk_create(asist_to_create, ignore_conflicts=True)
-                marcajes_nuevos = len(asist_to_create)
-
-            # Actualizar dispositivo
-            dispositivo.ultimo_descarga = timezone.now()
-            dispositivo.save(update_fields=['ultimo_descarga'])
-            
-            self.stdout.write(f"    Marcajes: {marcajes_nuevos} registros integrados en la base de datos.")
+        # Actualizar dispositivo
+        dispositivo.ultimo_descarga = timezone.now()
+        dispositivo.save(update_fields=campos)
 
+    def _capturar(self, conn, dispositivo, leer_usuarios, leer_registros):
+        """Transferencia en crudo con el terminal deshabilitado. Devuelve (usuarios, marcajes); None si no se leyeron."""
+        zk_users = registros = None
+        # Deshabilitar dispositivo temporalmente mientras leemos
+        try:
+            conn.disable_device()
+        except Exception:
+            pass
+        inicio = time.perf_counter()
+        try:
+            if leer_usuarios:
+                self.stdout.write("    Descargando usuarios...")
+                zk_users = conn.get_users()
+            if leer_registros:
+                self.stdout.write("    Descargando registros de asistencia...")
+                try:
+                    registros = conn.get_attendance()
+                except Exception as e:
+                    # Algunos terminales (ej: MA04) no devuelven listas clásicas o fallan en empty
+                    if "No attendances" in str(e):
+                        registros = []
+                    else:
+                        raise e
         finally:
             try:
                 conn.enable_device()
             except Exception:
                 pass
-            try:
-                conn.disconnect()
-            except Exception:
-                pass
+            bloqueo = time.perf_counter() - inicio
+            metricas.observar("zk_sync_bloqueo_segundos", bloqueo, dispositivo=dispositivo.nombre)
+        self.stdout.write(f"    Terminal bloqueado {bloqueo:.2f} s.")
+        transferencia.guardar(conn, dispositivo)
+        return zk_users, registros
+
+    def _guardar_usuarios(self, zk_users, dispositivo):
+        from dispositivos.models import UsuarioDispositivo
+        from empleados.models import Empleado
+
+        # 1. Usuarios
+        nuevos = 0
+        actualizados = 0
+        
+        # Formateadores (similares a views.py)
+        def _to_int(v): return int(v) if str(v).isdigit() else None
+        def _to_str(v, mx=32): return str(v or "")[:mx]
+
+        # Los ya guardados se cargan una vez; los nuevos se insertan juntos al final
+        existentes = set(UsuarioDispositivo.objects.filter(dispositivo=dispositivo).values_list('user_id', flat=True))
+        nuevos_ud = {}
+        for u in zk_users:
+            # pyzk normalmente devuelve objetos con atributos definidos o dicts
+            # Algunos pyzk tienen u.uid, u.user_id, etc.
+            uid_val = getattr(u, "uid", None) or u.get("uid") if isinstance(u, dict) else _to_int(getattr(u, "uid", ""))
+            user_id_val = getattr(u, "user_id", None) or u.get("user_id") if isinstance(u, dict) else _to_str(getattr(u, "user_id", ""))
+            
+            if not user_id_val: 
+                continue
+                
+            nombre_val = getattr(u, "name", None) or u.get("name") if isinstance(u, dict) else getattr(u, "name", "")
+            priv_val = getattr(u, "privilege", None) or u.get("privilege") if isinstance(u, dict) else _to_int(getattr(u, "privilege", 0))
+
+            if str(user_id_val) in existentes or str(user_id_val) in nuevos_ud:
+                actualizados += 1
+                continue
+            nuevos_ud[str(user_id_val)] = UsuarioDispositivo(
+                dispositivo=dispositivo,
+                user_id=str(user_id_val),
+                uid=uid_val,
+                nombre=str(nombre_val or "")[:64],
+                privilegio=priv_val,
+            )
+
+        if nuevos_ud:
+            # Auto-vincular si existe un Empleado con ese doc_id o numero que coincida en user_id
+            empleados = dict(
+                Empleado.objects.filter(doc_id__in=list(nuevos_ud), activo=True).values_list('doc_id', 'pk')
+            )
+            for ud in nuevos_ud.values():
+                ud.empleado_id = empleados.get(ud.user_id)
+                ud.busqueda = ud.texto_busqueda()
+            UsuarioDispositivo.objects.bulk_create(nuevos_ud.values(), batch_size=1000)
+            nuevos = len(nuevos_ud)
+        
+        self.stdout.write(f"    Usuarios: {nuevos} nuevos, {actualizados} actualizados/existentes.")
+        metricas.inc("zk_sync_usuarios_leidos_total", len(zk_users), dispositivo=dispositivo.nombre)
+
+    def _guardar_registros(self, registros, dispositivo):
+        from dispositivos.models import UsuarioDispositivo, AsistenciaCruda
+
+        # 2. Asistencia
+        marcajes_nuevos = 0
+        ultimo_marcaje = None
+        
+        # Bulk create list
+        asist_to_create = []
+        existentes_query = set(AsistenciaCruda.objects.filter(dispositivo=dispositivo).values_list('user_id', 'ts', 'status'))
+        mapa_usuarios = {
+            ud.user_id: ud for ud in UsuarioDispositivo.objects.filter(dispositivo=dispositivo)
+        }
+        # Lo anterior al último mes archivado ya está en el archivo histórico
+        limite = archivo.limite_archivado(dispositivo.pk)
+        
+        for att in registros:
+            # att es un objeto de pyzk Attendance
+            att_uid = str(getattr(att, "user_id", ""))
+            att_ts = getattr(att, "timestamp", None)
+            att_status = getattr(att, "status", 0)
+            att_punch = getattr(att, "punch", 0)
+            
+            if not att_uid or not att_ts:
+                continue
+                
+            # Convertir a timezone aware para guardar en DB
+            if timezone.is_naive(att_ts):
+                att_ts = timezone.make_aware(att_ts, timezone.get_current_timezone())
+            if ultimo_marcaje is None or att_ts > ultimo_marcaje:
+                ultimo_marcaje = att_ts
+                
+            if limite and att_ts < limite:
+                continue
+
+            key_eval = (att_uid, att_ts, att_status)
+            if key_eval not in existentes_query:
+                # Encontrar el UD asociado
+                ud_asoc = mapa_usuarios.get(att_uid)
+                
+                asist_to_create.append(AsistenciaCruda(
+                    dispositivo=dispositivo,
+                    usuario=ud_asoc,
+                    user_id=att_uid,
+                    ts=att_ts,
+                    status=att_status,
+                    punch=att_punch,
+                ))
+                existentes_query.add(key_eval)
+                
+        if asist_to_create:
+            # Hacer bulk create ignorando conflictos por si acaso
+            AsistenciaCruda.objects.bulk_create(asist_to_create, ignore_conflicts=True)
+            marcajes_nuevos = len(asist_to_create)
+
+        self.stdout.write(f"    Marcajes: {marcajes_nuevos} registros integrados en la base de datos.")
+        metricas.inc("zk_sync_registros_leidos_total", len(registros), dispositivo=dispositivo.nombre)
+        metricas.inc("zk_sync_registros_insertados_total", marcajes_nuevos, dispositivo=dispositivo.nombre)
+        if ultimo_marcaje:
+            metricas.fijar("zk_ingesta_ultimo_marcaje_timestamp", ultimo_marcaje.timestamp(), dispositivo=dispositivo.nombre)
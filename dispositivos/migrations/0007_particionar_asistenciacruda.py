@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from dispositivos import particiones
+
+
+def particionar(apps, schema_editor):
+    if particiones.soportado(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            particiones.particionar_tabla(cursor)
+
+
+def desparticionar(apps, schema_editor):
+    if particiones.soportado(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            particiones.desparticionar_tabla(cursor)
+
+
+class Migration(migrations.Migration):
+    """
+    Convierte dispositivos_asistenciacruda en una tabla particionada por mes
+    (PostgreSQL). Copia todas las filas dentro de la transacción de la
+    migración; en SQLite no hace nada. El estado de Django no cambia.
+    """
+
+    dependencies = [
+        ('dispositivos', '0006_usuariodispositivo_empleado'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0007_particionar_asistenciacruda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoAsistencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes archivado')),
+                ('ruta', models.CharField(help_text='Relativa a ASISTENCIA_ARCHIVO_DIR', max_length=255)),
+                ('filas', models.PositiveIntegerField(default=0)),
+                ('tamano', models.PositiveIntegerField(default=0, help_text='Bytes del archivo comprimido')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('dispositivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='dispositivos.dispositivo')),
+            ],
+            options={
+                'ordering': ['-mes', 'dispositivo'],
+                'constraints': [models.UniqueConstraint(fields=('dispositivo', 'mes'), name='uq_archivo_dispositivo_mes')],
+            },
+        ),
+    ]
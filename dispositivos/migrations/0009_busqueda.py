@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:35
+
+from django.db import migrations, models
+
+from empleados.busqueda import crear_indice_trigram, eliminar_indice_trigram, rellenar
+
+
+def poblar_busqueda(apps, schema_editor):
+    rellenar(apps.get_model("dispositivos", "usuariodispositivo"), ('user_id', 'nombre'))
+    crear_indice_trigram(schema_editor, "dispositivos_usuariodispositivo", "usuariodispositivo_busqueda_trgm")
+
+
+def quitar_indices(apps, schema_editor):
+    eliminar_indice_trigram(schema_editor, "usuariodispositivo_busqueda_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0008_archivoasistencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuariodispositivo',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(poblar_busqueda, quitar_indices),
+    ]
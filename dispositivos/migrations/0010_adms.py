@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0009_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaqueteADMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuerpo', models.TextField()),
+                ('recibido_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dispositivo',
+            name='envio_adms',
+            field=models.BooleanField(default=False, help_text='Envía los marcajes por ADMS: no se consulta por TCP/UDP ni se captura en vivo'),
+        ),
+        migrations.AddField(
+            model_name='dispositivo',
+            name='numero_serie',
+            field=models.CharField(blank=True, default='', help_text='SN del equipo; identifica sus envíos ADMS', max_length=32),
+        ),
+        migrations.AddConstraint(
+            model_name='dispositivo',
+            constraint=models.UniqueConstraint(condition=models.Q(('numero_serie', ''), _negated=True), fields=('numero_serie',), name='uq_dispositivo_numero_serie'),
+        ),
+        migrations.AddField(
+            model_name='paqueteadms',
+            name='dispositivo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paquetes_adms', to='dispositivos.dispositivo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0010_adms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispositivo',
+            name='contador_registros',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='dispositivo',
+            name='contador_usuarios',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+def maximos_por_defecto(apps, schema_editor):
+    # 1024 era el valor por defecto y nada lo usaba; como límite de bloque haría las descargas lentísimas
+    Dispositivo = apps.get_model("dispositivos", "Dispositivo")
+    Dispositivo.objects.filter(max_size_tcp=1024).update(max_size_tcp=0xFFC0)
+    Dispositivo.objects.filter(max_size_udp=1024).update(max_size_udp=16 * 1024)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispositivos', '0011_contadores_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispositivo',
+            name='bloque_transferencia',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Tamaño de bloque con mejor rendimiento en la última descarga', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dispositivo',
+            name='max_size_tcp',
+            field=models.PositiveIntegerField(default=65472),
+        ),
+        migrations.AlterField(
+            model_name='dispositivo',
+            name='max_size_udp',
+            field=models.PositiveIntegerField(default=16384),
+        ),
+        migrations.RunPython(maximos_por_defecto, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from empleados.busqueda import ConBusqueda
+
 
 class Dispositivo(models.Model):
     PROTOCOLOS = [('tcp', 'TCP'), ('udp', 'UDP')]
@@ -10,24 +12,40 @@ class Dispositivo(models.Model):
     password = models.CharField(max_length=64, blank=True)
     timeout = models.PositiveIntegerField(default=5)
     omitir_ping = models.BooleanField(default=False)
-    max_size_tcp = models.PositiveIntegerField(default=1024)
-    max_size_udp = models.PositiveIntegerField(default=1024)
+    # Tamaño máximo de bloque (bytes) en las descargas; el usado se ajusta solo (dispositivos/transferencia.py)
+    max_size_tcp = models.PositiveIntegerField(default=0xFFC0)
+    max_size_udp = models.PositiveIntegerField(default=16 * 1024)
+    bloque_transferencia = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, help_text="Tamaño de bloque con mejor rendimiento en la última descarga"
+    )
     tz = models.CharField(max_length=50, default='Africa/Malabo')
     ubicacion = models.CharField(max_length=120, blank=True)
     activo = models.BooleanField(default=True)
     ultimo_descarga = models.DateTimeField(null=True, blank=True)
+    # Contadores del terminal (read_sizes) en la última sincronización completa de cada parte:
+    # si no cambian, sync_biometricos no vuelve a descargar esa parte
+    contador_usuarios = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    contador_registros = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Terminales que envían por HTTP (ADMS / iclock, ver dispositivos/adms.py)
+    numero_serie = models.CharField(max_length=32, blank=True, default="", help_text="SN del equipo; identifica sus envíos ADMS")
+    envio_adms = models.BooleanField(
+        default=False, help_text="Envía los marcajes por ADMS: no se consulta por TCP/UDP ni se captura en vivo"
+    )
 
     class Meta:
         ordering = ['nombre']
         constraints = [
-            models.UniqueConstraint(fields=['ip', 'puerto'], name='uq_ip_puerto')
+            models.UniqueConstraint(fields=['ip', 'puerto'], name='uq_ip_puerto'),
+            models.UniqueConstraint(
+                fields=['numero_serie'], condition=~models.Q(numero_serie=""), name='uq_dispositivo_numero_serie'
+            ),
         ]
 
     def __str__(self):
         return f"{self.nombre} ({self.ip}:{self.puerto}/{self.protocolo})"
 
 
-class UsuarioDispositivo(models.Model):
+class UsuarioDispositivo(ConBusqueda, models.Model):
     dispositivo = models.ForeignKey(Dispositivo, on_delete=models.CASCADE, related_name='usuarios')
     uid = models.PositiveIntegerField(null=True, blank=True, help_text="UID interno, puede ser nulo")
     user_id = models.CharField(max_length=32, blank=True, default="", help_text="ID mostrado en el equipo")
@@ -45,6 +63,10 @@ class UsuarioDispositivo(models.Model):
         related_name="usuarios_dispositivo"
     )
 
+    # Texto normalizado para búsquedas (ver empleados/busqueda.py)
+    busqueda = models.TextField(blank=True, default="", editable=False)
+    CAMPOS_BUSQUEDA = ("user_id", "nombre")
+
     class Meta:
         ordering = ['dispositivo', 'user_id', 'uid']
         unique_together = (
@@ -57,6 +79,8 @@ class UsuarioDispositivo(models.Model):
 
 
 class AsistenciaCruda(models.Model):
+    # En PostgreSQL la tabla está particionada por mes sobre `ts` (ver dispositivos/particiones.py).
+    # Filtrar por rangos de `ts` (no por ts__date) para que solo se lean las particiones necesarias.
     dispositivo = models.ForeignKey(Dispositivo, on_delete=models.CASCADE, related_name='marcajes')
     usuario = models.ForeignKey(UsuarioDispositivo, null=True, blank=True, on_delete=models.SET_NULL, related_name='marcajes')
     user_id = models.CharField(max_length=32)
@@ -79,3 +103,41 @@ class AsistenciaCruda(models.Model):
 
     def __str__(self):
         return f"{self.dispositivo.nombre} · {self.user_id} · {self.ts.isoformat()} · {self.status}"
+
+
+class ArchivoAsistencia(models.Model):
+    """
+    Mes de marcajes de un dispositivo movido fuera de AsistenciaCruda a un
+    archivo comprimido (ver dispositivos/archivo.py).
+    """
+    dispositivo = models.ForeignKey(Dispositivo, on_delete=models.CASCADE, related_name='archivos')
+    mes = models.DateField(help_text="Primer día del mes archivado")
+    ruta = models.CharField(max_length=255, help_text="Relativa a ASISTENCIA_ARCHIVO_DIR")
+    filas = models.PositiveIntegerField(default=0)
+    tamano = models.PositiveIntegerField(default=0, help_text="Bytes del archivo comprimido")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-mes', 'dispositivo']
+        constraints = [
+            models.UniqueConstraint(fields=['dispositivo', 'mes'], name='uq_archivo_dispositivo_mes')
+        ]
+
+    def __str__(self):
+        return f"{self.dispositivo.nombre} · {self.mes:%Y-%m} · {self.filas} marcajes"
+
+
+class PaqueteADMS(models.Model):
+    """
+    Envío ATTLOG de un terminal ADMS guardado tal cual, pendiente de volcar
+    en AsistenciaCruda (ver dispositivos/adms.py). Se borra al volcarlo.
+    """
+    dispositivo = models.ForeignKey(Dispositivo, on_delete=models.CASCADE, related_name='paquetes_adms')
+    cuerpo = models.TextField()
+    recibido_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+
+    def __str__(self):
+        return f"{self.dispositivo.nombre} · {self.recibido_en.isoformat()}"
@@ -0,0 +1,200 @@
+"""
+Particionado mensual de AsistenciaCruda (solo PostgreSQL).
+
+La tabla de marcajes sólo crece y casi todas las consultas filtran por rango de
+`ts`, así que en PostgreSQL se particiona por RANGE (ts) con una partición por
+mes local (settings.TIME_ZONE). Un reporte mensual sólo toca una o dos
+particiones y el vacuum/índices trabajan sobre tablas pequeñas.
+
+- La clave primaria pasa a ser (id, ts): PostgreSQL exige que toda restricción
+  única incluya la columna de partición. `uq_marcaje_unico` ya incluye `ts`, así
+  que mantiene exactamente su semántica.
+- Una partición DEFAULT recoge cualquier marcaje fuera de los meses creados
+  (relojes desajustados, meses futuros), de modo que nunca se rechaza un insert.
+- Las particiones futuras se crean por adelantado con el comando
+  `particiones_asistencia` (también lo ejecuta el scheduler).
+
+En SQLite todas las funciones son no-op.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import List
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+TABLA = "dispositivos_asistenciacruda"
+PARTICION_DEFAULT = f"{TABLA}_default"
+
+
+def soportado(connection) -> bool:
+    return connection.vendor == "postgresql"
+
+
+def esta_particionada(cursor) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+        [TABLA],
+    )
+    return cursor.fetchone() is not None
+
+
+def _inicio_mes(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _mes_siguiente(d: date) -> date:
+    return date(d.year + 1, 1, 1) if d.month == 12 else date(d.year, d.month + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    return f"{TABLA}_p{mes:%Y%m}"
+
+
+def _limite(mes: date) -> str:
+    """Medianoche local del día 1 como literal timestamptz."""
+    tz = ZoneInfo(settings.TIME_ZONE)
+    return datetime(mes.year, mes.month, 1, tzinfo=tz).isoformat()
+
+
+def particiones_existentes(cursor) -> List[str]:
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+        """,
+        [TABLA],
+    )
+    return [r[0] for r in cursor.fetchall()]
+
+
+def crear_particion(cursor, mes: date) -> bool:
+    """
+    Crea la partición del mes si no existe. Devuelve True si la creó.
+
+    Si la partición DEFAULT ya tiene filas de ese mes, se mueven a la nueva
+    partición antes de adjuntarla (ATTACH fallaría con filas solapadas).
+    """
+    mes = _inicio_mes(mes)
+    nombre = nombre_particion(mes)
+    if nombre in particiones_existentes(cursor):
+        return False
+
+    desde, hasta = _limite(mes), _limite(_mes_siguiente(mes))
+    cursor.execute(f'CREATE TABLE "{nombre}" (LIKE "{TABLA}")')
+    cursor.execute(
+        f"""
+        WITH movidas AS (
+            DELETE FROM "{PARTICION_DEFAULT}"
+            WHERE ts >= '{desde}'::timestamptz AND ts < '{hasta}'::timestamptz
+            RETURNING *
+        )
+        INSERT INTO "{nombre}" SELECT * FROM movidas
+        """
+    )
+    cursor.execute(
+        f"""ALTER TABLE "{TABLA}" ATTACH PARTITION "{nombre}"
+            FOR VALUES FROM ('{desde}') TO ('{hasta}')"""
+    )
+    return True
+
+
+def asegurar_particiones(cursor, meses_adelante: int = 3, desde: date | None = None) -> List[str]:
+    """Crea las particiones desde `desde` (mes actual por defecto) hasta `meses_adelante` meses después."""
+    mes = _inicio_mes(desde or timezone.localdate())
+    creadas = []
+    for _ in range(meses_adelante + 1):
+        if crear_particion(cursor, mes):
+            creadas.append(nombre_particion(mes))
+        mes = _mes_siguiente(mes)
+    return creadas
+
+
+def _meses_con_datos(cursor, tabla: str) -> List[date]:
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', ts AT TIME ZONE %s)::date FROM \"{tabla}\"",
+        [settings.TIME_ZONE],
+    )
+    return sorted(r[0] for r in cursor.fetchall())
+
+
+def _recrear_tabla(cursor, particionar: bool, meses_adelante: int = 3):
+    """
+    Reconstruye la tabla (particionada o plana) copiando todas las filas.
+
+    Se conservan los nombres de índices y restricciones para que las
+    migraciones posteriores de Django sigan encontrándolos. La copia se
+    verifica por conteo antes de eliminar la tabla original.
+    """
+    cursor.execute(f'LOCK TABLE "{TABLA}" IN ACCESS EXCLUSIVE MODE')
+
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f', 'c')
+        ORDER BY contype = 'p' DESC, conname
+        """,
+        [TABLA],
+    )
+    restricciones = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = to_regclass(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conrelid = i.indrelid AND c.conindid = i.indexrelid
+          )
+        """,
+        [TABLA],
+    )
+    indices = [r[0] for r in cursor.fetchall()]
+    cursor.execute(f'SELECT COUNT(*) FROM "{TABLA}"')
+    total = cursor.fetchone()[0]
+
+    anterior = f"{TABLA}__anterior"
+    cursor.execute(f'ALTER TABLE "{TABLA}" RENAME TO "{anterior}"')
+    if particionar:
+        cursor.execute(f'CREATE TABLE "{TABLA}" (LIKE "{anterior}") PARTITION BY RANGE (ts)')
+        cursor.execute(f'CREATE TABLE "{PARTICION_DEFAULT}" PARTITION OF "{TABLA}" DEFAULT')
+        for mes in _meses_con_datos(cursor, anterior):
+            crear_particion(cursor, mes)
+        asegurar_particiones(cursor, meses_adelante)
+    else:
+        cursor.execute(f'CREATE TABLE "{TABLA}" (LIKE "{anterior}")')
+
+    cursor.execute(f'INSERT INTO "{TABLA}" SELECT * FROM "{anterior}"')
+    if cursor.rowcount != total:
+        raise RuntimeError(f"Copia incompleta de {TABLA}: {cursor.rowcount} de {total} filas.")
+    cursor.execute(f'DROP TABLE "{anterior}"')
+
+    # Secuencia del id (la anterior, serial o identity, se elimina con la tabla)
+    secuencia = f"{TABLA}_id_seq"
+    cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{secuencia}" OWNED BY "{TABLA}".id')
+    cursor.execute(f"SELECT setval('\"{secuencia}\"', COALESCE(MAX(id), 0) + 1, false) FROM \"{TABLA}\"")
+    cursor.execute(f"""ALTER TABLE "{TABLA}" ALTER COLUMN id SET DEFAULT nextval('"{secuencia}"')""")
+
+    for nombre, tipo, definicion in restricciones:
+        if tipo == "p":
+            definicion = "PRIMARY KEY (id, ts)" if particionar else "PRIMARY KEY (id)"
+        cursor.execute(f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{nombre}" {definicion}')
+    for definicion in indices:
+        cursor.execute(definicion)
+    cursor.execute(f'ANALYZE "{TABLA}"')
+
+
+def particionar_tabla(cursor, meses_adelante: int = 3):
+    if not esta_particionada(cursor):
+        _recrear_tabla(cursor, particionar=True, meses_adelante=meses_adelante)
+
+
+def desparticionar_tabla(cursor):
+    if esta_particionada(cursor):
+        _recrear_tabla(cursor, particionar=False)
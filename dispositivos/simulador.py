@@ -0,0 +1,468 @@
+"""
+Simulador de terminales ZKTeco para pruebas de carga de la sincronización.
+
+Implementa la parte del protocolo binario de ZK que usa pyzk desde esta
+aplicación, por TCP y por UDP en el mismo puerto:
+
+- connect / auth (clave de comunicación con make_commkey) / exit
+- disable / enable / refresh_data / free_data / read_sizes
+- get_users y get_attendance (lectura por buffer: comandos 1503/1504)
+- set_user (formatos de 28 y 72 bytes) y delete_user
+- versión de firmware, opciones (número de serie, nombre) y hora
+- live_capture: eventos CMD_REG_EVENT al registrarse un marcaje (marcar(),
+  o solos con eventos_por_minuto), que también quedan en la lista de marcajes
+
+Usuarios y marcajes salen de dispositivos/sintetico.py. Cada terminal admite:
+
+- latencia: retardo antes de cada respuesta.
+- pérdida: probabilidad de no responder a un comando (el cliente agota su
+  timeout, como con un paquete perdido).
+- contraseña (clave de comunicación) y qué hacer si la autenticación falla:
+  "unauth" (responde CMD_ACK_UNAUTH, como la mayoría de firmwares),
+  "cerrar" (corta la conexión) o "silencio" (no responde).
+
+Cada conexión TCP y cada cliente UDP tienen su propia sesión; un hilo por
+conexión TCP y uno por terminal para UDP.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import random
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from struct import pack, unpack
+from typing import Callable, Dict, List, Tuple
+
+from zk import const
+from zk.base import make_commkey
+
+from . import sintetico
+
+logger = logging.getLogger(__name__)
+
+TCP_TOP = pack("<HH", const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2)
+UDP_TROZO = 1024
+FALLOS_AUTH = ("unauth", "cerrar", "silencio")
+
+_CMD_PREPARE_BUFFER = 1503
+_CMD_READ_BUFFER = 1504
+
+
+# --------------------------------------------------------------------------------------
+# Codificación (inversa de la de pyzk)
+# --------------------------------------------------------------------------------------
+def _checksum(datos: bytes) -> int:
+    """Suma de comprobación de zkemsdk.c, igual que ZK.__create_checksum."""
+    if len(datos) % 2:
+        datos += b"\x00"
+    total = 0
+    for (palabra,) in _palabras(datos):
+        total += palabra
+        if total > const.USHRT_MAX:
+            total -= const.USHRT_MAX
+    total = ~total
+    while total < 0:
+        total += const.USHRT_MAX
+    return total
+
+
+def _palabras(datos: bytes):
+    return (unpack("<H", datos[i:i + 2]) for i in range(0, len(datos), 2))
+
+
+def paquete(comando: int, sesion: int, respuesta: int, datos: bytes = b"") -> bytes:
+    cabecera = pack("<4H", comando, 0, sesion, respuesta) + datos
+    return pack("<4H", comando, _checksum(cabecera), sesion, respuesta) + datos
+
+
+def codificar_hora(t: datetime) -> int:
+    return (
+        ((t.year % 100) * 12 * 31 + ((t.month - 1) * 31) + t.day - 1) * (24 * 60 * 60)
+        + (t.hour * 60 + t.minute) * 60 + t.second
+    )
+
+
+@dataclass
+class Usuario:
+    uid: int
+    user_id: str
+    nombre: str = ""
+    privilegio: int = 0
+    password: str = ""
+    grupo: str = ""
+    tarjeta: int = 0
+
+    def registro(self) -> bytes:
+        """Formato de 72 bytes (firmware ZK8), el que pyzk detecta por TCP."""
+        return pack(
+            "<HB8s24sIx7sx24s", self.uid, self.privilegio, self.password.encode()[:8],
+            self.nombre.encode()[:24], self.tarjeta, self.grupo.encode()[:7], self.user_id.encode()[:24],
+        )
+
+    @classmethod
+    def desde_set_user(cls, datos: bytes) -> "Usuario":
+        if len(datos) >= 72:
+            uid, priv, pwd, nombre, tarjeta, grupo, user_id = unpack("<HB8s24s4sx7sx24s", datos[:72])
+            tarjeta = unpack("<I", tarjeta)[0]
+            grupo = grupo.split(b"\x00")[0].decode(errors="ignore")
+            user_id = user_id.split(b"\x00")[0].decode(errors="ignore")
+        else:
+            uid, priv, pwd, nombre, tarjeta, grupo, _, user_id = unpack("<HB5s8sIxBHI", datos[:28])
+            grupo, user_id = str(grupo), str(user_id)
+        return cls(
+            uid=uid, user_id=user_id, privilegio=priv, tarjeta=tarjeta, grupo=grupo,
+            password=pwd.split(b"\x00")[0].decode(errors="ignore"),
+            nombre=nombre.split(b"\x00")[0].decode(errors="ignore"),
+        )
+
+
+@dataclass
+class Config:
+    usuarios: int = 300
+    registros: int = 20000
+    latencia_ms: float = 0.0
+    perdida: float = 0.0
+    perdida_datos: float = 0.0                  # probabilidad de perder cada datagrama UDP de datos
+    password: str = ""
+    fallo_auth: str = "unauth"
+    semilla: int = 42
+    hasta: date | None = None
+    eventos_por_minuto: float = 0.0
+
+
+@dataclass
+class _Sesion:
+    id: int
+    autenticada: bool = False
+    buffer: bytes = b""
+    eventos: int = 0                            # banderas de CMD_REG_EVENT
+    enviar: Callable[[bytes], None] | None = None
+    ack: threading.Event = field(default_factory=threading.Event)
+
+
+# --------------------------------------------------------------------------------------
+# Terminal
+# --------------------------------------------------------------------------------------
+class Terminal:
+    """Estado de un terminal y respuesta a cada comando, independiente del transporte."""
+
+    def __init__(self, nombre: str, config: Config):
+        self.nombre = nombre
+        self.config = config
+        self.rng = random.Random(config.semilla)
+        self._lock = threading.Lock()
+        self._sesiones = 0
+        self._abiertas: Dict[int, _Sesion] = {}
+        self.habilitado = True
+        self.usuarios: Dict[int, Usuario] = {}
+        self.marcajes: List[sintetico.Marcaje] = []
+        self._cache: Dict[str, bytes] = {}
+        self._cargar()
+
+    def _cargar(self):
+        c = self.config
+        for i in range(c.usuarios):
+            uid = i + 1
+            self.usuarios[uid] = Usuario(uid, sintetico.user_id(i), f"Usuario {i + 1}")
+        if c.registros and c.usuarios:
+            # Unos 1,5 marcajes por usuario y día natural; se recortan a los más recientes
+            hasta = c.hasta or date.today()
+            dias = math.ceil(c.registros / (c.usuarios * 1.5)) + 7
+            ahora = datetime.now()
+            todos = [
+                m for m in sintetico.marcajes_dispositivo(c.usuarios, hasta - timedelta(days=dias), hasta, c.semilla)
+                if m.timestamp <= ahora
+            ]
+            todos.sort(key=lambda m: m.timestamp)
+            self.marcajes = todos[-c.registros:]
+
+    # ---- Datos en el formato de lectura por buffer ----
+    def _bloque_usuarios(self) -> bytes:
+        if "usuarios" not in self._cache:
+            cuerpo = b"".join(u.registro() for u in sorted(self.usuarios.values(), key=lambda u: u.uid))
+            self._cache["usuarios"] = pack("<I", len(cuerpo)) + cuerpo
+        return self._cache["usuarios"]
+
+    def _bloque_marcajes(self) -> bytes:
+        if "marcajes" not in self._cache:
+            cuerpo = b"".join(
+                pack("<H24sB4sB8s", m.uid, m.user_id.encode()[:24], m.status,
+                     pack("<I", codificar_hora(m.timestamp)), m.punch, b"")
+                for m in self.marcajes
+            )
+            self._cache["marcajes"] = pack("<I", len(cuerpo)) + cuerpo
+        return self._cache["marcajes"]
+
+    def _tamanos(self) -> bytes:
+        campos = [0] * 20
+        campos[4] = len(self.usuarios)
+        campos[8] = len(self.marcajes)
+        campos[14], campos[15], campos[16] = 3000, 10000, 200000   # capacidades
+        campos[17] = 3000
+        campos[18] = 10000 - len(self.usuarios)
+        campos[19] = 200000 - len(self.marcajes)
+        return pack("<20i", *campos) + pack("<3i", 0, 0, 0)
+
+    def nueva_sesion(self, enviar: Callable[[bytes], None] | None = None) -> _Sesion:
+        with self._lock:
+            self._sesiones = (self._sesiones % 60000) + 1
+            sesion = self._abiertas[self._sesiones] = _Sesion(self._sesiones, enviar=enviar)
+            return sesion
+
+    def cerrar_sesion(self, sesion: _Sesion):
+        with self._lock:
+            self._abiertas.pop(sesion.id, None)
+
+    # ---- Eventos en tiempo real ----
+    def marcar(self, user_id: str | None = None, status: int = 0, punch: int = 0) -> sintetico.Marcaje:
+        """
+        Registra un marcaje ahora (de `user_id` o de un usuario al azar) y lo
+        envía a las sesiones en live_capture; cada evento espera el ACK del
+        cliente, como el firmware, para que no se junten en un mismo paquete.
+        """
+        with self._lock:
+            if user_id is None:
+                usuario = self.rng.choice(list(self.usuarios.values()))
+            else:
+                usuario = next(u for u in self.usuarios.values() if u.user_id == user_id)
+            m = sintetico.Marcaje(usuario.user_id, usuario.uid, datetime.now().replace(microsecond=0), status, punch)
+            self.marcajes.append(m)
+            self._cache.pop("marcajes", None)
+            destino = [s for s in self._abiertas.values() if s.eventos & const.EF_ATTLOG and s.enviar]
+        t = m.timestamp
+        cuerpo = pack(
+            "<24sBB6B", m.user_id.encode()[:24], m.status, m.punch,
+            t.year - 2000, t.month, t.day, t.hour, t.minute, t.second,
+        )
+        for sesion in destino:
+            sesion.ack.clear()
+            try:
+                sesion.enviar(paquete(const.CMD_REG_EVENT, sesion.id, 0, cuerpo))
+            except OSError:
+                continue
+            sesion.ack.wait(1)
+        return m
+
+    def _asignar_uid(self, usuario: Usuario) -> Usuario:
+        # uid=0: el terminal reutiliza el del mismo user_id o asigna el siguiente libre
+        if usuario.uid == 0:
+            existente = next((u for u in self.usuarios.values() if u.user_id == usuario.user_id), None)
+            usuario.uid = existente.uid if existente else max(self.usuarios, default=0) + 1
+        return usuario
+
+    # ---- Comandos ----
+    def responder(self, sesion: _Sesion, comando: int, respuesta_id: int, datos: bytes) -> Tuple[List[bytes], bool]:
+        """
+        Procesa un comando. Devuelve (paquetes a enviar en orden, cerrar conexión).
+        Una lista vacía significa no responder.
+        """
+        if self.config.perdida and self.rng.random() < self.config.perdida:
+            return [], False
+        if self.config.latencia_ms:
+            time.sleep(self.config.latencia_ms / 1000)
+
+        def ok(cuerpo: bytes = b"", codigo: int = const.CMD_ACK_OK):
+            return [paquete(codigo, sesion.id, respuesta_id, cuerpo)], False
+
+        if comando == const.CMD_CONNECT:
+            if self.config.password:
+                return ok(codigo=const.CMD_ACK_UNAUTH)
+            sesion.autenticada = True
+            return ok()
+        if comando == const.CMD_AUTH:
+            esperado = make_commkey(int(self.config.password), sesion.id)
+            if datos[:4] == esperado:
+                sesion.autenticada = True
+                return ok()
+            if self.config.fallo_auth == "cerrar":
+                return [], True
+            if self.config.fallo_auth == "silencio":
+                return [], False
+            return ok(codigo=const.CMD_ACK_UNAUTH)
+        if not sesion.autenticada:
+            return ok(codigo=const.CMD_ACK_UNAUTH)
+
+        if comando == const.CMD_EXIT:
+            self.cerrar_sesion(sesion)
+            return [paquete(const.CMD_ACK_OK, sesion.id, respuesta_id)], True
+        if comando == const.CMD_ACK_OK:
+            sesion.ack.set()   # confirmación de un evento: no se responde
+            return [], False
+        if comando == const.CMD_REG_EVENT:
+            sesion.eventos = unpack("<I", datos[:4])[0] if len(datos) >= 4 else 0
+            return ok()
+        if comando in (const.CMD_ENABLEDEVICE, const.CMD_DISABLEDEVICE):
+            self.habilitado = comando == const.CMD_ENABLEDEVICE
+            return ok()
+        if comando in (const.CMD_REFRESHDATA, const.CMD_FREE_DATA, const.CMD_OPTIONS_WRQ,
+                       const.CMD_CANCELCAPTURE, const.CMD_STARTVERIFY):
+            if comando == const.CMD_FREE_DATA:
+                sesion.buffer = b""
+            return ok()
+        if comando == const.CMD_GET_FREE_SIZES:
+            return ok(self._tamanos())
+        if comando == const.CMD_GET_VERSION:
+            return ok(b"Ver 6.60 SIM\x00")
+        if comando == const.CMD_GET_TIME:
+            return ok(pack("<I", codificar_hora(datetime.now())))
+        if comando == const.CMD_OPTIONS_RRQ:
+            clave = datos.split(b"\x00")[0].decode(errors="ignore")
+            valores = {"~SerialNumber": self.nombre, "~DeviceName": "Simulador", "~Platform": "SIM"}
+            return ok(f"{clave}={valores.get(clave, '')}\x00".encode())
+        if comando == const.CMD_USER_WRQ:
+            with self._lock:
+                u = self._asignar_uid(Usuario.desde_set_user(datos))
+                self.usuarios[u.uid] = u
+                self._cache.pop("usuarios", None)
+            return ok()
+        if comando == const.CMD_DELETE_USER:
+            uid = unpack("<H", datos[:2])[0]
+            with self._lock:
+                self.usuarios.pop(uid, None)
+                self._cache.pop("usuarios", None)
+            return ok()
+        if comando == _CMD_PREPARE_BUFFER:
+            _, cmd, fct, _ = unpack("<bhii", datos[:11])
+            if cmd == const.CMD_USERTEMP_RRQ and fct == const.FCT_USER:
+                sesion.buffer = self._bloque_usuarios()
+            elif cmd == const.CMD_ATTLOG_RRQ:
+                sesion.buffer = self._bloque_marcajes()
+            else:
+                sesion.buffer = pack("<I", 0)
+            return ok(b"\x00" + pack("<I", len(sesion.buffer)) + b"\x00" * 4)
+        if comando == _CMD_READ_BUFFER:
+            inicio, tamano = unpack("<ii", datos[:8])
+            trozo = sesion.buffer[inicio:inicio + tamano]
+            return [
+                paquete(const.CMD_PREPARE_DATA, sesion.id, respuesta_id, pack("<II", len(trozo), 0)),
+                paquete(const.CMD_DATA, sesion.id, respuesta_id, trozo),
+                paquete(const.CMD_ACK_OK, sesion.id, respuesta_id),
+            ], False
+        return ok(codigo=const.CMD_ACK_UNKNOWN)
+
+
+# --------------------------------------------------------------------------------------
+# Transporte
+# --------------------------------------------------------------------------------------
+def _leer_exacto(sock: socket.socket, n: int) -> bytes:
+    datos = b""
+    while len(datos) < n:
+        parte = sock.recv(n - len(datos))
+        if not parte:
+            raise ConnectionError("conexión cerrada")
+        datos += parte
+    return datos
+
+
+class _ManejadorTCP(socketserver.BaseRequestHandler):
+    def handle(self):
+        terminal: Terminal = self.server.terminal
+        sock = self.request
+        escritura = threading.Lock()
+
+        def enviar(p: bytes):
+            with escritura:
+                sock.sendall(TCP_TOP + pack("<I", len(p)) + p)
+
+        sesion = terminal.nueva_sesion(enviar)
+        try:
+            while True:
+                top = _leer_exacto(sock, 8)
+                _, _, longitud = unpack("<HHI", top)
+                pkt = _leer_exacto(sock, longitud)
+                comando, _, _, respuesta_id = unpack("<4H", pkt[:8])
+                paquetes, cerrar = terminal.responder(sesion, comando, respuesta_id, pkt[8:])
+                if paquetes:
+                    with escritura:
+                        sock.sendall(b"".join(TCP_TOP + pack("<I", len(p)) + p for p in paquetes))
+                if cerrar:
+                    return
+        except (ConnectionError, OSError):
+            return  # pyzk abre y cierra una conexión solo para comprobar el puerto
+        finally:
+            terminal.cerrar_sesion(sesion)
+
+
+class _ManejadorUDP(socketserver.BaseRequestHandler):
+    def handle(self):
+        datos, sock = self.request
+        if len(datos) < 8:
+            return
+        terminal: Terminal = self.server.terminal
+        with self.server.lock:
+            sesion = self.server.sesiones.get(self.client_address)
+            if sesion is None:
+                direccion = self.client_address
+                sesion = self.server.sesiones[direccion] = terminal.nueva_sesion(lambda p: sock.sendto(p, direccion))
+        comando, _, _, respuesta_id = unpack("<4H", datos[:8])
+        paquetes, cerrar = terminal.responder(sesion, comando, respuesta_id, datos[8:])
+        for p in paquetes:
+            comando_resp = unpack("<H", p[:2])[0]
+            if comando_resp == const.CMD_DATA and len(p) - 8 > UDP_TROZO:
+                # Por UDP los datos van en datagramas de 1024 bytes
+                cuerpo, cab = p[8:], unpack("<4H", p[:8])
+                for i in range(0, len(cuerpo), UDP_TROZO):
+                    if terminal.config.perdida_datos and terminal.rng.random() < terminal.config.perdida_datos:
+                        continue
+                    sock.sendto(paquete(const.CMD_DATA, cab[2], cab[3], cuerpo[i:i + UDP_TROZO]), self.client_address)
+            else:
+                sock.sendto(p, self.client_address)
+        if cerrar:
+            with self.server.lock:
+                self.server.sesiones.pop(self.client_address, None)
+
+
+class _ServidorTCP(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _ServidorUDP(socketserver.ThreadingUDPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class Simulador:
+    """Un terminal escuchando por TCP y UDP en `puerto` (0: uno libre, ver self.puerto)."""
+
+    def __init__(self, nombre: str, host: str, puerto: int, config: Config, protocolos=("tcp", "udp")):
+        self.terminal = Terminal(nombre, config)
+        self.host, self.puerto = host, puerto
+        self.servidores = []
+        if "tcp" in protocolos:
+            tcp = _ServidorTCP((host, puerto), _ManejadorTCP)
+            tcp.terminal = self.terminal
+            self.servidores.append(tcp)
+            self.puerto = tcp.server_address[1]
+        if "udp" in protocolos:
+            udp = _ServidorUDP((host, self.puerto), _ManejadorUDP)
+            udp.terminal, udp.sesiones, udp.lock = self.terminal, {}, threading.Lock()
+            self.servidores.append(udp)
+            self.puerto = udp.server_address[1]
+
+        self._parada = threading.Event()
+
+    def iniciar(self):
+        for s in self.servidores:
+            threading.Thread(target=s.serve_forever, name=f"sim-{self.puerto}", daemon=True).start()
+        if self.terminal.config.eventos_por_minuto > 0:
+            threading.Thread(target=self._generar_eventos, name=f"sim-eventos-{self.puerto}", daemon=True).start()
+        return self
+
+    def _generar_eventos(self):
+        # Llegadas de Poisson con la tasa configurada
+        tasa = self.terminal.config.eventos_por_minuto / 60
+        while not self._parada.wait(self.terminal.rng.expovariate(tasa)):
+            if self.terminal.usuarios:
+                self.terminal.marcar()
+
+    def detener(self):
+        self._parada.set()
+        for s in self.servidores:
+            s.shutdown()
+            s.server_close()
@@ -0,0 +1,318 @@
+"""
+Datos sintéticos a escala real para medir reportes y sincronización.
+
+generar() crea N dispositivos, M empleados (con su UsuarioDispositivo en cada
+dispositivo) y Y años de marcajes hasta una fecha. Cada empleado tiene un
+perfil y cada día laborable una incidencia:
+
+- Perfil: turno de día (entrada ~08:00, salida ~17:00) o de noche (entrada
+  ~22:00, salida ~06:00 del día siguiente). Una parte de los de día llega tarde
+  a menudo.
+- Día normal: entrada y salida, casi siempre en su dispositivo.
+- Doble marcaje: la entrada se repite a los pocos segundos o minutos.
+- Sin salida: solo marcó la entrada.
+- Ausencia sin justificar: sin marcajes.
+- Bajas autorizadas (vacaciones, enfermedad, permisos): sin marcajes.
+- Algún sábado trabajado.
+
+Todo lo generado lleva el prefijo PREFIJO (nombre de dispositivo, número y
+documento de empleado) y limpiar() lo borra. Los dispositivos se crean
+inactivos para que el scheduler no intente conectarse a ellos.
+
+La generación es determinista para una misma semilla.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from empleados import dimensiones
+from empleados.models import BajaAutorizada, Empleado, UserIdLiberado
+
+from . import particiones
+from .models import AsistenciaCruda, Dispositivo, UsuarioDispositivo
+
+PREFIJO = "SINT"
+USER_ID_BASE = 800000
+LOTE = 20000
+
+DEPARTAMENTOS = [
+    "Administración", "Contabilidad", "Recursos Humanos", "Informática",
+    "Logística", "Mantenimiento", "Seguridad", "Atención al Cliente",
+]
+NOMBRES = [
+    "Ana", "Pedro", "María", "José", "Lucía", "Juan", "Carmen", "Luis", "Elena", "Miguel",
+    "Rosa", "Santiago", "Teresa", "Pablo", "Isabel", "Francisco", "Marta", "Antonio",
+]
+APELLIDOS = [
+    "Nguema", "Obiang", "Mba", "Ndong", "Esono", "Nsue", "Ondo", "Mangue", "Edu", "Bacale",
+    "García", "López", "Martínez", "Sánchez", "Pérez", "Gómez", "Rodríguez", "Fernández",
+]
+
+# Probabilidades por día laborable
+P_AUSENCIA = 0.03
+P_SIN_SALIDA = 0.04
+P_DOBLE = 0.06
+P_OTRO_DISPOSITIVO = 0.15
+P_SABADO = 0.05
+# Perfiles
+P_NOCTURNO = 0.10
+P_IMPUNTUAL = 0.15
+# Bajas por empleado y año: (tipo, probabilidad, días mínimos, días máximos)
+BAJAS = [
+    ("VACA", 0.9, 10, 22),
+    ("ENFE", 0.35, 2, 10),
+    ("PERM", 0.5, 1, 3),
+]
+
+
+@dataclass(frozen=True)
+class Marcaje:
+    """Forma de un registro de asistencia de pyzk (Attendance)."""
+    user_id: str
+    uid: int
+    timestamp: datetime  # hora local del dispositivo, sin zona
+    status: int
+    punch: int
+
+
+@dataclass(frozen=True)
+class Perfil:
+    indice: int
+    user_id: str
+    uid: int
+    dispositivo: int  # posición en la lista de dispositivos
+    nocturno: bool
+    impuntual: bool
+
+
+def user_id(indice: int) -> str:
+    return str(USER_ID_BASE + indice)
+
+
+def perfiles(rng: random.Random, empleados: int, dispositivos: int) -> List[Perfil]:
+    out = []
+    for i in range(empleados):
+        nocturno = rng.random() < P_NOCTURNO
+        out.append(Perfil(
+            indice=i,
+            user_id=user_id(i),
+            uid=i + 1,
+            dispositivo=i % dispositivos,
+            nocturno=nocturno,
+            impuntual=not nocturno and rng.random() < P_IMPUNTUAL,
+        ))
+    return out
+
+
+def bajas_perfil(rng: random.Random, d1: date, d2: date) -> List[Tuple[str, date, date]]:
+    """Bajas (tipo, inicio, fin) de un empleado entre d1 y d2, sin solaparse."""
+    out: List[Tuple[str, date, date]] = []
+    dias = (d2 - d1).days + 1
+    for anio in range(max(1, round(dias / 365))):
+        for tipo, p, minimo, maximo in BAJAS:
+            if rng.random() >= p:
+                continue
+            duracion = rng.randint(minimo, maximo)
+            inicio = d1 + timedelta(days=anio * 365 + rng.randrange(0, 365))
+            fin = inicio + timedelta(days=duracion - 1)
+            if fin > d2 or any(inicio <= f and fin >= i for _, i, f in out):
+                continue
+            out.append((tipo, inicio, fin))
+    return out
+
+
+def _hora(dia: date, hora: int, minuto: int, desvio_min: float, rng: random.Random) -> datetime:
+    base = datetime.combine(dia, time(hora, minuto))
+    return base + timedelta(seconds=int(rng.gauss(0, desvio_min * 60)))
+
+
+def marcajes_perfil(
+    rng: random.Random, perfil: Perfil, d1: date, d2: date, bajas: List[Tuple[str, date, date]],
+) -> Iterator[Tuple[int, Marcaje]]:
+    """Marcajes (posición del dispositivo, Marcaje) del perfil entre d1 y d2, en hora local."""
+    en_baja = set()
+    for _, inicio, fin in bajas:
+        en_baja.update(inicio + timedelta(days=k) for k in range((fin - inicio).days + 1))
+
+    dia = d1
+    while dia <= d2:
+        laborable = dia.weekday() < 5 or (dia.weekday() == 5 and rng.random() < P_SABADO)
+        if laborable and dia not in en_baja and rng.random() >= P_AUSENCIA:
+            if perfil.nocturno:
+                entrada = _hora(dia, 22, 0, 8, rng)
+                salida = _hora(dia + timedelta(days=1), 6, 0, 10, rng)
+            else:
+                retraso = rng.choice((0, 0, 15, 35)) if perfil.impuntual else 0
+                entrada = _hora(dia, 8, retraso, 7, rng)
+                salida = _hora(dia, 17, 0, 20, rng)
+
+            d = perfil.dispositivo
+            if rng.random() < P_OTRO_DISPOSITIVO:
+                d = -1  # cualquiera: lo resuelve quien conoce la lista
+            yield d, Marcaje(perfil.user_id, perfil.uid, entrada, 0, 0)
+            if rng.random() < P_DOBLE:
+                repetida = entrada + timedelta(seconds=rng.randint(3, 180))
+                yield d, Marcaje(perfil.user_id, perfil.uid, repetida, 0, 0)
+            if rng.random() >= P_SIN_SALIDA and salida <= datetime.combine(d2, time.max):
+                yield d, Marcaje(perfil.user_id, perfil.uid, salida, 1, 1)
+        dia += timedelta(days=1)
+
+
+def marcajes_dispositivo(
+    empleados: int, d1: date, d2: date, semilla: int = 42,
+) -> Iterator[Marcaje]:
+    """Todos los marcajes de un único dispositivo (lo que devolvería get_attendance())."""
+    rng = random.Random(semilla)
+    for perfil in perfiles(rng, empleados, 1):
+        bajas = bajas_perfil(rng, d1, d2)
+        for _, m in marcajes_perfil(rng, perfil, d1, d2, bajas):
+            yield m
+
+
+# --------------------------------------------------------------------------------------
+# Escritura en la base de datos
+# --------------------------------------------------------------------------------------
+def limpiar() -> Dict[str, int]:
+    """Borra todo lo generado con PREFIJO."""
+    with transaction.atomic():
+        dispositivos = Dispositivo.objects.filter(nombre__startswith=f"{PREFIJO}-")
+        marcajes, _ = AsistenciaCruda.objects.filter(dispositivo__in=dispositivos).delete()
+        empleados = Empleado.objects.filter(numero__startswith=f"{PREFIJO}-")
+        bajas, _ = BajaAutorizada.objects.filter(empleado__in=empleados).delete()
+        UsuarioDispositivo.objects.filter(dispositivo__in=dispositivos).delete()
+        n_emp, _ = empleados.delete()
+        n_disp, _ = dispositivos.delete()
+        # Los borrados devuelven sus user_id a la lista de reutilizables tras el commit
+        # (empleados/user_ids.py); este callback va detrás y descarta los sintéticos
+        transaction.on_commit(_descartar_user_ids)
+    return {"dispositivos": n_disp, "empleados": n_emp, "marcajes": marcajes, "bajas": bajas}
+
+
+def _descartar_user_ids():
+    UserIdLiberado.objects.filter(user_id__gte=USER_ID_BASE).delete()
+
+
+def _crear_dispositivos(n: int) -> List[Dispositivo]:
+    objs = [
+        Dispositivo(
+            nombre=f"{PREFIJO}-{i + 1:02d}",
+            ip=f"10.254.{i // 250}.{i % 250 + 1}",
+            ubicacion=f"Sintético {i + 1}",
+            activo=False,
+        )
+        for i in range(n)
+    ]
+    Dispositivo.objects.bulk_create(objs)
+    return list(Dispositivo.objects.filter(nombre__startswith=f"{PREFIJO}-").order_by("nombre"))
+
+
+def _crear_empleados(rng: random.Random, lista: List[Perfil], dispositivos: List[Dispositivo]) -> Dict[str, int]:
+    deps = {}
+    for nombre in DEPARTAMENTOS:
+        canonico, _, dep_id, _ = dimensiones.resolver(nombre, "")
+        deps[nombre] = (canonico, dep_id)
+
+    empleados = []
+    for p in lista:
+        dep, dep_id = deps[DEPARTAMENTOS[p.indice % len(DEPARTAMENTOS)]]
+        emp = Empleado(
+            numero=f"{PREFIJO}-{p.indice:06d}",
+            doc_id=f"{PREFIJO}-{p.indice:06d}",
+            nombre=rng.choice(NOMBRES),
+            apellido=f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+            departamento=dep,
+            departamento_ref_id=dep_id,
+            puesto="Turno de noche" if p.nocturno else "Turno de día",
+            dispositivo=dispositivos[p.dispositivo],
+            user_id=p.user_id,
+            uid=p.uid,
+            salario_base=rng.choice((150000, 250000, 400000, 650000)),
+        )
+        emp.busqueda = emp.texto_busqueda()
+        empleados.append(emp)
+    Empleado.objects.bulk_create(empleados, batch_size=1000)
+    ids = dict(Empleado.objects.filter(numero__startswith=f"{PREFIJO}-").values_list("user_id", "pk"))
+
+    usuarios = []
+    for d in dispositivos:
+        for p, emp in zip(lista, empleados):
+            ud = UsuarioDispositivo(
+                dispositivo=d, uid=p.uid, user_id=p.user_id,
+                nombre=f"{emp.nombre} {emp.apellido}"[:64], empleado_id=ids[p.user_id],
+            )
+            ud.busqueda = ud.texto_busqueda()
+            usuarios.append(ud)
+    UsuarioDispositivo.objects.bulk_create(usuarios, batch_size=1000)
+    return ids
+
+
+def generar(
+    dispositivos: int, empleados: int, anios: float, hasta: date | None = None,
+    semilla: int = 42, progreso: Callable[[int], None] | None = None,
+) -> Dict[str, int]:
+    """Genera el conjunto completo. Devuelve los totales creados."""
+    if Dispositivo.objects.filter(nombre__startswith=f"{PREFIJO}-").exists():
+        raise ValueError("Ya hay datos sintéticos; bórrelos antes con limpiar().")
+
+    rng = random.Random(semilla)
+    d2 = hasta or timezone.localdate()
+    d1 = d2 - timedelta(days=max(1, round(anios * 365)) - 1)
+    tz = timezone.get_current_timezone()
+
+    if particiones.soportado(connection):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if particiones.esta_particionada(cursor):
+                particiones.asegurar_particiones(cursor, desde=d1)
+
+    with transaction.atomic():
+        disps = _crear_dispositivos(dispositivos)
+        lista = perfiles(rng, empleados, dispositivos)
+        emp_ids = _crear_empleados(rng, lista, disps)
+    ud_ids = {
+        (d, u): pk for pk, d, u in
+        UsuarioDispositivo.objects.filter(dispositivo__in=disps).values_list("pk", "dispositivo_id", "user_id")
+    }
+
+    total = {"dispositivos": len(disps), "empleados": len(lista), "marcajes": 0, "bajas": 0}
+    pendientes: List[AsistenciaCruda] = []
+    bajas: List[BajaAutorizada] = []
+
+    def _volcar():
+        with transaction.atomic():
+            AsistenciaCruda.objects.bulk_create(pendientes, batch_size=5000, ignore_conflicts=True)
+            BajaAutorizada.objects.bulk_create(bajas, batch_size=5000)
+        total["marcajes"] += len(pendientes)
+        total["bajas"] += len(bajas)
+        pendientes.clear()
+        bajas.clear()
+        if progreso:
+            progreso(total["marcajes"])
+
+    for p in lista:
+        periodos = bajas_perfil(rng, d1, d2)
+        bajas.extend(
+            BajaAutorizada(empleado_id=emp_ids[p.user_id], fecha_inicio=i, fecha_fin=f, tipo=t, descripcion="Sintética")
+            for t, i, f in periodos
+        )
+        for pos, m in marcajes_perfil(rng, p, d1, d2, periodos):
+            disp = disps[pos if pos >= 0 else rng.randrange(len(disps))]
+            pendientes.append(AsistenciaCruda(
+                dispositivo_id=disp.pk,
+                usuario_id=ud_ids[(disp.pk, m.user_id)],
+                user_id=m.user_id,
+                uid=m.uid,
+                ts=m.timestamp.replace(tzinfo=tz),
+                status=m.status,
+                punch=m.punch,
+                raw_status=str(m.status),
+            ))
+        if len(pendientes) >= LOTE:
+            _volcar()
+    _volcar()
+    return total
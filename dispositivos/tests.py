@@ -1,3 +1,313 @@
-from django.test import TestCase
+import io
+import json
+import time
+from datetime import date, datetime
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from zkmanager import conexiones, metricas
+from zkmanager.pruebas import Caso, MetricasTemporales, PresupuestoConsultas
+
+from empleados import user_ids
+from empleados.models import Empleado
+
+from . import adms, captura, sintetico, transferencia
+from .management.commands.sync_biometricos import Command as SyncCommand
+from .models import AsistenciaCruda, Dispositivo, PaqueteADMS, UsuarioDispositivo
+from .simulador import Config, Simulador
+from .urls import urlpatterns
+from .views import _conn_with_fallbacks
+
+
+def _r(nombre, *args):
+    return reverse(f"config:{nombre}", args=args)
+
+
+class PresupuestoConsultasDispositivosTests(PresupuestoConsultas, TestCase):
+    """
+    Rutas de configuración de dispositivos. Las descargas se miden dos veces
+    contra el terminal simulado: carga inicial y repetida (todo ya existe).
+    """
+    urlpatterns = urlpatterns
+
+    def _sync_programada(self, terminal):
+        # _sincronizar_usuarios_y_registros desconecta al terminar
+        conn, _ = _conn_with_fallbacks(terminal)
+        SyncCommand(stdout=io.StringIO())._sincronizar_usuarios_y_registros(conn, terminal)
+
+    def casos(self, datos):
+        disp, terminal = datos.dispositivo.pk, datos.terminales[0].pk
+        rango = {"desde": f"{datos.d1:%Y-%m-%d}", "hasta": f"{datos.d2:%Y-%m-%d}"}
+        casos = [
+            Caso("index", _r("index")),
+            Caso("dispositivo_crear", _r("dispositivo_crear")),
+            Caso("dispositivo_editar", _r("dispositivo_editar", disp)),
+            Caso("dispositivo_eliminar", _r("dispositivo_eliminar", disp)),
+            Caso("dispositivo_probar", _r("dispositivo_probar", terminal), metodo="post"),
+            Caso("asistencia_list", _r("asistencia_list"), datos=rango),
+            Caso("asistencia_export_csv", _r("asistencia_export_csv"), datos=rango),
+            Caso("usuario_list", _r("usuario_list")),
+            Caso("usuario_export_csv", _r("usuario_export_csv")),
+            Caso("reporte_asistencia", _r("reporte_asistencia"), datos=rango),
+        ]
+        for fase in ("inicial", "repetida"):
+            casos += [
+                Caso("descargar_usuarios", _r("descargar_usuarios", terminal), metodo="post", etiqueta=fase),
+                Caso("descargar_asistencia", _r("descargar_asistencia", terminal), metodo="post", etiqueta=fase),
+            ]
+        # La sincronización programada (sin URL), contra el otro terminal
+        casos += [
+            Caso("sync_biometricos", "", etiqueta=fase, funcion=lambda: self._sync_programada(datos.terminales[1]))
+            for fase in ("inicial", "repetida")
+        ]
+        return casos
+
+
+@mock.patch.object(captura, "ESPERA_EVENTO", 1)
+class CapturaEnVivoTests(MetricasTemporales, TransactionTestCase):
+    """El servicio recupera lo guardado en el terminal y después guarda los marcajes según llegan."""
+
+    def setUp(self):
+        self.sim = Simulador("CAPTURA", "127.0.0.1", 0, Config(usuarios=3, registros=20), protocolos=("tcp",)).iniciar()
+        self.dispositivo = Dispositivo.objects.create(
+            nombre="CAPTURA", ip="127.0.0.1", puerto=self.sim.puerto, omitir_ping=True, timeout=3,
+        )
+        self.servicio = captura.Servicio(intervalo=0.1, nombres=["CAPTURA"])
+
+    def tearDown(self):
+        self.servicio.detener()
+        self.sim.detener()
+
+    def _esperar(self, condicion, segundos=10):
+        limite = time.monotonic() + segundos
+        while not condicion():
+            self.assertLess(time.monotonic(), limite, "tiempo de espera agotado")
+            time.sleep(0.05)
+
+    def test_recupera_y_captura(self):
+        self.servicio.actualizar()
+        hilo = self.servicio.capturas[self.dispositivo.pk]
+        self._esperar(lambda: hilo.conectado)
+        self.assertEqual(AsistenciaCruda.objects.filter(dispositivo=self.dispositivo).count(), 20)
+
+        nuevos = [self.sim.terminal.marcar(status=s) for s in (0, 1, 4)]
+        self._esperar(lambda: self.servicio.cola.qsize() == 3)
+        self.assertEqual(self.servicio.volcar(), 3)
+        guardados = AsistenciaCruda.objects.filter(dispositivo=self.dispositivo).order_by("-ts", "-status")[:3]
+        self.assertEqual(
+            sorted((a.user_id, a.status) for a in guardados), sorted((m.user_id, m.status) for m in nuevos),
+        )
+        self.assertTrue(all(a.usuario_id for a in guardados))
+
+        # Un evento repetido (p. ej. ya recuperado por la descarga) no se duplica
+        self.servicio.cola.put(captura.Evento(
+            self.dispositivo.pk, guardados[0].user_id, guardados[0].ts, guardados[0].status, 0, None,
+        ))
+        self.assertEqual(self.servicio.volcar(), 0)
+
+
+class AdmsTests(MetricasTemporales, TestCase):
+    """Envíos ADMS (iclock): identificación por SN, cola y volcado en lote."""
+
+    def setUp(self):
+        self.dispositivo = Dispositivo.objects.create(
+            nombre="ADMS", ip="10.0.0.9", numero_serie="SNADMS01", envio_adms=True,
+        )
+        self.empleado = Empleado.objects.create(numero="E1", nombre="Ana", apellido="Prueba", doc_id="1001")
+
+    def _attlog(self, cuerpo, sn="SNADMS01"):
+        return self.client.post(
+            f"/iclock/cdata?SN={sn}&table=ATTLOG&Stamp=9999", data=cuerpo, content_type="text/plain",
+        )
+
+    def test_sn_desconocido(self):
+        self.assertEqual(self.client.get("/iclock/cdata?SN=OTRO&options=all").status_code, 403)
+        self.assertEqual(self._attlog("1001\t2025-03-03 08:00:00\t0\t1", sn="OTRO").status_code, 403)
+        self.assertEqual(self.client.get("/iclock/getrequest").status_code, 403)
+
+    def test_inicio_y_sondeo(self):
+        respuesta = self.client.get("/iclock/cdata?SN=SNADMS01&options=all")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("Realtime=1", respuesta.content.decode())
+        self.assertEqual(self.client.get("/iclock/getrequest?SN=SNADMS01").content, b"OK")
+
+    def test_encola_y_vuelca(self):
+        cuerpo = (
+            "1001\t2025-03-03 08:00:00\t0\t1\t0\t0\n"
+            "1001\t2025-03-03 17:05:00\t1\t1\t0\t0\n"
+            "2002\t2025-03-03 08:10:00\t0\t15\t0\t0\n"
+            "línea rota\n"
+        )
+        respuesta = self._attlog(cuerpo)
+        self.assertEqual(respuesta.content, b"OK: 4")
+        self.assertEqual(AsistenciaCruda.objects.count(), 0)
+        self.assertEqual(PaqueteADMS.objects.count(), 1)
+
+        # El terminal reenvía el mismo lote (p. ej. no recibió el OK)
+        self._attlog(cuerpo)
+        self.assertEqual(adms.volcar_pendientes(), 3)
+        self.assertEqual(PaqueteADMS.objects.count(), 0)
+        self.assertEqual(AsistenciaCruda.objects.filter(dispositivo=self.dispositivo).count(), 3)
+
+        # Los PIN nuevos se dan de alta, vinculados al empleado con ese doc_id
+        ud = UsuarioDispositivo.objects.get(dispositivo=self.dispositivo, user_id="1001")
+        self.assertEqual(ud.empleado, self.empleado)
+        self.assertEqual(AsistenciaCruda.objects.filter(usuario=ud).count(), 2)
+        salida = AsistenciaCruda.objects.get(user_id="1001", punch=1)
+        self.assertEqual((salida.status, salida.ts.hour), (1, 16))   # 17:05 en Malabo (UTC+1)
+
+    def test_descarta_lo_archivado(self):
+        # El terminal reenvía marcajes de un mes ya archivado
+        self._attlog("1001\t2025-02-27 08:00:00\t0\t1\n1001\t2025-03-03 08:00:00\t0\t1\n")
+        limite = timezone.make_aware(datetime(2025, 3, 1))
+        with mock.patch("dispositivos.archivo.limite_archivado", return_value=limite):
+            self.assertEqual(adms.volcar_pendientes(), 1)
+        self.assertEqual(AsistenciaCruda.objects.get().ts.date(), date(2025, 3, 3))
+
+    def test_operlog_usuarios(self):
+        self.client.post(
+            "/iclock/cdata?SN=SNADMS01&table=OPERLOG", content_type="text/plain",
+            data="USER PIN=1001\tName=Ana P\tPri=0\tPasswd=\tCard=\tGrp=1\nOPLOG 4\t0\t2025-03-03 08:00:00\t0\t0\t0\t0\n",
+        )
+        ud = UsuarioDispositivo.objects.get(dispositivo=self.dispositivo, user_id="1001")
+        self.assertEqual((ud.nombre, ud.privilegio, ud.empleado_id), ("Ana P", 0, self.empleado.pk))
+
+    def test_no_se_consulta(self):
+        self.assertFalse(captura.Servicio()._activos())
+
+
+class SincronizacionContadoresTests(MetricasTemporales, TestCase):
+    """sync_biometricos solo descarga la parte cuyo contador cambió en el terminal."""
+
+    def setUp(self):
+        self.sim = Simulador("CONTADORES", "127.0.0.1", 0, Config(usuarios=4, registros=30), protocolos=("tcp",)).iniciar()
+        self.dispositivo = Dispositivo.objects.create(
+            nombre="CONTADORES", ip="127.0.0.1", puerto=self.sim.puerto, omitir_ping=True, timeout=3,
+        )
+
+    def tearDown(self):
+        self.sim.detener()
+
+    def _sync(self, **kwargs):
+        salida = io.StringIO()
+        conn, _ = _conn_with_fallbacks(self.dispositivo)
+        SyncCommand(stdout=salida)._sincronizar_usuarios_y_registros(conn, self.dispositivo, **kwargs)
+        self.dispositivo.refresh_from_db()
+        return salida.getvalue()
+
+    def test_omite_sin_cambios(self):
+        salida = self._sync()
+        self.assertIn("Descargando usuarios", salida)
+        self.assertEqual((self.dispositivo.contador_usuarios, self.dispositivo.contador_registros), (4, 30))
+        self.assertEqual(AsistenciaCruda.objects.count(), 30)
+
+        salida = self._sync()
+        self.assertNotIn("Descargando", salida)
+
+        self.sim.terminal.marcar()
+        salida = self._sync()
+        self.assertNotIn("Descargando usuarios", salida)
+        self.assertIn("Descargando registros", salida)
+        self.assertEqual(AsistenciaCruda.objects.count(), 31)
+
+        self.assertIn("Descargando usuarios", self._sync(completa=True))
+
+    def test_bloqueo_solo_durante_la_transferencia(self):
+        # Con el terminal habilitado de nuevo antes de tocar la base de datos
+        estados = []
+        guardar = SyncCommand._guardar_registros
+
+        def _guardar(cmd, registros, dispositivo):
+            estados.append(self.sim.terminal.habilitado)
+            return guardar(cmd, registros, dispositivo)
+
+        with mock.patch.object(SyncCommand, "_guardar_registros", _guardar):
+            salida = self._sync()
+        self.assertEqual(estados, [True])
+        self.assertIn("Terminal bloqueado", salida)
+
+
+class TransferenciaAdaptativaTests(MetricasTemporales, TestCase):
+    """Las descargas por UDP con pérdida de datagramas reintentan solo el bloque que falla."""
+
+    def setUp(self):
+        config = Config(usuarios=300, registros=3000, perdida_datos=0.02)
+        self.sim = Simulador("PERDIDA", "127.0.0.1", 0, config, protocolos=("udp",)).iniciar()
+        self.dispositivo = Dispositivo.objects.create(
+            nombre="PERDIDA", ip="127.0.0.1", puerto=self.sim.puerto, protocolo="udp", omitir_ping=True, timeout=1,
+        )
+
+    def tearDown(self):
+        self.sim.detener()
+
+    def test_descarga_completa_con_perdida(self):
+        conn, _ = _conn_with_fallbacks(self.dispositivo)
+        SyncCommand(stdout=io.StringIO())._sincronizar_usuarios_y_registros(conn, self.dispositivo)
+        self.assertEqual(AsistenciaCruda.objects.count(), 3000)
+        ajuste = conn.ajuste_transferencia
+        self.assertGreater(ajuste.reintentos, 0)
+        self.dispositivo.refresh_from_db()
+        self.assertEqual(self.dispositivo.bloque_transferencia, ajuste.mejor())
+        self.assertNotIn(self.dispositivo.bloque_transferencia, ajuste.fallos)
+
+    def test_ajuste(self):
+        ajuste = transferencia.Ajuste(None, 4096)
+        self.assertEqual(ajuste.bloque, 4096)
+        ajuste.fallo()
+        self.assertEqual(ajuste.bloque, 2048)
+        for _ in range(transferencia.SUBIR_TRAS):
+            ajuste.exito(2048, 0.01)
+        self.assertEqual(ajuste.bloque, 4096)
+        self.assertEqual(ajuste.mejor(), 2048)   # 4096 falló
+
+
+class SinteticoTests(TestCase):
+    def test_limpiar_no_libera_user_ids_sinteticos(self):
+        sintetico.generar(1, 3, 0.05)
+        with self.captureOnCommitCallbacks(execute=True):
+            sintetico.limpiar()
+        (reservado,) = user_ids.reservar(1)
+        self.assertLess(int(reservado), sintetico.USER_ID_BASE)
+
+
+class MetricasIndicadoresTests(MetricasTemporales, TestCase):
+    """Cada indicador toma el valor fijado más recientemente, aunque otro archivo sea más nuevo."""
+
+    def _instantanea(self, nombre, escrito, indicadores):
+        (metricas._directorio() / nombre).write_text(json.dumps({
+            "escrito": escrito, "contadores": [], "histogramas": [],
+            "indicadores": [["zk_sync_ultimo_ok_timestamp", {"dispositivo": "D1"}, v, t] for v, t in indicadores],
+        }))
+
+    def test_valor_mas_reciente_por_serie(self):
+        ahora = time.time()
+        metricas._directorio().mkdir(parents=True, exist_ok=True)
+        self._instantanea("scheduler-1.json", ahora - 60, [(5, ahora - 60)])
+        # El proceso web lo fijó hace una hora y ha escrito su archivo después
+        self._instantanea("web-2.json", ahora, [(7200, ahora - 3600)])
+        self.assertIn('zk_sync_ultimo_ok_timestamp{dispositivo="D1"} 5\n', metricas.exposicion())
+        self.assertFalse(metricas._archivo_propio().exists())
+
+
+class ConexionesMetricasTests(MetricasTemporales, TestCase):
+    """Los contadores de conexiones de cada proceso se suman en /metrics."""
+
+    def test_suma_entre_procesos(self):
+        metricas._directorio().mkdir(parents=True, exist_ok=True)
+        (metricas._directorio() / "web-1.json").write_text(json.dumps({
+            "escrito": time.time(), "indicadores": [], "histogramas": [],
+            "contadores": [["zk_bd_cierres_total", {"proceso": "web"}, 3]],
+        }))
+        antes = dict(metricas._contadores)
+        try:
+            conexiones.registrar_cierre()
+            conexiones.registrar_obtencion(0.02, ok=True)
+            texto = metricas.exposicion()
+        finally:
+            metricas._contadores.clear()
+            metricas._contadores.update(antes)
+        self.assertIn('zk_bd_cierres_total{proceso="web"} 4\n', texto)
+        self.assertIn('zk_bd_obtencion_segundos_count{proceso="web",resultado="ok"}', texto)
@@ -0,0 +1,156 @@
+"""
+Lecturas por bloques con tamaño adaptativo para las descargas grandes.
+
+pyzk lee usuarios y marcajes del buffer del terminal (comandos 1503/1504)
+en bloques fijos (16 KB por UDP, ~64 KB por TCP) y, si un bloque falla, la
+descarga entera falla y hay que empezar de cero. Por enlaces WAN con
+pérdida de paquetes eso ocurre a menudo: un bloque de 16 KB son 16
+datagramas y basta con perder uno.
+
+instalar() sustituye read_with_buffer en la conexión por una lectura que:
+- usa bloques de como mucho max_size_tcp / max_size_udp del dispositivo;
+- reintenta solo el bloque que falla (hasta REINTENTOS veces seguidas),
+  con la mitad de tamaño, después de descartar respuestas atrasadas;
+- tras SUBIR_TRAS bloques seguidos sin error prueba el doble de tamaño;
+- mide el rendimiento (bytes/s) de cada tamaño usado.
+
+guardar() deja en Dispositivo.bloque_transferencia el tamaño con mejor
+rendimiento de los que no fallaron, y la siguiente descarga empieza con él.
+"""
+from __future__ import annotations
+
+import logging
+import select
+import time
+from struct import pack, unpack
+from typing import Dict, List
+
+from zk import const
+from zk.exception import ZKErrorResponse
+
+from zkmanager import metricas
+
+logger = logging.getLogger(__name__)
+
+BLOQUE_MIN = 1024          # un datagrama UDP de datos
+MAX_TCP = 0xFFC0           # máximos de pyzk
+MAX_UDP = 16 * 1024
+SUBIR_TRAS = 4
+REINTENTOS = 6
+
+
+class Ajuste:
+    """Tamaño de bloque en uso y rendimiento observado por tamaño."""
+
+    def __init__(self, inicial: int | None, maximo: int):
+        self.maximo = max(BLOQUE_MIN, maximo)
+        self.bloque = min(self.maximo, max(BLOQUE_MIN, inicial or self.maximo))
+        self.medidas: Dict[int, List[float]] = {}   # tamaño: [bytes, segundos]
+        self.fallos: Dict[int, int] = {}
+        self.reintentos = 0
+        self._racha = 0
+
+    def exito(self, n: int, segundos: float):
+        medida = self.medidas.setdefault(self.bloque, [0, 0.0])
+        medida[0] += n
+        medida[1] += segundos
+        self._racha += 1
+        if self._racha >= SUBIR_TRAS and self.bloque < self.maximo:
+            self.bloque = min(self.maximo, self.bloque * 2)
+            self._racha = 0
+
+    def fallo(self):
+        self.fallos[self.bloque] = self.fallos.get(self.bloque, 0) + 1
+        self.reintentos += 1
+        self.bloque = max(BLOQUE_MIN, self.bloque // 2)
+        self._racha = 0
+
+    def mejor(self) -> int:
+        candidatos = {
+            tam: b / s for tam, (b, s) in self.medidas.items() if s > 0 and not self.fallos.get(tam)
+        }
+        if not candidatos:
+            return self.bloque
+        return max(candidatos, key=candidatos.get)
+
+
+def _vaciar(conn, espera: float = 0.2):
+    """Descarta lo que quede en el socket de un bloque fallido (datagramas o bytes atrasados)."""
+    sock = conn._ZK__sock
+    fin = time.monotonic() + espera
+    while True:
+        restante = fin - time.monotonic()
+        if restante <= 0:
+            return
+        listos, _, _ = select.select([sock], [], [], restante)
+        if not listos:
+            return
+        try:
+            if not sock.recv(65536):
+                return
+        except OSError:
+            return
+
+
+def _leer_con_buffer(conn, ajuste: Ajuste, nombre: str, command, fct=0, ext=0):
+    """Como ZK.read_with_buffer, con el tamaño de bloque de `ajuste` y reintento por bloque."""
+    cmd_response = conn._ZK__send_command(1503, pack('<bhii', 1, command, fct, ext), 1024)
+    if not cmd_response.get('status'):
+        raise ZKErrorResponse("RWB Not supported")
+    if cmd_response['code'] == const.CMD_DATA:
+        # Datos pequeños: vienen en la misma respuesta
+        datos = conn._ZK__data
+        if conn.tcp and len(datos) < (conn._ZK__tcp_length - 8):
+            datos = datos + conn._ZK__recieve_raw_data((conn._ZK__tcp_length - 8) - len(datos))
+        return datos, len(datos)
+
+    total = unpack('I', conn._ZK__data[1:5])[0]
+    partes, inicio, seguidos = [], 0, 0
+    while inicio < total:
+        n = min(ajuste.bloque, total - inicio)
+        t0 = time.perf_counter()
+        try:
+            parte = conn._ZK__read_chunk(inicio, n)
+            if len(parte) != n:
+                raise ZKErrorResponse(f"bloque incompleto {inicio}:[{len(parte)}/{n}]")
+        except Exception as e:
+            seguidos += 1
+            ajuste.fallo()
+            metricas.inc("zk_transferencia_reintentos_total", dispositivo=nombre)
+            if seguidos > REINTENTOS:
+                raise
+            logger.info("Bloque %s:[%s] de %s falló (%s); reintento con %s bytes", inicio, n, nombre, e, ajuste.bloque)
+            _vaciar(conn)
+            continue
+        ajuste.exito(n, time.perf_counter() - t0)
+        seguidos = 0
+        partes.append(parte)
+        inicio += n
+    conn.free_data()
+    return b''.join(partes), inicio
+
+
+def instalar(conn, dispositivo):
+    """Lecturas de buffer de `conn` por bloques adaptativos (ver el docstring del módulo)."""
+    if conn.tcp:
+        maximo = min(dispositivo.max_size_tcp or MAX_TCP, MAX_TCP)
+    else:
+        maximo = min(dispositivo.max_size_udp or MAX_UDP, MAX_UDP)
+    ajuste = Ajuste(dispositivo.bloque_transferencia, maximo)
+    conn.ajuste_transferencia = ajuste
+    conn.read_with_buffer = lambda command, fct=0, ext=0: _leer_con_buffer(
+        conn, ajuste, dispositivo.nombre, command, fct, ext
+    )
+    return conn
+
+
+def guardar(conn, dispositivo):
+    """Guarda el mejor tamaño de bloque observado en la conexión, si se midió alguno y cambió."""
+    ajuste = getattr(conn, "ajuste_transferencia", None)
+    if ajuste is None or not ajuste.medidas:
+        return
+    mejor = ajuste.mejor()
+    metricas.fijar("zk_transferencia_bloque_bytes", mejor, dispositivo=dispositivo.nombre)
+    if mejor != dispositivo.bloque_transferencia:
+        dispositivo.bloque_transferencia = mejor
+        dispositivo.save(update_fields=["bloque_transferencia"])
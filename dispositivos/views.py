@@ -1,23 +1,34 @@
 # dispositivos/views.py
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import HttpResponseRedirect, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
+import csv
+import io
+import logging
 import socket
+import time
+import zlib
+from itertools import islice
 from zoneinfo import ZoneInfo
 from django.utils import timezone
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
 from django.http import StreamingHttpResponse
 from datetime import datetime
 from django.utils.dateparse import  parse_date
+from django.views.decorators.csrf import csrf_exempt
+from empleados import busqueda
+from . import adms, archivo, transferencia
 from .models import Dispositivo, UsuarioDispositivo, AsistenciaCruda
 from .forms import DispositivoForm
 from datetime import timezone as dt_timezone
 from django.utils.timezone import localtime
+from zkmanager import metricas
 
-
+logger = logging.getLogger(__name__)
 
 def _solo_admin(user):
     return user.is_authenticated and user.is_superuser
@@ -76,7 +87,8 @@ def _conn_with_fallbacks(dispositivo):
                 verbose=False,
             )
             conn = zk.connect()
-            return conn, pwd
+            # Descargas por bloques adaptativos (ver dispositivos/transferencia.py)
+            return transferencia.instalar(conn, dispositivo), pwd
         except Exception as e:
             last_exc = e
             continue
@@ -204,17 +216,20 @@ def descargar_usuarios(request, pk):
     try:
         conn, used = _conn_with_fallbacks(dispositivo)
         users = conn.get_users()
+        transferencia.guardar(conn, dispositivo)
+        metricas.inc("zk_sync_usuarios_leidos_total", len(users), dispositivo=dispositivo.nombre)
 
-        print(f"[DEBUG] Usuarios recibidos del equipo: {len(users)}")
-        if users:
-            try:
-                sample = users[0]
-                print("[DEBUG] Ejemplo de usuario:", vars(sample))
-            except Exception:
-                pass
+        logger.debug("Usuarios recibidos de %s: %s", dispositivo.nombre, len(users))
 
         creados = actualizados = omitidos = err = 0
 
+        # Usuarios ya guardados del dispositivo, por user_id y por uid: una consulta en total
+        existentes = list(UsuarioDispositivo.objects.filter(dispositivo=dispositivo))
+        por_user_id = {ud.user_id: ud for ud in existentes if ud.user_id}
+        por_uid = {ud.uid: ud for ud in existentes if ud.uid is not None}
+        campos = ("uid", "user_id", "nombre", "privilegio", "grupo_id", "activo")
+        nuevos, cambiados = [], {}
+
         for u in users:
             try:
                 uid_val = _to_int_or_none(_get(u, "uid", "UID", "id"))
@@ -232,15 +247,20 @@ def descargar_usuarios(request, pk):
                 # 2) Si no, y hay uid, usar (dispositivo, uid)
                 # 3) Si no hay ninguno, omitir
                 if user_id_val:
-                    lookup = dict(dispositivo=dispositivo, user_id=user_id_val)
+                    obj = por_user_id.get(user_id_val)
                 elif uid_val is not None:
-                    lookup = dict(dispositivo=dispositivo, uid=uid_val)
+                    obj = por_uid.get(uid_val)
                 else:
                     omitidos += 1
                     continue
 
-                # Defaults a actualizar
-                defaults = dict(
+                # Otro usuario del dispositivo ya tiene ese uid (unique_together)
+                otro = por_uid.get(uid_val) if uid_val is not None else None
+                if otro is not None and otro is not obj:
+                    raise ValueError(f"uid {uid_val} ya asignado a {otro.user_id or otro.pk}")
+
+                # Valores a guardar
+                valores = dict(
                     uid=uid_val,
                     user_id=user_id_val,
                     nombre=nombre_val,
@@ -249,17 +269,27 @@ def descargar_usuarios(request, pk):
                     activo=True,
                 )
 
-                obj, created = UsuarioDispositivo.objects.update_or_create(
-                    **lookup, defaults=defaults
-                )
-                if created:
+                if obj is None:
+                    obj = UsuarioDispositivo(dispositivo=dispositivo, **valores)
+                    nuevos.append(obj)
                     creados += 1
                 else:
+                    if obj.uid is not None and por_uid.get(obj.uid) is obj:
+                        del por_uid[obj.uid]
+                    if any(getattr(obj, k) != v for k, v in valores.items()):
+                        for k, v in valores.items():
+                            setattr(obj, k, v)
+                        if obj.pk:
+                            cambiados[obj.pk] = obj
                     actualizados += 1
+                if obj.user_id:
+                    por_user_id[obj.user_id] = obj
+                if obj.uid is not None:
+                    por_uid[obj.uid] = obj
 
             except Exception as e:
                 err += 1
-                print("[DEBUG] Error guardando usuario:", type(e).__name__, e, "datos=", {
+                logger.debug("Error guardando usuario: %s: %s datos=%s", type(e).__name__, e, {
                     "uid": _get(u, "uid", default=None),
                     "user_id": _get(u, "user_id", default=None),
                     "name": _get(u, "name", default=None),
@@ -268,6 +298,13 @@ def descargar_usuarios(request, pk):
                 })
                 continue
 
+        # Escrituras por lotes; bulk_* no pasa por save(): `busqueda` se asigna aquí
+        for obj in nuevos + list(cambiados.values()):
+            obj.busqueda = obj.texto_busqueda()
+        with transaction.atomic():
+            UsuarioDispositivo.objects.bulk_create(nuevos, batch_size=1000)
+            UsuarioDispositivo.objects.bulk_update(list(cambiados.values()), [*campos, "busqueda"], batch_size=500)
+
         conn.disconnect()
         messages.success(
             request,
@@ -288,26 +325,28 @@ def descargar_asistencia(request, pk):
 
     dispositivo = get_object_or_404(Dispositivo, pk=pk)
     tz_local = ZoneInfo(dispositivo.tz or 'Africa/Malabo')
+    inicio, resultado = time.perf_counter(), "error"
 
     try:
-        conn, used = _conn_with_fallbacks(dispositivo)
+        try:
+            conn, used = _conn_with_fallbacks(dispositivo)
+        except Exception:
+            metricas.inc("zk_sync_fallos_conexion_total", dispositivo=dispositivo.nombre)
+            resultado = "sin_conexion"
+            raise
         logs = conn.get_attendance()
+        transferencia.guardar(conn, dispositivo)
 
-        print(f"[DEBUG] Total logs recibidos: {len(logs)}")
-        if logs:
-            print("[DEBUG] Estructura del primer log:")
-            try:
-                print(vars(logs[0]))
-            except Exception as e:
-                print("vars(logs[0]) dio error:", type(e).__name__, e)
-            print("dir(logs[0]):", dir(logs[0]))
-            print("repr(logs[0]):", repr(logs[0]))
+        logger.debug("Marcajes recibidos de %s: %s", dispositivo.nombre, len(logs))
 
         mapa_usuarios = {
             u.user_id: u for u in UsuarioDispositivo.objects.filter(dispositivo=dispositivo)
         }
+        # Lo anterior al último mes archivado ya está en el archivo histórico
+        limite = archivo.limite_archivado(dispositivo.pk)
 
         objs = []
+        ultimo = None
         for r in logs:
             try:
                 data = vars(r)
@@ -317,6 +356,10 @@ def descargar_asistencia(request, pk):
                 if ts.tzinfo is None:
                     ts = ts.replace(tzinfo=tz_local)
                 ts_utc = ts.astimezone(dt_timezone.utc)
+                if ultimo is None or ts_utc > ultimo:
+                    ultimo = ts_utc
+                if limite and ts_utc < limite:
+                    continue
 
                 uid_val = data.get("uid")
                 if isinstance(uid_val, str) and uid_val.isdigit():
@@ -346,20 +389,24 @@ def descargar_asistencia(request, pk):
                     )
                 )
             except Exception as e:
-                print("[DEBUG] error procesando log:", type(e).__name__, e)
+                logger.debug("Error procesando marcaje: %s: %s", type(e).__name__, e)
                 continue
 
-        print(f"[DEBUG] Registros listos para insertar: {len(objs)}")
-
+        insertados = 0
         if objs:
+            # ignore_conflicts no informa de las filas insertadas: se comparan los totales
+            previo = AsistenciaCruda.objects.filter(dispositivo=dispositivo).count()
             AsistenciaCruda.objects.bulk_create(objs, ignore_conflicts=True)
-            total_db = AsistenciaCruda.objects.filter(dispositivo=dispositivo).count()
-            print(f"[DEBUG] Insertados en DB: {len(objs)}")
-            print(f"[DEBUG] Total acumulado en DB para {dispositivo.nombre}: {total_db}")
-        else:
-            print("[DEBUG] No se prepararon registros válidos.")
+            insertados = AsistenciaCruda.objects.filter(dispositivo=dispositivo).count() - previo
+        logger.debug("Marcajes de %s: %s válidos, %s nuevos", dispositivo.nombre, len(objs), insertados)
 
         conn.disconnect()
+        metricas.inc("zk_sync_registros_leidos_total", len(logs), dispositivo=dispositivo.nombre)
+        metricas.inc("zk_sync_registros_insertados_total", insertados, dispositivo=dispositivo.nombre)
+        if ultimo:
+            metricas.fijar("zk_ingesta_ultimo_marcaje_timestamp", ultimo.timestamp(), dispositivo=dispositivo.nombre)
+        metricas.fijar("zk_sync_ultimo_ok_timestamp", time.time(), dispositivo=dispositivo.nombre)
+        resultado = "ok"
         messages.success(
             request,
             f"Procesados {len(logs)} registros. Password usada: '{used}'.",
@@ -369,6 +416,9 @@ def descargar_asistencia(request, pk):
             request,
             f"Error al descargar registros: {e.__class__.__name__}: {e}",
         )
+    finally:
+        metricas.observar("zk_sync_duracion_segundos", time.perf_counter() - inicio, dispositivo=dispositivo.nombre)
+        metricas.inc("zk_sync_total", dispositivo=dispositivo.nombre, resultado=resultado)
     return redirect('config:index')
 
 
@@ -390,7 +440,11 @@ def asistencia_list(request):
 
     q = request.GET.get("q", "").strip()
     if q:
-        qs = qs.filter(Q(user_id__icontains=q) | Q(dispositivo__nombre__icontains=q))
+        # Solo hay marcajes con usuario vinculado: se resuelve a IDs de usuario y de dispositivo
+        qs = qs.filter(
+            Q(usuario_id__in=UsuarioDispositivo.objects.filter(user_id__contains=q).values_list("id", flat=True))
+            | Q(dispositivo_id__in=_dispositivos_por_nombre(q))
+        )
 
     dispositivo_id = request.GET.get("dispositivo")
     if dispositivo_id:
@@ -407,8 +461,8 @@ def asistencia_list(request):
             if not dt:
                 return None
             if end:
-                return datetime(dt.year, dt.month, dt.day, 23, 59, 59, tzinfo=timezone.utc)
-            return datetime(dt.year, dt.month, dt.day, 0, 0, 0, tzinfo=timezone.utc)
+                return datetime(dt.year, dt.month, dt.day, 23, 59, 59, tzinfo=dt_timezone.utc)
+            return datetime(dt.year, dt.month, dt.day, 0, 0, 0, tzinfo=dt_timezone.utc)
         except Exception:
             return None
 
@@ -437,18 +491,67 @@ def asistencia_list(request):
     return render(request, "dispositivos/asistencia_list.html", ctx)
 
 
+def _dispositivos_por_nombre(q: str, nombres: dict | None = None) -> list:
+    """
+    IDs de dispositivos cuyo nombre contiene `q`, sin distinguir acentos ni mayúsculas.
+    La tabla es pequeña: se filtra en Python y la consulta principal no necesita el join.
+    """
+    if nombres is None:
+        nombres = dict(Dispositivo.objects.values_list("id", "nombre"))
+    qn = busqueda.normalizar(q)
+    return [did for did, nombre in nombres.items() if qn in busqueda.normalizar(nombre)]
+
+
+def _csv_stream(header, rows, comprimir=False, lote=5000):
+    """
+    Serializa tuplas con csv.writer y emite bloques de ~`lote` filas.
+    Con `comprimir` el bloque sale ya en gzip (compresión incremental, sin buffer completo).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None  # wbits=31 -> cabecera gzip
+
+    def _vaciar():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return gz.compress(data) if gz else data
+
+    writer.writerow(header)
+    rows = iter(rows)
+    while True:
+        bloque = list(islice(rows, lote))
+        if not bloque:
+            break
+        writer.writerows(bloque)
+        chunk = _vaciar()
+        if chunk:
+            yield chunk
+
+    chunk = _vaciar()
+    if gz:
+        chunk += gz.flush()
+    if chunk:
+        yield chunk
+
+
 @login_required
 @user_passes_test(_solo_admin)
 def asistencia_export_csv(request):
     """
     Exporta el mismo filtro actual a CSV.
     Columnas: ts,user_id,dispositivo,status,punch
+    - gzip=1: comprime al vuelo (asistencias.csv.gz)
+    Recorre tuplas de values_list (cursor de servidor en PostgreSQL) y resuelve el
+    nombre del dispositivo con un dict en memoria en lugar de un JOIN.
     """
+    nombres = dict(Dispositivo.objects.values_list("id", "nombre"))
+
     # Reusar la lógica de filtros de asistencia_list
-    qs = AsistenciaCruda.objects.select_related("dispositivo").order_by("ts")
+    qs = AsistenciaCruda.objects.order_by("ts")
     q = request.GET.get("q", "").strip()
     if q:
-        qs = qs.filter(Q(user_id__icontains=q) | Q(dispositivo__nombre__icontains=q))
+        qs = qs.filter(Q(user_id__icontains=q) | Q(dispositivo_id__in=_dispositivos_por_nombre(q, nombres)))
     dispositivo_id = request.GET.get("dispositivo")
     if dispositivo_id:
         qs = qs.filter(dispositivo_id=dispositivo_id)
@@ -462,8 +565,8 @@ def asistencia_export_csv(request):
         if not dt:
             return None
         if end:
-            return datetime(dt.year, dt.month, dt.day, 23, 59, 59, tzinfo=timezone.utc)
-        return datetime(dt.year, dt.month, dt.day, 0, 0, 0, tzinfo=timezone.utc)
+            return datetime(dt.year, dt.month, dt.day, 23, 59, 59, tzinfo=dt_timezone.utc)
+        return datetime(dt.year, dt.month, dt.day, 0, 0, 0, tzinfo=dt_timezone.utc)
 
     dt_desde = _to_dt(desde, end=False)
     dt_hasta = _to_dt(hasta, end=True)
@@ -473,12 +576,20 @@ def asistencia_export_csv(request):
         qs = qs.filter(ts__lte=dt_hasta)
 
     def row_iter():
-        yield "ts,user_id,dispositivo,status,punch\r\n"
-        for r in qs.iterator(chunk_size=1000):
-            yield f"{r.ts.isoformat()},{r.user_id},{r.dispositivo.nombre},{r.status},{'' if r.punch is None else r.punch}\r\n"
-
-    resp = StreamingHttpResponse(row_iter(), content_type="text/csv")
-    resp["Content-Disposition"] = 'attachment; filename="asistencias.csv"'
+        # punch None -> campo vacío (csv.writer escribe None como '')
+        for ts, user_id, did, status, punch in qs.values_list(
+            "ts", "user_id", "dispositivo_id", "status", "punch"
+        ).iterator(chunk_size=5000):
+            yield (ts.isoformat(), user_id, nombres.get(did, ""), status, punch)
+
+    comprimir = request.GET.get("gzip") in ("1", "true", "si")
+    stream = _csv_stream(("ts", "user_id", "dispositivo", "status", "punch"), row_iter(), comprimir=comprimir)
+    if comprimir:
+        resp = StreamingHttpResponse(stream, content_type="application/gzip")
+        resp["Content-Disposition"] = 'attachment; filename="asistencias.csv.gz"'
+    else:
+        resp = StreamingHttpResponse(stream, content_type="text/csv")
+        resp["Content-Disposition"] = 'attachment; filename="asistencias.csv"'
     return resp
 
     
@@ -498,11 +609,7 @@ def usuario_list(request):
     activo = request.GET.get("activo")
 
     if q:
-        qs = qs.filter(
-            Q(user_id__icontains=q) |
-            Q(nombre__icontains=q) |
-            Q(dispositivo__nombre__icontains=q)
-        )
+        qs = qs.filter(busqueda.filtro(q) | Q(dispositivo_id__in=_dispositivos_por_nombre(q)))
     if dispositivo_id:
         qs = qs.filter(dispositivo_id=dispositivo_id)
     if activo in ("0", "1"):
@@ -532,11 +639,7 @@ def usuario_export_csv(request):
     activo = request.GET.get("activo")
 
     if q:
-        qs = qs.filter(
-            Q(user_id__icontains=q) |
-            Q(nombre__icontains=q) |
-            Q(dispositivo__nombre__icontains=q)
-        )
+        qs = qs.filter(busqueda.filtro(q) | Q(dispositivo_id__in=_dispositivos_por_nombre(q)))
     if dispositivo_id:
         qs = qs.filter(dispositivo_id=dispositivo_id)
     if activo in ("0","1"):
@@ -653,3 +756,53 @@ def reporte_asistencia(request):
         "user_id": user_q,
     })
 
+
+
+# ======================================================================================
+# ADMS (iclock): los terminales envían por HTTP. Sin sesión; se identifican por SN.
+# Ver dispositivos/adms.py.
+# ======================================================================================
+def _texto(contenido, status=200):
+    return HttpResponse(contenido, content_type="text/plain", status=status)
+
+
+def _dispositivo_adms(request, tipo):
+    dispositivo = adms.dispositivo((request.GET.get("SN") or "").strip())
+    if dispositivo is not None:
+        metricas.inc("zk_adms_peticiones_total", dispositivo=dispositivo.nombre, tipo=tipo)
+    else:
+        logger.warning("Petición ADMS de un SN no registrado: %r (%s)", request.GET.get("SN"), request.META.get("REMOTE_ADDR"))
+    return dispositivo
+
+
+@csrf_exempt
+def iclock_cdata(request):
+    if request.method not in ("GET", "POST"):
+        return _texto("Método no permitido", status=405)
+    tabla = (request.GET.get("table") or "").upper()
+    dispositivo = _dispositivo_adms(request, tabla.lower() if request.method == "POST" else "inicio")
+    if dispositivo is None:
+        return _texto("Dispositivo desconocido", status=403)
+    if request.method == "GET":
+        return _texto(adms.opciones(dispositivo))
+
+    cuerpo = request.body.decode("utf-8", errors="replace")
+    if tabla == "ATTLOG":
+        return _texto(f"OK: {adms.encolar(dispositivo, cuerpo)}")
+    if tabla == "OPERLOG":
+        adms.usuarios(dispositivo, cuerpo)
+    return _texto("OK")
+
+
+def iclock_getrequest(request):
+    if _dispositivo_adms(request, "sondeo") is None:
+        return _texto("Dispositivo desconocido", status=403)
+    # No se envían órdenes al terminal
+    return _texto("OK")
+
+
+@csrf_exempt
+def iclock_devicecmd(request):
+    if _dispositivo_adms(request, "orden") is None:
+        return _texto("Dispositivo desconocido", status=403)
+    return _texto("OK")
@@ -6,7 +6,8 @@ from django import forms
 from django.utils.html import format_html
 import json
 
-from .models import Empleado, Candidato, Documento, BajaAutorizada
+from .models import Empleado, Candidato, Contenido, Documento, BajaAutorizada, Departamento, Area
+from .importacion import importar_candidatos_json, importar_empleados_excel
 
 class ImportCandidatosForm(forms.Form):
     json_file = forms.FileField(label="Archivo JSON")
@@ -25,6 +26,20 @@ from datetime import datetime
 
 class ImportEmpleadosForm(forms.Form):
     excel_file = forms.FileField(label="Archivo Excel (.xlsx)")
+    simular = forms.BooleanField(label="Solo simular", required=False,
+                                 help_text="Muestra qué se crearía o actualizaría sin guardar cambios.")
+
+class AreaInline(admin.TabularInline):
+    model = Area
+    extra = 0
+
+
+@admin.register(Departamento)
+class DepartamentoAdmin(admin.ModelAdmin):
+    list_display = ("nombre",)
+    search_fields = ("nombre",)
+    inlines = [AreaInline]
+
 
 @admin.register(Empleado)
 class EmpleadoAdmin(admin.ModelAdmin):
@@ -41,8 +56,8 @@ class EmpleadoAdmin(admin.ModelAdmin):
     )
     list_filter = (
         "tipo_vinculacion",
-        "departamento",
-        "area",
+        "departamento_ref",
+        "area_ref",
         "activo",
     )
     search_fields = (
@@ -83,91 +98,24 @@ class EmpleadoAdmin(admin.ModelAdmin):
         return my_urls + urls
 
     def import_excel_view(self, request):
+        informe = None
         if request.method == "POST":
             form = ImportEmpleadosForm(request.POST, request.FILES)
             if form.is_valid():
-                f = request.FILES["excel_file"]
+                simular = form.cleaned_data["simular"]
                 try:
-                    wb = openpyxl.load_workbook(f)
-                    ws = wb.active
-                    
-                    count_created = 0
-                    count_updated = 0
-                    
-                    # Asumimos que la primera fila es encabezado
-                    for row in ws.iter_rows(min_row=2, values_only=True):
-                        # Mapeo basado en imagen:
-                        # 0: NOMBRE COMPLETO
-                        # 1: ESTADO
-                        # 2: SECTOR/DEPARTAMENTO
-                        # 3: NIVEL ACADEMICO (Ignorar/Nota?)
-                        # 4: ESPECIALIDAD (Ignorar?)
-                        # 5: PAIS (Ignorar?)
-                        # 6: IDIOMAS (Ignorar?)
-                        # 7: FECHA DE ALTA
-                        # 8: EDAD
-                        # 9: TELÉFONO
-                        
-                        if not row[0]: # Si no hay nombre, saltar
-                            continue
-
-                        nombre_completo = str(row[0]).strip()
-                        parts = nombre_completo.split(" ", 1)
-                        if len(parts) > 1:
-                            nombre = parts[0]
-                            apellido = parts[1]
-                        else:
-                            nombre = parts[0]
-                            apellido = ""
-                        
-                        estado_raw = str(row[1] or "").upper()
-                        tipo_vinc = "FUNC" # Default
-                        if "CONTRAT" in estado_raw:
-                            tipo_vinc = "CONT"
-                        elif "PRACT" in estado_raw:
-                            tipo_vinc = "PRAC"
-                        elif "FUNCION" in estado_raw:
-                            tipo_vinc = "FUNC"
-                        
-                        departamento = str(row[2] or "").strip()
-                        fecha_alta_raw = row[7]
-                        telefono = str(row[9] or "").strip()
-                        
-                        # Generar doc_id temporal si no existe o usar uno ficticio consistente
-                        # Usaremos una lógica determinista simple para evitar duplicados en pruebas
-                        # En producción idealmente el excel traería DNI.
-                        # Aquí usaremos HASH o algo simple del nombre si no hay otra cosa.
-                        # Mejor: MIGRACION-{hash(nombre_completo)}
-                        doc_id = f"MIG-{abs(hash(nombre_completo))}"[:20]
-
-                        # Numero nómina: igual
-                        numero = f"N-{abs(hash(nombre_completo))}"[:10]
-
-                        defaults = {
-                            "nombre": nombre[:60],
-                            "apellido": apellido[:60],
-                            "departamento": departamento[:80],
-                            "tipo_vinculacion": tipo_vinc,
-                            "telefono": telefono[:20],
-                            "numero": numero,
-                            "salario_base": 0.00 # Default
-                        }
-                        
-                        obj, created = Empleado.objects.update_or_create(
-                            doc_id=doc_id,
-                            defaults=defaults
-                        )
-                        
-                        if created:
-                            count_created += 1
-                        else:
-                            count_updated += 1
-
-                    messages.success(request, f"Importación Excel completada: {count_created} creados, {count_updated} actualizados.")
-                    return redirect("admin:empleados_empleado_changelist")
-
+                    informe = importar_empleados_excel(request.FILES["excel_file"], simular=simular)
                 except Exception as e:
                     messages.error(request, f"Error procesando archivo Excel: {str(e)}")
+                else:
+                    resumen = (
+                        f"{informe['creados']} creados, {informe['actualizados']} actualizados, "
+                        f"{informe['sin_cambios']} sin cambios."
+                    )
+                    if not simular:
+                        messages.success(request, f"Importación Excel completada: {resumen}")
+                        return redirect("admin:empleados_empleado_changelist")
+                    messages.info(request, f"Simulación (no se ha guardado nada): {resumen}")
         else:
             form = ImportEmpleadosForm()
 
@@ -175,6 +123,7 @@ class EmpleadoAdmin(admin.ModelAdmin):
             **self.admin_site.each_context(request),
             "opts": self.model._meta,
             "form": form,
+            "informe": informe,
             "title": "Importar Empleados desde Excel"
         }
         return render(request, "admin/empleados/empleado/import_form.html", context)
@@ -225,46 +174,35 @@ class CandidatoAdmin(admin.ModelAdmin):
             form = ImportCandidatosForm(request.POST, request.FILES)
             if form.is_valid():
                 f = request.FILES["json_file"]
+                # Último informe parcial (tras cada lote), para decir hasta dónde llegó si falla
+                parcial = {}
+                motivo = ""
                 try:
-                    data = json.load(f)
-                    # Si es una lista, iteramos
-                    if isinstance(data, list):
-                        count_created = 0
-                        count_updated = 0
-                        for item in data:
-                            # Mapeo de campos. Se busca por doc_id para no duplicar.
-                            # Ajusta las claves según el JSON esperado.
-                            doc_id = str(item.get("doc_id", "")).strip()
-                            if not doc_id:
-                                continue # Skip si no hay doc_id
-
-                            defaults = {
-                                "nombre": item.get("nombre", "")[:60],
-                                "apellido": item.get("apellido", "")[:60],
-                                "email": item.get("email", ""),
-                                "telefono": item.get("telefono", "")[:20],
-                                "skills": item.get("skills", ""),
-                                "titulaciones": item.get("titulaciones", ""),
-                                "nota": item.get("nota", ""),
-                            }
-
-                            obj, created = Candidato.objects.update_or_create(
-                                doc_id=doc_id,
-                                defaults=defaults
-                            )
-                            if created:
-                                count_created += 1
-                            else:
-                                count_updated += 1
-                        
-                        messages.success(request, f"Importación completada: {count_created} creados, {count_updated} actualizados.")
-                        return redirect("admin:empleados_candidato_changelist")
-                    else:
-                        messages.error(request, "El JSON debe ser una lista de objetos.")
+                    informe = importar_candidatos_json(f, progreso=parcial.update)
                 except json.JSONDecodeError:
-                    messages.error(request, "Error decodificando el archivo JSON.")
+                    motivo = "Error decodificando el archivo JSON."
+                except ValueError as e:
+                    motivo = str(e)
                 except Exception as e:
-                    messages.error(request, f"Error procesando archivo: {str(e)}")
+                    motivo = f"Error procesando archivo: {str(e)}"
+                if motivo:
+                    if parcial:
+                        motivo += (
+                            f" Se llegó a {parcial['procesados']} procesados ({parcial['creados']} creados, "
+                            f"{parcial['total_errores']} con error); no se guardó ninguno."
+                        )
+                    messages.error(request, motivo)
+                else:
+                    messages.success(
+                        request,
+                        f"Importación completada: {informe['procesados']} procesados, {informe['creados']} creados, "
+                        f"{informe['actualizados']} actualizados, {informe['sin_cambios']} sin cambios, "
+                        f"{informe['total_errores']} con error.",
+                    )
+                    if informe["total_errores"]:
+                        detalle = "; ".join(f"#{i}: {causa}" for i, causa in informe["errores"][:10])
+                        messages.warning(request, f"{informe['total_errores']} elementos omitidos. {detalle}")
+                    return redirect("admin:empleados_candidato_changelist")
         else:
             form = ImportCandidatosForm()
 
@@ -279,9 +217,25 @@ class CandidatoAdmin(admin.ModelAdmin):
 
 @admin.register(Documento)
 class DocumentoAdmin(admin.ModelAdmin):
-    list_display = ("tipo", "descripcion", "empleado", "candidato", "subido_en")
+    list_display = ("tipo", "descripcion", "nombre_original", "empleado", "candidato", "subido_en")
     list_filter = ("tipo", "subido_en")
-    search_fields = ("descripcion", "empleado__nombre", "candidato__nombre")
+    search_fields = ("descripcion", "nombre_original", "empleado__nombre", "candidato__nombre")
+
+
+@admin.register(Contenido)
+class ContenidoAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "tamano", "referencias", "creado_en")
+    search_fields = ("sha256",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Se borra solo al liberarse la última referencia
+        return False
 
 
 @admin.register(BajaAutorizada)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EmpleadosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'empleados'
+
+    def ready(self):
+        # Conecta la invalidación de la caché de departamentos/áreas, la liberación de
+        # user_id y el recuento de referencias de los documentos
+        from . import dimensiones, documentos, user_ids  # noqa: F401
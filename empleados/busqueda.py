@@ -0,0 +1,125 @@
+"""
+Búsqueda de personas por texto libre.
+
+Empleado, Candidato y UsuarioDispositivo guardan en `busqueda` sus campos de
+texto ya normalizados (sin acentos, en minúsculas, espacios colapsados). Las
+vistas comparan contra esa única columna en lugar de encadenar `icontains`
+sobre varios campos y joins:
+
+- En PostgreSQL la columna tiene un índice GIN trigram (pg_trgm) que resuelve
+  `LIKE '%texto%'`.
+- En SQLite no hay índice para subcadenas; se recorre una sola columna corta
+  y ya normalizada, sin funciones por fila.
+
+Para la tabla de marcajes, primero se resuelve la búsqueda a IDs de empleado o
+de usuario de dispositivo y después se filtra AsistenciaCruda por esos IDs.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from typing import List, Tuple
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q, QuerySet
+
+logger = logging.getLogger(__name__)
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar(*partes) -> str:
+    """Une las partes y elimina acentos, mayúsculas y espacios repetidos."""
+    texto = " ".join(str(p) for p in partes if p not in (None, ""))
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", texto.casefold()).strip()
+
+
+def filtro(q: str, campo: str = "busqueda") -> Q:
+    """
+    Q que exige cada palabra de `q` dentro de `campo` (ya normalizado).
+    "jose perez" encuentra "José Pérez Ndong".
+    """
+    cond = Q()
+    for palabra in normalizar(q).split(" "):
+        if palabra:
+            cond &= Q(**{f"{campo}__contains": palabra})
+    return cond
+
+
+def ids_empleados(q: str) -> QuerySet:
+    """Queryset de ids de empleado que coinciden; usado en `__in` queda como subconsulta."""
+    from .models import Empleado
+
+    return Empleado.objects.filter(filtro(q)).values("id")
+
+
+def usuarios_dispositivo(q: str, solo_empleados: bool = False) -> List[Tuple[int, int, str]]:
+    """
+    (id, dispositivo_id, user_id) de los usuarios de dispositivo que coinciden
+    por su propio texto (user_id, nombre) o por el de su empleado vinculado.
+    """
+    from dispositivos.models import UsuarioDispositivo
+
+    cond = filtro(q, "empleado__busqueda")
+    if not solo_empleados:
+        cond |= filtro(q)
+    return list(UsuarioDispositivo.objects.filter(cond).values_list("id", "dispositivo_id", "user_id"))
+
+
+class ConBusqueda:
+    """
+    Mixin de modelo: recalcula `busqueda` a partir de CAMPOS_BUSQUEDA en cada save().
+    Las escrituras masivas (bulk_create/update) deben asignarla con `texto_busqueda()`.
+    """
+    CAMPOS_BUSQUEDA: Tuple[str, ...] = ()
+
+    def texto_busqueda(self) -> str:
+        return normalizar(*(getattr(self, c) for c in self.CAMPOS_BUSQUEDA))
+
+    def save(self, *args, **kwargs):
+        self.busqueda = self.texto_busqueda()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "busqueda"}
+        super().save(*args, **kwargs)
+
+
+# --------------------------------------------------------------------------------------
+# Utilidades para migraciones
+# --------------------------------------------------------------------------------------
+def rellenar(modelo, campos: Tuple[str, ...], lote: int = 1000):
+    """Calcula `busqueda` para todas las filas existentes (acepta modelos históricos)."""
+    pendientes = []
+    for obj in modelo.objects.only("pk", *campos).iterator(chunk_size=lote):
+        obj.busqueda = normalizar(*(getattr(obj, c) for c in campos))
+        pendientes.append(obj)
+        if len(pendientes) >= lote:
+            modelo.objects.bulk_update(pendientes, ["busqueda"])
+            pendientes = []
+    if pendientes:
+        modelo.objects.bulk_update(pendientes, ["busqueda"])
+
+
+def crear_indice_trigram(schema_editor, tabla: str, nombre: str):
+    """
+    Índice GIN trigram sobre `busqueda` (solo PostgreSQL). Si no se puede crear
+    la extensión pg_trgm por permisos, la búsqueda sigue funcionando sin índice.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{tabla}" USING gin (busqueda gin_trgm_ops)'
+            )
+    except DatabaseError as e:
+        logger.warning("No se pudo crear el índice trigram %s: %s", nombre, e)
+
+
+def eliminar_indice_trigram(schema_editor, nombre: str):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{nombre}"')
@@ -0,0 +1,133 @@
+"""
+Caché en memoria de la dimensión Departamento/Área.
+
+Los desplegables y filtros por departamento se sirven desde aquí sin consultar la
+base de datos. La caché se invalida al guardar o borrar un Departamento/Área en
+este proceso y, como red de seguridad para los demás procesos (servidor y
+scheduler), caduca a los CACHE_TTL segundos.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import List, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .busqueda import normalizar
+from .models import Area, Departamento
+
+CACHE_TTL = 60
+
+_ESPACIOS = re.compile(r"\s+")
+_lock = threading.Lock()
+_cache: dict = {"datos": None, "expira": 0.0}
+
+
+def _cargar() -> dict:
+    deps = list(Departamento.objects.order_by("nombre").values_list("id", "nombre", "clave"))
+    areas = list(Area.objects.order_by("nombre").values_list("id", "departamento_id", "nombre", "clave"))
+    return {
+        "departamentos": [(i, n) for i, n, _ in deps],
+        "por_nombre": {c: (i, n) for i, n, c in deps},
+        "areas": {(d, c): (i, n) for i, d, n, c in areas},
+    }
+
+
+def _datos() -> dict:
+    datos = _cache["datos"]
+    if datos is None or time.monotonic() >= _cache["expira"]:
+        with _lock:
+            datos = _cargar()
+            _cache["datos"], _cache["expira"] = datos, time.monotonic() + CACHE_TTL
+    return datos
+
+
+@receiver(post_save, sender=Departamento)
+@receiver(post_delete, sender=Departamento)
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+def invalidar(**kwargs):
+    _cache["datos"] = None
+
+
+# --------------------------------------------------------------------------------------
+# Consultas
+# --------------------------------------------------------------------------------------
+def departamentos() -> List[str]:
+    """Nombres de departamento ordenados, para los desplegables."""
+    return [n for _, n in _datos()["departamentos"]]
+
+
+def id_departamento(nombre: str) -> int | None:
+    encontrado = _datos()["por_nombre"].get(normalizar(nombre))
+    return encontrado[0] if encontrado else None
+
+
+def filtro_departamento(nombre: str, campo: str = "departamento_ref") -> Q:
+    """Q por FK de departamento a partir del nombre recibido en la URL (sin resultados si no existe)."""
+    did = id_departamento(nombre)
+    return Q(**{campo: did}) if did else Q(pk__in=[])
+
+
+def resolver(departamento: str, area: str, verificar: bool = True) -> Tuple[str, str, int | None, int | None]:
+    """
+    Normaliza el texto libre de departamento/área del formulario o la importación.
+    Devuelve (departamento, area, departamento_id, area_id) con los nombres
+    canónicos; crea las entradas que aún no existen. "rrhh ", "RRHH",
+    "Administracion" y "Administración" se comparan por su clave normalizada.
+
+    Los ids salen de la caché, que en otro proceso pudo quedar con entradas ya
+    borradas; con `verificar` se comprueba que sigan existiendo antes de
+    devolverlos para una escritura (si no, se recarga y se crean). Las cargas
+    masivas pasan verificar=False tras invalidar() la caché al empezar.
+    """
+    departamento = _ESPACIOS.sub(" ", departamento or "").strip()[:80]
+    area = _ESPACIOS.sub(" ", area or "").strip()[:80]
+    if not departamento:
+        return "", area, None, None
+
+    # Misma clave que la caché (Departamento.clave / Area.clave), también si la caché no
+    # tiene aún una entrada creada por otro proceso
+    clave = normalizar(departamento)
+    dep = _datos()["por_nombre"].get(clave)
+    if dep is not None and verificar and not _vigente(Departamento, dep[0], clave):
+        dep = None
+    if dep is None:
+        obj = _obtener_o_crear(Departamento, {"clave": clave}, nombre=departamento)
+        dep = (obj.pk, obj.nombre)
+    if not area:
+        return dep[1], "", dep[0], None
+
+    clave = normalizar(area)
+    ar = _datos()["areas"].get((dep[0], clave))
+    if ar is not None and verificar and not _vigente(Area, ar[0], clave):
+        ar = None
+    if ar is None:
+        obj = _obtener_o_crear(Area, {"departamento_id": dep[0], "clave": clave}, nombre=area)
+        ar = (obj.pk, obj.nombre)
+    return dep[1], ar[1], dep[0], ar[0]
+
+
+def _vigente(modelo, pk: int, clave: str) -> bool:
+    if modelo.objects.filter(pk=pk, clave=clave).exists():
+        return True
+    invalidar()
+    return False
+
+
+def _obtener_o_crear(modelo, filtro: dict, nombre: str):
+    obj = modelo.objects.filter(**filtro).first()
+    if obj is None:
+        try:
+            with transaction.atomic():
+                obj = modelo.objects.create(nombre=nombre, **{k: v for k, v in filtro.items() if k != "clave"})
+        except IntegrityError:
+            # Otro proceso lo creó a la vez
+            obj = modelo.objects.get(**filtro)
+    invalidar()
+    return obj
@@ -0,0 +1,161 @@
+"""
+Almacenamiento de documentos por contenido.
+
+Cada archivo subido se guarda una sola vez en `documentos/sha256/ab/cd/<sha256>`
+(bajo MEDIA_ROOT):
+
+- La subida se copia a un temporal por trozos calculando el SHA-256 a la vez,
+  sin leer el archivo completo en memoria. Si el contenido ya existía, el
+  temporal se descarta.
+- Contenido lleva la cuenta de los Documento que apuntan a cada archivo. Al
+  borrar el último, se elimina el archivo tras el commit.
+- Al promover un candidato sus documentos se comparten con el nuevo empleado
+  sin copiar bytes.
+
+La descarga (vista documento_descargar) usa el SHA-256 como ETag fuerte.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Contenido, Documento
+
+PREFIJO = "documentos/sha256"
+
+
+def ruta_blob(sha256: str) -> str:
+    return f"{PREFIJO}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def _absoluta(ruta: str) -> Path:
+    return Path(default_storage.path(ruta))
+
+
+def _volcar(trozos: Iterable[bytes]) -> Tuple[str, int, str]:
+    """Escribe los trozos en un temporal. Devuelve (sha256, tamaño, ruta del temporal)."""
+    directorio = _absoluta(f"{PREFIJO}/tmp")
+    directorio.mkdir(parents=True, exist_ok=True)
+    h, tamano = hashlib.sha256(), 0
+    with tempfile.NamedTemporaryFile(dir=directorio, delete=False) as fh:
+        try:
+            for trozo in trozos:
+                h.update(trozo)
+                fh.write(trozo)
+                tamano += len(trozo)
+            fh.flush()
+            os.fsync(fh.fileno())
+        except BaseException:
+            os.unlink(fh.name)
+            raise
+    return h.hexdigest(), tamano, fh.name
+
+
+def _colocar(tmp: str, sha256: str):
+    """Mueve el temporal a su ruta definitiva, salvo que ese contenido ya esté en disco."""
+    destino = _absoluta(ruta_blob(sha256))
+    if destino.exists():
+        os.unlink(tmp)
+        return
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, destino)
+
+
+def _sumar(contenido_id: int, n: int = 1):
+    Contenido.objects.filter(pk=contenido_id).update(referencias=F("referencias") + n)
+
+
+def almacenar(doc: Documento):
+    """
+    Guarda el archivo recién subido de `doc` por contenido y deja `doc.archivo`
+    apuntando al blob. Lo llama Documento.save() dentro de su transacción.
+    """
+    subido = doc.archivo.file
+    if hasattr(subido, "seek"):
+        subido.seek(0)
+    trozos = subido.chunks() if hasattr(subido, "chunks") else iter(lambda: subido.read(64 * 1024), b"")
+    sha256, tamano, tmp = _volcar(trozos)
+    try:
+        # El bloqueo evita que un liberar() simultáneo borre el blob que se está reutilizando
+        contenido, _ = Contenido.objects.select_for_update().get_or_create(sha256=sha256, defaults={"tamano": tamano})
+        _colocar(tmp, sha256)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    _sumar(contenido.pk)
+
+    doc.contenido = contenido
+    doc.nombre_original = os.path.basename(doc.archivo.name or "")[:255]
+    doc.archivo.name = ruta_blob(sha256)
+    doc.archivo._committed = True
+
+
+def copiar(doc: Documento, **destino) -> Documento:
+    """Nuevo Documento con el mismo contenido (p. ej. empleado=...) sin duplicar el archivo."""
+    with transaction.atomic():
+        nuevo = Documento.objects.create(
+            tipo=doc.tipo,
+            descripcion=doc.descripcion,
+            archivo=doc.archivo.name,
+            contenido_id=doc.contenido_id,
+            nombre_original=doc.nombre_original,
+            **destino,
+        )
+        if doc.contenido_id:
+            _sumar(doc.contenido_id)
+    return nuevo
+
+
+def liberar(contenido_id: int):
+    """Resta una referencia; si no quedan, borra el registro y, tras el commit, el archivo."""
+    with transaction.atomic():
+        contenido = Contenido.objects.select_for_update().filter(pk=contenido_id).first()
+        if contenido is None:
+            return
+        if contenido.referencias > 1:
+            _sumar(contenido_id, -1)
+            return
+        sha256 = contenido.sha256
+        contenido.delete()
+    transaction.on_commit(lambda: _borrar_blob(sha256))
+
+
+def _borrar_blob(sha256: str):
+    # Si mientras tanto se volvió a subir el mismo contenido, el archivo se conserva
+    if not Contenido.objects.filter(sha256=sha256).exists():
+        _absoluta(ruta_blob(sha256)).unlink(missing_ok=True)
+
+
+@receiver(post_delete, sender=Documento)
+def _liberar_al_borrar(sender, instance, **kwargs):
+    if instance.contenido_id:
+        liberar(instance.contenido_id)
+
+
+# --------------------------------------------------------------------------------------
+# Documentos anteriores (migración 0007)
+# --------------------------------------------------------------------------------------
+def limpiar_originales(borrar: bool = True) -> list:
+    """
+    Originales de documentos ya migrados que siguen en disco (y los borra si
+    `borrar`). Solo los que tienen su blob y a los que ningún Documento apunta.
+    """
+    en_uso = set(Documento.objects.values_list("archivo", flat=True))
+    out = []
+    for doc in Documento.objects.exclude(ruta_anterior="").exclude(contenido__isnull=True).iterator():
+        origen = _absoluta(doc.ruta_anterior)
+        if doc.ruta_anterior in en_uso or not origen.is_file() or not _absoluta(doc.archivo.name).is_file():
+            continue
+        out.append(doc.ruta_anterior)
+        if borrar:
+            origen.unlink()
+    return out
@@ -0,0 +1,108 @@
+"""
+Versiones reducidas de Empleado.foto.
+
+Las fotos suben tal cual salen del móvil (varios MB). Para mostrarlas se usan
+versiones JPEG recomprimidas, una por tamaño de TAMANOS, guardadas en
+`empleados/fotos/versiones/<tamano>/<digest>.jpg` bajo MEDIA_ROOT:
+
+- Al guardar una foto nueva se generan todas en un hilo en segundo plano,
+  tras el commit.
+- Si falta alguna (fotos anteriores, fallo del hilo), la vista empleado_foto la
+  genera en la primera petición y queda en disco.
+
+El digest sale del nombre del archivo original. Django no reutiliza nombres al
+subir, así que una foto nueva cambia el digest y la URL puede cachearse sin
+caducidad.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# nombre: (ancho, alto, recortar al cuadrado, calidad JPEG)
+TAMANOS = {
+    "avatar": (128, 128, True, 80),      # listas y cabecera de la ficha
+    "detalle": (480, 480, False, 82),    # tarjeta de foto de la ficha
+    "impresion": (1200, 1200, False, 88),  # ficha para imprimir
+}
+CARPETA = "empleados/fotos/versiones"
+
+
+def digest(nombre: str) -> str:
+    return hashlib.sha1(nombre.encode("utf-8")).hexdigest()[:16]
+
+
+def ruta_version(nombre: str, tamano: str) -> Path:
+    return Path(default_storage.path(f"{CARPETA}/{tamano}/{digest(nombre)}.jpg"))
+
+
+def url(empleado, tamano: str = "avatar") -> str:
+    if not empleado.foto:
+        return ""
+    base = reverse("empleados:foto", args=[empleado.pk, tamano])
+    return f"{base}?v={digest(empleado.foto.name)}"
+
+
+def generar(nombre: str, tamano: str) -> Path:
+    """Crea (o rehace) la versión `tamano` de la foto `nombre` y devuelve su ruta."""
+    ancho, alto, recortar, calidad = TAMANOS[tamano]
+    destino = ruta_version(nombre, tamano)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(default_storage.path(nombre)) as img:
+        img.draft("RGB", (ancho * 2, alto * 2))  # JPEG: decodifica ya reducido
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if recortar:
+            img = ImageOps.fit(img, (ancho, alto), Image.LANCZOS)
+        else:
+            img.thumbnail((ancho, alto), Image.LANCZOS)
+        fd, tmp = tempfile.mkstemp(dir=destino.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                img.save(fh, "JPEG", quality=calidad, optimize=True, progressive=True)
+            os.replace(tmp, destino)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    return destino
+
+
+def version(nombre: str, tamano: str) -> Path:
+    """Ruta de la versión; la genera si aún no existe."""
+    ruta = ruta_version(nombre, tamano)
+    return ruta if ruta.exists() else generar(nombre, tamano)
+
+
+def generar_todas(nombre: str):
+    for tamano in TAMANOS:
+        try:
+            generar(nombre, tamano)
+        except Exception:
+            logger.exception("No se pudo generar la versión %s de %s", tamano, nombre)
+
+
+def borrar_versiones(nombre: str):
+    for tamano in TAMANOS:
+        ruta_version(nombre, tamano).unlink(missing_ok=True)
+
+
+def procesar_en_segundo_plano(nombre: str, anterior: str = ""):
+    """Genera las versiones de la foto nueva y elimina las de la anterior sin bloquear la petición."""
+    def _tarea():
+        generar_todas(nombre)
+        if anterior and anterior != nombre:
+            borrar_versiones(anterior)
+
+    threading.Thread(target=_tarea, name="fotos-empleado", daemon=True).start()
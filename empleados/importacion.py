@@ -0,0 +1,345 @@
+"""
+Importaciones masivas del admin: empleados desde Excel y candidatos desde JSON.
+
+Empleados (Excel):
+- El libro se lee en modo read-only: openpyxl recorre las filas sin cargar la
+  hoja entera en memoria.
+- Cada fila se identifica con un digest SHA-1 del nombre completo normalizado
+  (sin acentos ni mayúsculas). A diferencia de hash(), es el mismo en todos los
+  procesos, así que reimportar el mismo archivo no crea duplicados.
+- Los empleados importados se cargan una sola vez en un mapa; las diferencias se
+  aplican con bulk_create/bulk_update por lotes dentro de una transacción.
+  Al actualizar solo se tocan las columnas del Excel (no el salario).
+- En modo simulación se calcula el mismo informe sin escribir nada.
+
+Candidatos (JSON):
+- El archivo se decodifica por trozos: solo se mantiene en memoria el trozo
+  leído y el lote en curso, no la lista completa.
+- Cada lote de LOTE candidatos se valida, se consulta con un único
+  doc_id__in y se escribe con bulk_create/bulk_update.
+"""
+from __future__ import annotations
+
+import codecs
+import hashlib
+import json
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import openpyxl
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from . import dimensiones
+from .busqueda import normalizar
+from .models import Candidato, Empleado
+
+LOTE = 1000
+MUESTRA = 20
+TROZO = 64 * 1024
+_FIN_VALOR = frozenset(",] \t\r\n")
+MAX_ERRORES = 50
+
+# Columnas que gestiona el Excel; el resto (salario, dispositivo...) no se toca al actualizar
+CAMPOS = ("nombre", "apellido", "departamento", "tipo_vinculacion", "telefono")
+CAMPOS_CANDIDATO = ("nombre", "apellido", "email", "telefono", "skills", "titulaciones", "nota")
+
+
+def clave_estable(nombre_completo: str) -> str:
+    return hashlib.sha1(normalizar(nombre_completo).encode("utf-8")).hexdigest()
+
+
+def _tipo_vinculacion(estado) -> str:
+    estado = str(estado or "").upper()
+    if "CONTRAT" in estado:
+        return "CONT"
+    if "PRACT" in estado:
+        return "PRAC"
+    return "FUNC"
+
+
+def _leer_filas(archivo) -> Dict[str, dict]:
+    """
+    Columnas de la plantilla:
+    0 NOMBRE COMPLETO, 1 ESTADO, 2 SECTOR/DEPARTAMENTO, 3-6 ignoradas,
+    7 FECHA DE ALTA, 8 EDAD, 9 TELÉFONO.
+    Devuelve {clave: datos}; si un nombre se repite gana la última fila.
+    """
+    wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas: Dict[str, dict] = {}
+        for row in wb.active.iter_rows(min_row=2, values_only=True):
+            if not row or not row[0]:
+                continue
+            row = tuple(row) + (None,) * (10 - len(row))
+            nombre_completo = " ".join(str(row[0]).split())
+            nombre, _, apellido = nombre_completo.partition(" ")
+            clave = clave_estable(nombre_completo)
+            filas[clave] = {
+                "nombre": nombre[:60],
+                "apellido": apellido[:60],
+                "departamento": str(row[2] or "").strip()[:80],
+                "tipo_vinculacion": _tipo_vinculacion(row[1]),
+                "telefono": str(row[9] or "").strip()[:20],
+                "_nombre_completo": nombre_completo,
+            }
+        return filas
+    finally:
+        wb.close()
+
+
+def _existentes() -> Tuple[Dict[str, Empleado], Dict[str, Empleado]]:
+    """
+    Mapas únicos de empleados importados: (por doc_id, por clave del nombre).
+    El segundo reconoce a los creados por importaciones anteriores, cuyo doc_id
+    'MIG-...' salía de hash() y no se puede reproducir.
+    """
+    por_doc: Dict[str, Empleado] = {}
+    por_nombre: Dict[str, Empleado] = {}
+    qs = Empleado.objects.filter(doc_id__startswith="MIG-").only("pk", "doc_id", "departamento_ref_id", *CAMPOS)
+    for emp in qs.iterator(chunk_size=LOTE):
+        por_doc[emp.doc_id] = emp
+        por_nombre.setdefault(clave_estable(f"{emp.nombre} {emp.apellido}"), emp)
+    return por_doc, por_nombre
+
+
+def importar_empleados_excel(archivo, simular: bool = False) -> dict:
+    """
+    Aplica el Excel y devuelve el informe:
+    {filas, creados, actualizados, sin_cambios, muestra: [(accion, nombre, cambios)]}.
+    Con `simular` todo (incluidos los departamentos nuevos) se revierte al final.
+    """
+    filas = _leer_filas(archivo)
+    try:
+        with transaction.atomic():
+            informe = _aplicar(filas)
+            if simular:
+                transaction.set_rollback(True)
+    finally:
+        if simular:
+            dimensiones.invalidar()  # la caché pudo cargar departamentos revertidos
+    return informe
+
+
+def _aplicar(filas: Dict[str, dict]) -> dict:
+    por_doc, por_nombre = _existentes()
+    dimensiones.invalidar()  # caché recién cargada: resolver() no comprueba fila a fila
+    crear: List[Empleado] = []
+    actualizar: List[Empleado] = []
+    campos_actualizados = set()
+    muestra = []
+    sin_cambios = 0
+
+    for clave, datos in filas.items():
+        doc_id = f"MIG-{clave[:16]}"
+        nombre_completo = datos.pop("_nombre_completo")
+        # Mismo texto canónico y FK que aplicaría Empleado.save()
+        datos["departamento"], _, dep_id, _ = dimensiones.resolver(datos["departamento"], "", verificar=False)
+        emp = por_doc.get(doc_id) or por_nombre.get(clave)
+
+        if emp is None:
+            emp = Empleado(
+                doc_id=doc_id, numero=f"N-{clave[:12]}", salario_base=0, departamento_ref_id=dep_id, **datos
+            )
+            emp.busqueda = emp.texto_busqueda()
+            crear.append(emp)
+            if len(muestra) < MUESTRA:
+                muestra.append(("Crear", nombre_completo, ""))
+            continue
+
+        cambios = {c: v for c, v in datos.items() if getattr(emp, c) != v}
+        if emp.departamento_ref_id != dep_id:
+            cambios["departamento_ref_id"] = dep_id
+        if emp.doc_id != doc_id:
+            cambios["doc_id"] = doc_id  # importación anterior: se fija la clave estable
+        if not cambios:
+            sin_cambios += 1
+            continue
+        for campo, valor in cambios.items():
+            setattr(emp, campo, valor)
+        emp.busqueda = emp.texto_busqueda()
+        campos_actualizados.update("departamento_ref" if c == "departamento_ref_id" else c for c in cambios)
+        actualizar.append(emp)
+        if len(muestra) < MUESTRA:
+            etiquetas = sorted({c.replace("_ref_id", "") for c in cambios})
+            muestra.append(("Actualizar", nombre_completo, ", ".join(etiquetas)))
+
+    Empleado.objects.bulk_create(crear, batch_size=LOTE)
+    if actualizar:
+        campos = sorted(campos_actualizados | {"busqueda"})
+        Empleado.objects.bulk_update(actualizar, campos, batch_size=LOTE)
+
+    return {
+        "filas": len(filas),
+        "creados": len(crear),
+        "actualizados": len(actualizar),
+        "sin_cambios": sin_cambios,
+        "muestra": muestra,
+    }
+
+
+# --------------------------------------------------------------------------------------
+# Candidatos (JSON)
+# --------------------------------------------------------------------------------------
+def _trozos_texto(archivo) -> Iterator[str]:
+    """Texto del archivo (UploadedFile o binario abierto) por trozos, admitiendo BOM."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    trozos = archivo.chunks(TROZO) if hasattr(archivo, "chunks") else iter(lambda: archivo.read(TROZO), b"")
+    for trozo in trozos:
+        texto = decoder.decode(trozo)
+        if texto:
+            yield texto
+    resto = decoder.decode(b"", final=True)
+    if resto:
+        yield resto
+
+
+def iterar_lista_json(archivo) -> Iterator:
+    """
+    Recorre los elementos de una lista JSON de primer nivel sin cargarla entera.
+    Lanza ValueError (json.JSONDecodeError si la sintaxis es incorrecta) igual que json.load.
+    """
+    decoder = json.JSONDecoder()
+    trozos = _trozos_texto(archivo)
+    buf, pos, fin = "", 0, False
+
+    def _mas() -> bool:
+        nonlocal buf, pos, fin
+        if fin:
+            return False
+        try:
+            buf = buf[pos:] + next(trozos)
+        except StopIteration:
+            fin = True
+            return False
+        pos = 0
+        return True
+
+    def _siguiente_caracter() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not _mas():
+                return ""
+
+    if _siguiente_caracter() != "[":
+        raise ValueError("El JSON debe ser una lista de objetos.")
+    pos += 1
+    if _siguiente_caracter() == "]":
+        return
+    while True:
+        if not _siguiente_caracter():
+            raise json.JSONDecodeError("Lista sin cerrar", buf, pos)
+        while True:
+            try:
+                valor, final = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if _mas():
+                    continue
+                raise
+            # un número cortado por el trozo ("3." de "3.5") se decodifica sin error:
+            # solo se acepta el valor si detrás viene un separador
+            if (final == len(buf) or buf[final] not in _FIN_VALOR) and _mas():
+                continue
+            break
+        pos = final
+        yield valor
+
+        c = _siguiente_caracter()
+        if c == "]":
+            return
+        if c != ",":
+            raise json.JSONDecodeError("Se esperaba ',' o ']'", buf, pos)
+        pos += 1
+
+
+def _texto(item: dict, campo: str, largo: int | None = None) -> str:
+    valor = item.get(campo)
+    valor = "" if valor is None else str(valor).strip()
+    return valor[:largo] if largo else valor
+
+
+def _validar_candidato(item) -> dict:
+    """Campos del candidato listos para guardar; ValidationError si el elemento no es válido."""
+    if not isinstance(item, dict):
+        raise ValidationError("no es un objeto")
+    doc_id = _texto(item, "doc_id")
+    if not doc_id:
+        raise ValidationError("falta doc_id")
+    if len(doc_id) > 30:
+        raise ValidationError(f"doc_id demasiado largo ({doc_id[:30]}...)")
+    email = _texto(item, "email")
+    if email:
+        validate_email(email)
+    return {
+        "doc_id": doc_id,
+        "nombre": _texto(item, "nombre", 60),
+        "apellido": _texto(item, "apellido", 60),
+        "email": email[:254],
+        "telefono": _texto(item, "telefono", 20),
+        "skills": _texto(item, "skills"),
+        "titulaciones": _texto(item, "titulaciones"),
+        "nota": _texto(item, "nota"),
+    }
+
+
+def _guardar_lote(lote: Dict[str, dict], informe: dict):
+    existentes = Candidato.objects.only("pk", "doc_id", *CAMPOS_CANDIDATO).in_bulk(list(lote), field_name="doc_id")
+    crear, actualizar = [], []
+    ahora = timezone.now()
+    for doc_id, datos in lote.items():
+        obj = existentes.get(doc_id)
+        if obj is None:
+            obj = Candidato(**datos)
+            obj.busqueda = obj.texto_busqueda()
+            crear.append(obj)
+            continue
+        if all(getattr(obj, c) == v for c, v in datos.items()):
+            informe["sin_cambios"] += 1
+            continue
+        for campo, valor in datos.items():
+            setattr(obj, campo, valor)
+        obj.busqueda = obj.texto_busqueda()
+        obj.actualizado_en = ahora  # bulk_update no aplica auto_now
+        actualizar.append(obj)
+
+    Candidato.objects.bulk_create(crear)
+    Candidato.objects.bulk_update(actualizar, [*CAMPOS_CANDIDATO, "busqueda", "actualizado_en"])
+    informe["creados"] += len(crear)
+    informe["actualizados"] += len(actualizar)
+
+
+def importar_candidatos_json(archivo, progreso: Callable[[dict], None] | None = None) -> dict:
+    """
+    Crea o actualiza candidatos por doc_id. Devuelve
+    {procesados, creados, actualizados, sin_cambios, errores: [(indice, motivo)], total_errores}.
+    `progreso` recibe el informe parcial tras cada lote. Un JSON mal formado
+    no deja nada importado (todo va en una transacción).
+    """
+    informe = {"procesados": 0, "creados": 0, "actualizados": 0, "sin_cambios": 0, "errores": [], "total_errores": 0}
+    lote: Dict[str, dict] = {}
+    with transaction.atomic():
+        for i, item in enumerate(iterar_lista_json(archivo)):
+            informe["procesados"] += 1
+            try:
+                datos = _validar_candidato(item)
+            except ValidationError as e:
+                informe["total_errores"] += 1
+                if len(informe["errores"]) < MAX_ERRORES:
+                    informe["errores"].append((i, "; ".join(e.messages)))
+                continue
+            lote[datos["doc_id"]] = datos  # doc_id repetido en el lote: gana el último
+            if len(lote) >= LOTE:
+                _guardar_lote(lote, informe)
+                lote = {}
+                if progreso:
+                    progreso(informe)
+        if lote:
+            _guardar_lote(lote, informe)
+            if progreso:
+                progreso(informe)
+    return informe
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from empleados.importacion import importar_candidatos_json
+
+
+class Command(BaseCommand):
+    help = "Importa candidatos desde un JSON (lista de objetos con doc_id) por lotes, mostrando el progreso."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo JSON.")
+
+    def handle(self, *args, **options):
+        def progreso(informe):
+            self.stdout.write(
+                f"  {informe['procesados']} procesados ({informe['creados']} creados, "
+                f"{informe['actualizados']} actualizados, {informe['total_errores']} con error)"
+            )
+
+        try:
+            with open(options['archivo'], 'rb') as fh:
+                informe = importar_candidatos_json(fh, progreso=progreso)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for i, motivo in informe['errores']:
+            self.stderr.write(f"  #{i}: {motivo}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Completado: {informe['creados']} creados, {informe['actualizados']} actualizados, "
+            f"{informe['sin_cambios']} sin cambios, {informe['total_errores']} omitidos."
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from empleados import documentos
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los archivos originales de los documentos que la migración 0007 copió al almacén "
+        "por contenido. Correr una vez aplicada la migración."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Solo lista los archivos que se borrarían.")
+
+    def handle(self, *args, **options):
+        rutas = documentos.limpiar_originales(borrar=not options['dry_run'])
+        for ruta in rutas:
+            self.stdout.write(ruta)
+        accion = "se borrarían" if options['dry_run'] else "borrados"
+        self.stdout.write(self.style.SUCCESS(f"{len(rutas)} originales {accion}."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from empleados import user_ids
+
+
+class Command(BaseCommand):
+    help = "Reserva N user_id de la serie global (200, 210, 220...) para un enrolamiento masivo y los imprime."
+
+    def add_arguments(self, parser):
+        parser.add_argument('cantidad', type=int, help="Cantidad de IDs a reservar.")
+
+    def handle(self, *args, **options):
+        cantidad = options['cantidad']
+        if cantidad < 1:
+            raise CommandError("La cantidad debe ser mayor que cero.")
+        for valor in user_ids.reservar(cantidad):
+            self.stdout.write(valor)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:35
+
+from django.db import migrations, models
+
+from empleados.busqueda import crear_indice_trigram, eliminar_indice_trigram, rellenar
+
+
+def poblar_busqueda(apps, schema_editor):
+    rellenar(apps.get_model("empleados", "candidato"), ('nombre', 'apellido', 'doc_id', 'skills'))
+    crear_indice_trigram(schema_editor, "empleados_candidato", "candidato_busqueda_trgm")
+    rellenar(apps.get_model("empleados", "empleado"), ('nombre', 'apellido', 'numero', 'doc_id'))
+    crear_indice_trigram(schema_editor, "empleados_empleado", "empleado_busqueda_trgm")
+
+
+def quitar_indices(apps, schema_editor):
+    eliminar_indice_trigram(schema_editor, "candidato_busqueda_trgm")
+    eliminar_indice_trigram(schema_editor, "empleado_busqueda_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0003_empleado_salario_base_bajaautorizada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidato',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(poblar_busqueda, quitar_indices),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from empleados.busqueda import normalizar
+
+
+def poblar_dimensiones(apps, schema_editor):
+    """
+    Crea un Departamento/Área por cada texto distinto (sin distinguir acentos,
+    mayúsculas ni espacios) y enlaza a los empleados. El primer texto visto
+    queda como nombre canónico.
+    """
+    Empleado = apps.get_model("empleados", "Empleado")
+    Departamento = apps.get_model("empleados", "Departamento")
+    Area = apps.get_model("empleados", "Area")
+
+    deps, areas = {}, {}
+    pendientes = []
+    for e in Empleado.objects.only("pk", "departamento", "area").order_by("pk").iterator(chunk_size=1000):
+        dep_txt = " ".join((e.departamento or "").split())
+        area_txt = " ".join((e.area or "").split())
+        if not dep_txt:
+            continue
+        dep = deps.get(normalizar(dep_txt))
+        if dep is None:
+            dep = deps[normalizar(dep_txt)] = Departamento.objects.create(
+                nombre=dep_txt[:80], clave=normalizar(dep_txt[:80])
+            )
+        e.departamento, e.departamento_ref_id = dep.nombre, dep.pk
+        if area_txt:
+            ar = areas.get((dep.pk, normalizar(area_txt)))
+            if ar is None:
+                ar = areas[(dep.pk, normalizar(area_txt))] = Area.objects.create(
+                    departamento=dep, nombre=area_txt[:80], clave=normalizar(area_txt[:80])
+                )
+            e.area, e.area_ref_id = ar.nombre, ar.pk
+        pendientes.append(e)
+    Empleado.objects.bulk_update(pendientes, ["departamento", "area", "departamento_ref", "area_ref"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0004_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Area',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=80)),
+                ('clave', models.CharField(editable=False, max_length=80)),
+            ],
+            options={
+                'ordering': ['departamento__nombre', 'nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Departamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=80, unique=True)),
+                ('clave', models.CharField(editable=False, max_length=80, unique=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='area_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='empleados', to='empleados.area'),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='departamento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='areas', to='empleados.departamento'),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='departamento_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='empleados', to='empleados.departamento'),
+        ),
+        migrations.AddConstraint(
+            model_name='area',
+            constraint=models.UniqueConstraint(fields=('departamento', 'nombre'), name='uq_area_departamento_nombre'),
+        ),
+        migrations.AddConstraint(
+            model_name='area',
+            constraint=models.UniqueConstraint(fields=('departamento', 'clave'), name='uq_area_departamento_clave'),
+        ),
+        migrations.RunPython(poblar_dimensiones, migrations.RunPython.noop),
+    ]
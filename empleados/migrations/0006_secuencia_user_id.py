@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+# Copia de la serie de empleados/user_ids.py en el momento de esta migración
+BASE = 200
+PASO = 10
+MAX_HUECOS = 10_000
+
+
+def inicializar_secuencia(apps, schema_editor):
+    """Arranca la secuencia tras el mayor user_id de la serie y registra los huecos como reutilizables."""
+    Empleado = apps.get_model("empleados", "Empleado")
+    UsuarioDispositivo = apps.get_model("dispositivos", "UsuarioDispositivo")
+    SecuenciaUserId = apps.get_model("empleados", "SecuenciaUserId")
+    UserIdLiberado = apps.get_model("empleados", "UserIdLiberado")
+
+    usados = set(UsuarioDispositivo.objects.values_list("user_id", flat=True))
+    usados.update(Empleado.objects.exclude(user_id="").values_list("user_id", flat=True))
+    ocupados = set()
+    for u in usados:
+        s = str(u or "").strip()
+        if s.isdigit() and int(s) >= BASE and (int(s) - BASE) % PASO == 0:
+            ocupados.add(int(s))
+    siguiente = max(ocupados) + PASO if ocupados else BASE
+    huecos = [v for v in range(BASE, siguiente, PASO) if v not in ocupados][:MAX_HUECOS]
+    SecuenciaUserId.objects.create(pk=1, siguiente=siguiente)
+    UserIdLiberado.objects.bulk_create([UserIdLiberado(user_id=v) for v in huecos], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0005_departamento_area'),
+        ('dispositivos', '0009_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaUserId',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('siguiente', models.PositiveIntegerField(default=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserIdLiberado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.PositiveIntegerField(unique=True)),
+                ('liberado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['user_id'],
+            },
+        ),
+        migrations.RunPython(inicializar_secuencia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:45
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.db.models import F
+
+# Copia de la disposición de empleados/documentos.py en el momento de esta migración
+PREFIJO = "documentos/sha256"
+
+
+def _ruta_blob(sha256):
+    return f"{PREFIJO}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def _absoluta(ruta):
+    return Path(default_storage.path(ruta))
+
+
+def _copiar_a_blob(origen):
+    """Copia `origen` a su blob (si ese contenido no está ya en disco). Devuelve (sha256, tamaño)."""
+    directorio = _absoluta(f"{PREFIJO}/tmp")
+    directorio.mkdir(parents=True, exist_ok=True)
+    h, tamano = hashlib.sha256(), 0
+    with open(origen, "rb") as entrada, tempfile.NamedTemporaryFile(dir=directorio, delete=False) as fh:
+        try:
+            for trozo in iter(lambda: entrada.read(64 * 1024), b""):
+                h.update(trozo)
+                fh.write(trozo)
+                tamano += len(trozo)
+            fh.flush()
+            os.fsync(fh.fileno())
+        except BaseException:
+            os.unlink(fh.name)
+            raise
+    sha256 = h.hexdigest()
+    destino = _absoluta(_ruta_blob(sha256))
+    if destino.exists():
+        os.unlink(fh.name)
+    else:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(fh.name, destino)
+    return sha256, tamano
+
+
+def pasar_a_contenido(apps, schema_editor):
+    """
+    Pasa al almacén por contenido los documentos subidos antes. Los duplicados
+    quedan en un solo archivo; los que faltan en disco se dejan como están.
+
+    Los originales se copian, no se mueven: si la migración falla o se
+    revierte, los Documento siguen apuntando a archivos que existen. La ruta
+    previa queda en `ruta_anterior` y los originales se borran después con
+    `manage.py limpiar_documentos_migrados`.
+    """
+    Documento = apps.get_model("empleados", "Documento")
+    Contenido = apps.get_model("empleados", "Contenido")
+    for doc in Documento.objects.filter(contenido__isnull=True).exclude(archivo="").iterator():
+        origen = _absoluta(doc.archivo.name)
+        if not origen.is_file():
+            continue
+        sha256, tamano = _copiar_a_blob(origen)
+        contenido, _ = Contenido.objects.get_or_create(sha256=sha256, defaults={"tamano": tamano})
+        Contenido.objects.filter(pk=contenido.pk).update(referencias=F("referencias") + 1)
+        Documento.objects.filter(pk=doc.pk).update(
+            contenido=contenido, nombre_original=origen.name[:255], archivo=_ruta_blob(sha256),
+            ruta_anterior=doc.archivo.name,
+        )
+
+
+def volver_a_rutas(apps, schema_editor):
+    """
+    Inverso: los documentos migrados vuelven a su ruta anterior, copiando el
+    blob allí si el original ya se había borrado. Los blobs se dejan en disco.
+    """
+    Documento = apps.get_model("empleados", "Documento")
+    for doc in Documento.objects.exclude(ruta_anterior="").iterator():
+        destino = _absoluta(doc.ruta_anterior)
+        if not destino.is_file():
+            blob = _absoluta(doc.archivo.name)
+            if not blob.is_file():
+                continue
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(blob, destino)
+        Documento.objects.filter(pk=doc.pk).update(contenido=None, archivo=doc.ruta_anterior, ruta_anterior="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empleados', '0006_secuencia_user_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='nombre_original',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='contenido',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documentos', to='empleados.contenido'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='ruta_anterior',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(pasar_a_contenido, volver_a_rutas),
+    ]
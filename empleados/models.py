@@ -1,7 +1,10 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.db.models import Index
 
-class Candidato(models.Model):
+from .busqueda import ConBusqueda, normalizar
+
+class Candidato(ConBusqueda, models.Model):
     """
     Personas en la 'Cantera' que aún no son empleados.
     """
@@ -24,6 +27,10 @@ class Candidato(models.Model):
     estado = models.CharField(max_length=5, choices=ESTADOS, default="DISP")
     nota = models.TextField(blank=True, help_text="Notas internas sobre el candidato")
 
+    # Texto normalizado para búsquedas (ver empleados/busqueda.py)
+    busqueda = models.TextField(blank=True, default="", editable=False)
+    CAMPOS_BUSQUEDA = ("nombre", "apellido", "doc_id", "skills")
+
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
@@ -42,7 +49,70 @@ class Candidato(models.Model):
         return f"{self.nombre} {self.apellido}".strip()
 
 
-class Empleado(models.Model):
+def _con_clave(kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "nombre" in update_fields:
+        kwargs["update_fields"] = {*update_fields, "clave"}
+
+
+class Departamento(models.Model):
+    """
+    Dimensión de departamentos. Empleado conserva el nombre como texto para
+    mostrarlo sin join; los filtros usan la FK. Lista en caché: empleados/dimensiones.py
+    """
+    nombre = models.CharField(max_length=80, unique=True)
+    # Nombre sin acentos, mayúsculas ni espacios repetidos: "Administracion" y "Administración" son uno
+    clave = models.CharField(max_length=80, unique=True, editable=False)
+
+    class Meta:
+        ordering = ["nombre"]
+
+    def __str__(self):
+        return self.nombre
+
+    def clean(self):
+        clave = normalizar(self.nombre)
+        if Departamento.objects.filter(clave=clave).exclude(pk=self.pk).exists():
+            raise ValidationError({"nombre": "Ya existe un departamento con ese nombre (sin contar acentos ni mayúsculas)."})
+
+    def save(self, *args, **kwargs):
+        self.clave = normalizar(self.nombre)
+        _con_clave(kwargs)
+        super().save(*args, **kwargs)
+        # Mantener el texto desnormalizado de los empleados al renombrar
+        Empleado.objects.filter(departamento_ref=self).exclude(departamento=self.nombre).update(departamento=self.nombre)
+
+
+class Area(models.Model):
+    departamento = models.ForeignKey(Departamento, on_delete=models.CASCADE, related_name="areas")
+    nombre = models.CharField(max_length=80)
+    clave = models.CharField(max_length=80, editable=False)
+
+    class Meta:
+        ordering = ["departamento__nombre", "nombre"]
+        constraints = [
+            models.UniqueConstraint(fields=["departamento", "nombre"], name="uq_area_departamento_nombre"),
+            models.UniqueConstraint(fields=["departamento", "clave"], name="uq_area_departamento_clave"),
+        ]
+
+    def __str__(self):
+        return f"{self.departamento} / {self.nombre}"
+
+    def clean(self):
+        if not self.departamento_id:
+            return
+        clave = normalizar(self.nombre)
+        if Area.objects.filter(departamento_id=self.departamento_id, clave=clave).exclude(pk=self.pk).exists():
+            raise ValidationError({"nombre": "Ya existe un área con ese nombre en el departamento."})
+
+    def save(self, *args, **kwargs):
+        self.clave = normalizar(self.nombre)
+        _con_clave(kwargs)
+        super().save(*args, **kwargs)
+        Empleado.objects.filter(area_ref=self).exclude(area=self.nombre).update(area=self.nombre)
+
+
+class Empleado(ConBusqueda, models.Model):
     TIPO_VINCULACION = [
         ("FUNC", "Funcionario"),
         ("PRAC", "Practicante"),
@@ -64,6 +134,13 @@ class Empleado(models.Model):
     departamento = models.CharField(max_length=80, blank=True)
     area = models.CharField(max_length=80, blank=True)
     seccion = models.CharField(max_length=80, blank=True)
+    # Dimensión normalizada; se resuelve desde el texto en save()
+    departamento_ref = models.ForeignKey(
+        Departamento, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="empleados"
+    )
+    area_ref = models.ForeignKey(
+        Area, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="empleados"
+    )
 
     tipo_vinculacion = models.CharField(
         max_length=5,
@@ -87,6 +164,10 @@ class Empleado(models.Model):
     
     # Nuevo campo para Nómina
     salario_base = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text="Salario base mensual")
+
+    # Texto normalizado para búsquedas (ver empleados/busqueda.py)
+    busqueda = models.TextField(blank=True, default="", editable=False)
+    CAMPOS_BUSQUEDA = ("nombre", "apellido", "numero", "doc_id")
     
     creado_en = models.DateTimeField(auto_now_add=True)
 
@@ -102,10 +183,89 @@ class Empleado(models.Model):
     def __str__(self):
         return f"{self.nombre} {self.apellido} ({self.numero})"
 
+    def save(self, *args, **kwargs):
+        from .dimensiones import resolver
+
+        self.departamento, self.area, self.departamento_ref_id, self.area_ref_id = resolver(self.departamento, self.area)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"departamento", "area"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "departamento", "area", "departamento_ref", "area_ref"}
+
+        foto_nueva = bool(self.foto) and not self.foto._committed
+        foto_anterior = ""
+        if self.pk and (foto_nueva or not self.foto):
+            foto_anterior = Empleado.objects.filter(pk=self.pk).values_list("foto", flat=True).first() or ""
+        super().save(*args, **kwargs)
+
+        if foto_nueva or foto_anterior:
+            from . import fotos
+
+            nombre = self.foto.name if self.foto else ""
+            if nombre:
+                transaction.on_commit(lambda: fotos.procesar_en_segundo_plano(nombre, foto_anterior))
+            elif foto_anterior:
+                transaction.on_commit(lambda: fotos.borrar_versiones(foto_anterior))
+
     @property
     def nombre_completo(self):
         return f"{self.nombre} {self.apellido}".strip()
 
+    @property
+    def foto_avatar_url(self):
+        from . import fotos
+
+        return fotos.url(self, "avatar")
+
+    @property
+    def foto_detalle_url(self):
+        from . import fotos
+
+        return fotos.url(self, "detalle")
+
+    @property
+    def foto_impresion_url(self):
+        from . import fotos
+
+        return fotos.url(self, "impresion")
+
+
+class SecuenciaUserId(models.Model):
+    """
+    Fila única (pk=1) con el siguiente user_id a entregar en la serie 200, 210, 220...
+    Se reserva con un UPDATE atómico; ver empleados/user_ids.py.
+    """
+    siguiente = models.PositiveIntegerField(default=200)
+
+    def __str__(self):
+        return f"Siguiente user_id: {self.siguiente}"
+
+
+class UserIdLiberado(models.Model):
+    """user_id de la serie que quedó libre (usuario borrado) y se reutiliza antes de avanzar la secuencia."""
+    user_id = models.PositiveIntegerField(unique=True)
+    liberado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["user_id"]
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class Contenido(models.Model):
+    """
+    Archivo almacenado por su SHA-256 (ver empleados/documentos.py). Varios
+    Documento con el mismo contenido comparten un único archivo en disco;
+    `referencias` cuenta cuántos lo usan y al llegar a cero se borra.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    tamano = models.PositiveBigIntegerField(default=0)
+    referencias = models.PositiveIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.referencias} ref.)"
+
 
 class Documento(models.Model):
     """
@@ -127,12 +287,31 @@ class Documento(models.Model):
     tipo = models.CharField(max_length=5, choices=TIPOS, default="OTRO")
     descripcion = models.CharField(max_length=150, blank=True, help_text="Descripción breve del archivo")
     archivo = models.FileField(upload_to="documentos/%Y/%m/")
+    # Al guardar un archivo nuevo se almacena por contenido: `archivo` apunta al blob compartido
+    contenido = models.ForeignKey(
+        Contenido, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name="documentos"
+    )
+    nombre_original = models.CharField(max_length=255, blank=True, editable=False)
+    # Ruta previa al almacén por contenido de los documentos migrados (ver la migración 0007_documento_contenido)
+    ruta_anterior = models.CharField(max_length=255, blank=True, editable=False)
     
     subido_en = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.descripcion or 'Sin descripción'}"
 
+    def save(self, *args, **kwargs):
+        from . import documentos
+
+        with transaction.atomic():
+            anterior = None
+            if self.archivo and not self.archivo._committed:
+                anterior = self.contenido_id
+                documentos.almacenar(self)
+            super().save(*args, **kwargs)
+            if anterior and anterior != self.contenido_id:
+                documentos.liberar(anterior)
+
 
 class BajaAutorizada(models.Model):
     """
@@ -1,3 +1,140 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from dispositivos.models import Dispositivo, UsuarioDispositivo
+
+from zkmanager.pruebas import Caso, PresupuestoConsultas
+
+from . import dimensiones
+from .models import Candidato, Departamento, Empleado
+from .urls import urlpatterns
+
+
+def _r(nombre, *args):
+    return reverse(f"empleados:{nombre}", args=args)
+
+
+def _archivo():
+    return {"tipo": "OTRO", "descripcion": "Prueba", "archivo": SimpleUploadedFile("prueba.txt", b"contenido")}
+
+
+class PresupuestoConsultasEmpleadosTests(PresupuestoConsultas, TestCase):
+    """
+    Rutas de empleados y cantera. Las que borran van al final y sobre objetos
+    que no usan los casos anteriores.
+    """
+    urlpatterns = urlpatterns
+
+    def casos(self, datos):
+        emp, cand = datos.empleado, datos.candidato
+        # Sin dispositivo propio: crear_en_equipo registra contra el terminal simulado
+        sin_equipo = Empleado.objects.create(
+            numero="SINT-PRESUP", nombre="Sin", apellido="Equipo", doc_id="SINT-PRESUP", dispositivo=None, user_id="",
+        )
+        doc_emp = emp.documentos.order_by("pk").first()
+        return [
+            Caso("list", _r("list")),
+            Caso("crear", _r("crear")),
+            Caso("detalle", _r("detalle", emp.pk)),
+            Caso("editar", _r("editar", emp.pk)),
+            Caso("imprimir", _r("imprimir", emp.pk)),
+            Caso("vincular", _r("vincular", emp.pk)),
+            Caso("ajax_load_users", _r("ajax_load_users"), datos={"dispositivo": datos.dispositivo.pk}),
+            Caso("crear_en_equipo", _r("crear_en_equipo", sin_equipo.pk), metodo="post",
+                 datos={"dispositivo_id": datos.terminales[0].pk}),
+            Caso("foto", _r("foto", emp.pk, "avatar")),
+            Caso("doc_subir_empleado", _r("doc_subir_empleado", emp.pk), metodo="post", datos=_archivo()),
+            Caso("doc_descargar", _r("doc_descargar", datos.documento.pk)),
+            Caso("baja_crear", _r("baja_crear", emp.pk)),
+            Caso("candidato_list", _r("candidato_list")),
+            Caso("candidato_crear", _r("candidato_crear")),
+            Caso("candidato_detalle", _r("candidato_detalle", cand.pk)),
+            Caso("candidato_editar", _r("candidato_editar", cand.pk)),
+            Caso("candidato_promover", _r("candidato_promover", cand.pk)),
+            Caso("doc_subir_candidato", _r("doc_subir_candidato", cand.pk), metodo="post", datos=_archivo()),
+            # Escrituras que quitan datos
+            Caso("desvincular", _r("desvincular", datos.usuario.pk), metodo="post"),
+            Caso("doc_eliminar", _r("doc_eliminar", doc_emp.pk), metodo="post"),
+            Caso("baja_eliminar", _r("baja_eliminar", datos.baja.pk), metodo="post"),
+        ]
+
+
+class AltaEnEquipoTests(TransactionTestCase):
+    """El terminal se contacta con la transacción (y la secuencia de user_id) ya cerrada."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.disp = Dispositivo.objects.create(nombre="ALTA", ip="127.0.0.1", omitir_ping=True)
+        self.emp = Empleado.objects.create(numero="A1", nombre="Ana", apellido="Alta", doc_id="A1", user_id="")
+        self.en_transaccion = []
+
+    def _conn(self, dispositivo):
+        self.en_transaccion.append(connection.in_atomic_block)
+        raise ConnectionError("sin red")
+
+    def test_crear_en_equipo(self):
+        with mock.patch("empleados.views._conn_with_fallbacks", self._conn):
+            self.client.post(_r("crear_en_equipo", self.emp.pk), {"dispositivo_id": self.disp.pk})
+        self.assertEqual(self.en_transaccion, [False])
+        # La reserva del user_id queda guardada aunque falle el equipo
+        self.assertTrue(UsuarioDispositivo.objects.filter(dispositivo=self.disp, empleado=None).exists())
+
+
+class DimensionesTests(TestCase):
+    def test_resolver_sin_acentos_con_cache_desactualizada(self):
+        dimensiones.invalidar()
+        dep = dimensiones.resolver("Administración", "Contabilidad")
+        # Caché de otro proceso que aún no tiene el departamento
+        with mock.patch.object(dimensiones, "_datos", return_value={"departamentos": [], "por_nombre": {}, "areas": {}}):
+            self.assertEqual(dimensiones.resolver("Administracion ", "contabilidad"), dep)
+        self.assertEqual(Departamento.objects.count(), 1)
+
+    def test_resolver_con_id_borrado_en_otro_proceso(self):
+        dimensiones.invalidar()
+        _, _, borrado, _ = dimensiones.resolver("Logística", "")
+        # Borrado sin señales: la caché de este proceso sigue teniéndolo
+        Departamento.objects.filter(pk=borrado)._raw_delete("default")
+        _, _, dep_id, _ = dimensiones.resolver("Logistica", "")
+        self.assertNotEqual(dep_id, borrado)
+        self.assertTrue(Departamento.objects.filter(pk=dep_id).exists())
+
+
+class FotoVersionesTests(TestCase):
+    """La ficha usa la versión 'detalle' de la foto y la ficha para imprimir, la de 'impresion'."""
+
+    def test_ficha_e_impresion_usan_su_version(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        emp = Empleado.objects.create(numero="F1", nombre="Foto", apellido="Prueba", doc_id="F1",
+                                      foto="empleados/fotos/f1.jpg")
+        self.assertContains(self.client.get(_r("detalle", emp.pk)), emp.foto_detalle_url)
+        self.assertContains(self.client.get(_r("imprimir", emp.pk)), emp.foto_impresion_url)
+
+
+class ImportarCandidatosAdminTests(TestCase):
+    """La importación desde el admin informa de procesados, creados y con error."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "x"))
+        self.url = reverse("admin:empleados_candidato_import_json")
+
+    def _importar(self, contenido: bytes):
+        archivo = SimpleUploadedFile("candidatos.json", contenido, content_type="application/json")
+        return self.client.post(self.url, {"json_file": archivo}, follow=True)
+
+    def test_resumen_con_errores(self):
+        response = self._importar(b'[{"doc_id": "C1", "nombre": "Uno"}, {"nombre": "Sin doc"}]')
+        avisos = [str(m) for m in response.context["messages"]]
+        self.assertIn("2 procesados, 1 creados", avisos[0])
+        self.assertIn("1 con error", avisos[0])
+
+    @mock.patch("empleados.importacion.LOTE", 2)
+    def test_json_cortado_informa_hasta_donde_llego(self):
+        response = self._importar(b'[{"doc_id": "C1"}, {"doc_id": "C2"}, {"doc_id": "C3"')
+        (aviso,) = [str(m) for m in response.context["messages"]]
+        self.assertIn("Se llegó a 2 procesados (2 creados, 0 con error); no se guardó ninguno.", aviso)
+        self.assertFalse(Candidato.objects.exists())
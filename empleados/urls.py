@@ -9,14 +9,17 @@ urlpatterns = [
     path("nuevo/", views.empleado_crear, name="crear"),
     path("<int:pk>/", views.empleado_detalle, name="detalle"),
     path("<int:pk>/editar/", views.empleado_editar, name="editar"),
+    path("<int:pk>/imprimir/", views.empleado_imprimir, name="imprimir"),
     path("<int:pk>/vincular/", views.empleado_vincular, name="vincular"),
     path("desvincular/<int:pk>/", views.empleado_desvincular, name="desvincular"),
     path("ajax/load-users/", views.load_users, name="ajax_load_users"),
     path("<int:pk>/crear-en-equipo/", views.empleado_crear_en_equipo, name="crear_en_equipo"),
+    path("<int:pk>/foto/<str:tamano>/", views.empleado_foto, name="foto"),
     
     # Documentos (Empleado)
     path("<int:emp_id>/documento/subir/", views.documento_subir_empleado, name="doc_subir_empleado"),
     path("documento/<int:pk>/eliminar/", views.documento_eliminar, name="doc_eliminar"),
+    path("documento/<int:pk>/descargar/", views.documento_descargar, name="doc_descargar"),
 
     # Bajas Autorizadas
     path("<int:emp_id>/baja/nueva/", views.baja_crear, name="baja_crear"),
@@ -0,0 +1,111 @@
+"""
+Asignación de user_id para los equipos biométricos.
+
+Serie global 200, 210, 220... compartida por todos los dispositivos.
+
+- La secuencia vive en SecuenciaUserId (una fila). Reservar k IDs es un único
+  UPDATE siguiente = siguiente + 10*k: la fila queda bloqueada hasta el fin de
+  la transacción, así que dos altas simultáneas nunca reciben el mismo ID. Si la
+  transacción de la vista se revierte, la reserva también.
+- Los IDs de usuarios borrados pasan a UserIdLiberado y se entregan primero
+  (SELECT ... FOR UPDATE SKIP LOCKED en PostgreSQL).
+- Antes de entregar un ID se comprueba, solo para esos candidatos, que nadie lo
+  haya usado a mano en UsuarioDispositivo o Empleado.
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Set, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from dispositivos.models import UsuarioDispositivo
+
+from .models import Empleado, SecuenciaUserId, UserIdLiberado
+
+BASE = 200
+PASO = 10
+MAX_HUECOS = 10_000
+
+
+def en_serie(valor) -> bool:
+    s = str(valor or "").strip()
+    return s.isdigit() and int(s) >= BASE and (int(s) - BASE) % PASO == 0
+
+
+def estado_inicial(usados: Iterable[str]) -> Tuple[int, List[int]]:
+    """
+    A partir de los user_id existentes devuelve (siguiente, huecos): el primer
+    valor de la serie por encima del mayor usado y los huecos libres por debajo
+    (como hacía el generador anterior, que rellenaba desde 200).
+    """
+    ocupados = {int(u) for u in usados if en_serie(u)}
+    siguiente = max(ocupados) + PASO if ocupados else BASE
+    huecos = [v for v in range(BASE, siguiente, PASO) if v not in ocupados][:MAX_HUECOS]
+    return siguiente, huecos
+
+
+def _en_uso(candidatos: Iterable[int]) -> Set[str]:
+    valores = [str(c) for c in candidatos]
+    usados = set(UsuarioDispositivo.objects.filter(user_id__in=valores).values_list("user_id", flat=True))
+    usados.update(Empleado.objects.filter(user_id__in=valores).values_list("user_id", flat=True))
+    return usados
+
+
+def _avanzar(k: int) -> List[int]:
+    """Reserva k valores consecutivos de la secuencia."""
+    if not SecuenciaUserId.objects.filter(pk=1).update(siguiente=F("siguiente") + PASO * k):
+        usados = set(UsuarioDispositivo.objects.values_list("user_id", flat=True))
+        usados.update(Empleado.objects.exclude(user_id="").values_list("user_id", flat=True))
+        try:
+            with transaction.atomic():
+                SecuenciaUserId.objects.create(pk=1, siguiente=estado_inicial(usados)[0])
+        except IntegrityError:
+            pass  # la creó otra transacción a la vez
+        return _avanzar(k)
+    fin = SecuenciaUserId.objects.values_list("siguiente", flat=True).get(pk=1)
+    return [fin - PASO * (k - i) for i in range(k)]
+
+
+def reservar(n: int = 1) -> List[str]:
+    """
+    Reserva n user_id libres (primero los liberados, luego la secuencia).
+    Debe llamarse dentro de la transacción que los va a usar.
+    """
+    out: List[str] = []
+    with transaction.atomic():
+        liberados = list(
+            UserIdLiberado.objects.select_for_update(skip_locked=True)
+            .order_by("user_id")
+            .values_list("pk", "user_id")[:n]
+        )
+        if liberados:
+            UserIdLiberado.objects.filter(pk__in=[pk for pk, _ in liberados]).delete()
+            ocupados = _en_uso(v for _, v in liberados)
+            out.extend(str(v) for _, v in liberados if str(v) not in ocupados)
+
+        while len(out) < n:
+            candidatos = _avanzar(n - len(out))
+            ocupados = _en_uso(candidatos)
+            out.extend(str(c) for c in candidatos if str(c) not in ocupados)
+    return out
+
+
+def liberar(user_id) -> bool:
+    """Devuelve el ID a la lista de reutilizables si es de la serie y ya nadie lo usa."""
+    if not en_serie(user_id):
+        return False
+    valor = int(str(user_id).strip())
+    if _en_uso([valor]):
+        return False
+    _, creado = UserIdLiberado.objects.get_or_create(user_id=valor)
+    return creado
+
+
+@receiver(post_delete, sender=UsuarioDispositivo)
+@receiver(post_delete, sender=Empleado)
+def _liberar_al_borrar(sender, instance, **kwargs):
+    if instance.user_id:
+        transaction.on_commit(lambda: liberar(instance.user_id))
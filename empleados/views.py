@@ -1,13 +1,18 @@
+import os
+
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, render, redirect
 from django.db import transaction
-from django.db.models import Q, Exists, OuterRef
-from django.views.decorators.http import require_http_methods
+from django.db.models import Q, Exists, OuterRef, Prefetch
+from django.views.decorators.http import condition, require_http_methods
+from django.http import FileResponse, Http404
 from django.core.paginator import Paginator
+from PIL import UnidentifiedImageError
 
 from dispositivos.models import UsuarioDispositivo, Dispositivo
 from dispositivos.views import _conn_with_fallbacks
+from . import busqueda, dimensiones, documentos, fotos, user_ids
 from .models import Empleado, Candidato, Documento, BajaAutorizada
 from .forms import EmpleadoForm, VincularUsuarioForm, LinkUsuarioDispositivoForm, CandidatoForm, DocumentoForm, BajaAutorizadaForm
 
@@ -54,29 +59,12 @@ def _sdk_set_user(conn, *, uid, user_id, name,
 # ======================
 def _siguiente_user_id(dispositivo: Dispositivo = None) -> str:
     """
-    Generador infalible GLOBAL:
-    - Empieza siempre en 200
-    - Avanza en saltos de 10 (200, 210, 220...)
-    - Comprueba que no exista en NINGÚN dispositivo ni en la tabla de Empleados.
+    Siguiente user_id GLOBAL de la serie 200, 210, 220... (ver empleados/user_ids.py).
+    - Reserva con bloqueo de fila: dos altas simultáneas no reciben el mismo ID.
+    - Reutiliza primero los IDs liberados al borrar usuarios.
     - El argumento 'dispositivo' se mantiene por compatibilidad pero no se limita a él.
     """
-    base = 200
-    step = 10
-    
-    # Obtener todos los IDs en uso (optimización)
-    # 1. IDs en UsuarioDispositivo (todos los equipos)
-    used_in_ud = set(UsuarioDispositivo.objects.values_list('user_id', flat=True))
-    
-    # 2. IDs en Empleados (histórico o asignados pero no sincronizados)
-    used_in_emp = set(Empleado.objects.exclude(user_id="").values_list('user_id', flat=True))
-    
-    all_used = used_in_ud.union(used_in_emp)
-    
-    candidato = base
-    while str(candidato) in all_used:
-        candidato += step
-        
-    return str(candidato)
+    return user_ids.reservar(1)[0]
 
 
 
@@ -91,25 +79,25 @@ def empleado_list(request):
     vinculo_qs = UsuarioDispositivo.objects.filter(empleado_id=OuterRef("pk"))
     qs = (Empleado.objects
           .all()
-          .annotate(esta_vinculado=Exists(vinculo_qs)))
+          .annotate(esta_vinculado=Exists(vinculo_qs))
+          # La columna de dispositivos usa count y el primero: una consulta para toda la página
+          .prefetch_related(Prefetch(
+              "usuarios_dispositivo",
+              queryset=UsuarioDispositivo.objects.select_related("dispositivo"),
+          )))
     # 1. Filtro por departamento
     depto = (request.GET.get("departamento") or "").strip()
     if depto:
-        qs = qs.filter(departamento=depto)
+        qs = qs.filter(dimensiones.filtro_departamento(depto))
 
     # 2. Orden alfabético por nombre
     qs = qs.order_by("nombre", "apellido")
 
     if q:
-        qs = qs.filter(
-            Q(nombre__icontains=q) |
-            Q(apellido__icontains=q) |
-            Q(numero__icontains=q) |
-            Q(doc_id__icontains=q)
-        )
+        qs = qs.filter(busqueda.filtro(q))
     
     # Obtener lista de departamentos para el select
-    departamentos = sorted([d for d in Empleado.objects.values_list("departamento", flat=True).distinct() if d])
+    departamentos = dimensiones.departamentos()
 
     dispositivos = Dispositivo.objects.filter(activo=True).order_by("nombre").values("id", "nombre")
     paginator = Paginator(qs, 20)
@@ -146,12 +134,19 @@ def empleado_detalle(request, pk):
     })
 
 
+@login_required
+@user_passes_test(_only_staff)
+def empleado_imprimir(request, pk):
+    """Ficha del empleado para imprimir, con la versión de impresión de la foto."""
+    obj = get_object_or_404(Empleado, pk=pk)
+    return render(request, "empleados/empleado_imprimir.html", {"obj": obj})
+
+
 # ======================
 #  CREAR EMPLEADO
 # ======================
 @login_required
 @user_passes_test(_only_staff)
-@transaction.atomic
 def empleado_crear(request):
     form = EmpleadoForm(request.POST or None, request.FILES or None)
     if request.method == "POST" and form.is_valid():
@@ -160,24 +155,28 @@ def empleado_crear(request):
         crear_en_equipo = form.cleaned_data.get("crear_en_dispositivo")
         disp = emp.dispositivo
 
-        # Solo generamos user_id (UID lo dejamos en 0 para el equipo)
-        if disp and not emp.user_id:
-            emp.user_id = _siguiente_user_id(disp)
+        # Transacción corta: la secuencia de user_id queda bloqueada hasta el commit,
+        # así que el equipo se contacta después
+        with transaction.atomic():
+            # Solo generamos user_id (UID lo dejamos en 0 para el equipo)
+            if disp and not emp.user_id:
+                emp.user_id = _siguiente_user_id(disp)
 
-        emp.save()
+            emp.save()
 
-        if disp:
-            ud, _ = UsuarioDispositivo.objects.update_or_create(
-                dispositivo=disp,
-                user_id=emp.user_id or "",
-                defaults={
-                    "uid": emp.uid,  # puede ser None / 0; se actualizará al sincronizar
-                    "nombre": emp.nombre_completo[:64],
-                    "activo": emp.activo,
-                    "empleado": emp,
-                },
-            )
+            if disp:
+                ud, _ = UsuarioDispositivo.objects.update_or_create(
+                    dispositivo=disp,
+                    user_id=emp.user_id or "",
+                    defaults={
+                        "uid": emp.uid,  # puede ser None / 0; se actualizará al sincronizar
+                        "nombre": emp.nombre_completo[:64],
+                        "activo": emp.activo,
+                        "empleado": emp,
+                    },
+                )
 
+        if disp:
             if crear_en_equipo:
                 try:
                     conn, _ = _conn_with_fallbacks(disp)
@@ -303,7 +302,6 @@ def empleado_vincular(request, pk):
 @login_required
 @user_passes_test(_only_staff)
 @require_http_methods(["POST"])
-@transaction.atomic
 def empleado_crear_en_equipo(request, pk):
     emp = get_object_or_404(Empleado, pk=pk)
 
@@ -321,22 +319,24 @@ def empleado_crear_en_equipo(request, pk):
     else:
         disp = emp.dispositivo
 
-    # 1) Generar user_id (inicia en 200, salta de 10 en 10)
-    user_val = emp.user_id or _siguiente_user_id(disp)
-
-    # 2) Reservar user_id en BD (empleado=None)
-    ud, _ = UsuarioDispositivo.objects.update_or_create(
-        dispositivo=disp,
-        user_id=user_val,
-        defaults={
-            "uid": emp.uid,
-            "nombre": emp.nombre_completo[:64],
-            "activo": emp.activo,
-            "empleado": None,
-        },
-    )
+    # 1) y 2) en una transacción corta: la secuencia de user_id queda bloqueada hasta el commit
+    with transaction.atomic():
+        # 1) Generar user_id (inicia en 200, salta de 10 en 10)
+        user_val = emp.user_id or _siguiente_user_id(disp)
+
+        # 2) Reservar user_id en BD (empleado=None)
+        ud, _ = UsuarioDispositivo.objects.update_or_create(
+            dispositivo=disp,
+            user_id=user_val,
+            defaults={
+                "uid": emp.uid,
+                "nombre": emp.nombre_completo[:64],
+                "activo": emp.activo,
+                "empleado": None,
+            },
+        )
 
-    # 3) Insertar en el equipo
+    # 3) Insertar en el equipo (fuera de la transacción)
     try:
         conn, _ = _conn_with_fallbacks(disp)
 
@@ -379,13 +379,14 @@ def empleado_crear_en_equipo(request, pk):
         emp.dispositivo = disp
         cambios.append("dispositivo")
 
-    if cambios:
-        emp.save(update_fields=cambios)
+    with transaction.atomic():
+        if cambios:
+            emp.save(update_fields=cambios)
 
-    ud.empleado = emp
-    ud.nombre = emp.nombre_completo[:64]
-    ud.activo = emp.activo
-    ud.save(update_fields=["empleado", "nombre", "activo"])
+        ud.empleado = emp
+        ud.nombre = emp.nombre_completo[:64]
+        ud.activo = emp.activo
+        ud.save(update_fields=["empleado", "nombre", "activo"])
 
     messages.success(request, "Registrado en el equipo y vinculado.")
     return redirect("empleados:list")
@@ -426,6 +427,41 @@ def documento_subir_candidato(request, cand_id):
         return redirect("empleados:candidato_detalle", pk=cand_id)
     return redirect("empleados:candidato_list")
 
+@login_required
+@user_passes_test(_only_staff)
+def empleado_foto(request, pk, tamano):
+    """Versión reducida de la foto; se genera aquí si aún no existe (ver empleados/fotos.py)."""
+    nombre = Empleado.objects.filter(pk=pk).values_list("foto", flat=True).first()
+    if tamano not in fotos.TAMANOS or not nombre:
+        raise Http404("Foto no encontrada")
+    try:
+        ruta = fotos.version(nombre, tamano)
+    except (OSError, UnidentifiedImageError):
+        raise Http404("Foto no encontrada")
+    resp = FileResponse(open(ruta, "rb"), content_type="image/jpeg")
+    # La URL lleva ?v=<digest del original>: una foto nueva cambia la URL
+    resp["Cache-Control"] = "private, max-age=31536000, immutable"
+    return resp
+
+
+def _etag_documento(request, pk):
+    # El SHA-256 del contenido: condition() lo envía como ETag fuerte y responde 304
+    return Documento.objects.filter(pk=pk).values_list("contenido__sha256", flat=True).first()
+
+
+@login_required
+@user_passes_test(_only_staff)
+@condition(etag_func=_etag_documento)
+def documento_descargar(request, pk):
+    doc = get_object_or_404(Documento, pk=pk)
+    try:
+        fh = doc.archivo.open("rb")
+    except FileNotFoundError:
+        raise Http404("Archivo no encontrado")
+    resp = FileResponse(fh, filename=doc.nombre_original or os.path.basename(doc.archivo.name))
+    resp["Cache-Control"] = "private, no-cache"
+    return resp
+
 @login_required
 @user_passes_test(_only_staff)
 def documento_eliminar(request, pk):
@@ -453,12 +489,7 @@ def candidato_list(request):
     qs = Candidato.objects.all().order_by("-creado_en")
 
     if q:
-        qs = qs.filter(
-            Q(nombre__icontains=q) |
-            Q(apellido__icontains=q) |
-            Q(doc_id__icontains=q) |
-            Q(skills__icontains=q)
-        )
+        qs = qs.filter(busqueda.filtro(q))
     if status and status in dict(Candidato.ESTADOS):
         qs = qs.filter(estado=status)
 
@@ -517,10 +548,14 @@ def candidato_promover(request, pk):
     }
     form = EmpleadoForm(request.POST or None, initial=initial)
     if request.method == "POST" and form.is_valid():
-        emp = form.save()
-        # Actualizar estado candidato
-        candidato.estado = "CONTR"
-        candidato.save()
+        with transaction.atomic():
+            emp = form.save()
+            # Los documentos del candidato pasan al expediente sin copiar archivos
+            for doc in candidato.documentos.all():
+                documentos.copiar(doc, empleado=emp)
+            # Actualizar estado candidato
+            candidato.estado = "CONTR"
+            candidato.save()
         messages.success(request, f"Candidato promovido a empleado: {emp}")
         return redirect("empleados:list")
 
@@ -548,6 +583,8 @@ def baja_eliminar(request, pk):
     baja = get_object_or_404(BajaAutorizada, pk=pk)
     emp_id = baja.empleado_id
     baja.delete()
+    messages.success(request, "Baja autorizada eliminada.")
+    return redirect("empleados:detalle", pk=emp_id)
 @login_required
 @user_passes_test(_only_staff)
 def empleado_vincular(request, pk):
@@ -577,7 +614,7 @@ def load_users(request):
     dispositivo_id = request.GET.get('dispositivo')
     users = UsuarioDispositivo.objects.none()
     if dispositivo_id:
-        users = UsuarioDispositivo.objects.filter(dispositivo_id=dispositivo_id).order_by('nombre', 'user_id')
+        users = UsuarioDispositivo.objects.filter(dispositivo_id=dispositivo_id).select_related('dispositivo').order_by('nombre', 'user_id')
     
     return render(request, "empleados/dropdown_users.html", {"users": users})
 
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import NominaPeriodo, NominaEmpleado
+from django.template.response import TemplateResponse
+
+from . import rendimiento
+from .models import MuestraRendimiento, NominaPeriodo, NominaEmpleado
 
 class NominaEmpleadoInline(admin.TabularInline):
     model = NominaEmpleado
@@ -27,3 +30,28 @@ class NominaEmpleadoAdmin(admin.ModelAdmin):
     list_display = ("empleado", "periodo", "salario_base", "neto_pagar")
     list_filter = ("periodo", "empleado__departamento")
     search_fields = ("empleado__nombre", "empleado__apellido", "empleado__numero")
+
+
+@admin.register(MuestraRendimiento)
+class MuestraRendimientoAdmin(admin.ModelAdmin):
+    """En lugar del listado de muestras, percentiles por vista y consultas más lentas."""
+    PERIODOS = (1, 24, 24 * 7)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        horas = request.GET.get("horas", "24")
+        horas = int(horas) if horas.isdigit() and int(horas) in self.PERIODOS else 24
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Rendimiento de vistas",
+            "horas": horas,
+            "periodos": self.PERIODOS,
+            **rendimiento.resumen(horas),
+        }
+        return TemplateResponse(request, "admin/reportes/rendimiento.html", context)
@@ -0,0 +1,302 @@
+"""
+Banco de rendimiento de reportes, dashboard y sincronización.
+
+ejecutar() mide sobre la base de datos actual (p. ej. tras
+generar_datos_sinteticos):
+
+- Cada vista de reportes (todas las rutas de reportes/urls.py salvo las que
+  escriben), el dashboard y sus listados, con un Client autenticado. Por caso
+  anota el tiempo total (mínimo, mediana, máximo de N repeticiones),
+  consultas SQL, bytes de la respuesta y, cuando aplica, cuánto fue cálculo y
+  cuánto generación del PDF/XLSX (histogramas de zkmanager/metricas.py).
+- Las dos vías de sincronización contra un dispositivo simulado con marcajes
+  de dispositivos/sintetico.py: la programada (sync_biometricos) y la manual
+  (vistas descargar_usuarios y descargar_asistencia). Cada una se mide con la
+  tabla vacía (carga inicial) y repitiendo la descarga (caso habitual: casi
+  todo ya existe). Se ejecutan dentro de una transacción que se revierte.
+
+El resultado es un dict serializable a JSON; comparar() lo contrasta con una
+ejecución anterior y devuelve las regresiones.
+"""
+from __future__ import annotations
+
+import io
+import platform
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+from unittest import mock
+
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from dispositivos import sintetico
+from dispositivos.models import AsistenciaCruda, Dispositivo
+from empleados.models import Empleado
+from zkmanager import metricas
+
+from .rendimiento import _Consultas
+from .urls import urlpatterns
+
+VERSION = 1
+# Rutas de reportes que no se miden porque modifican datos
+EXCLUIDAS = {"nomina_guardar"}
+
+
+def _fecha_fin() -> date:
+    ultimo = AsistenciaCruda.objects.aggregate(m=Max("ts"))["m"]
+    return ultimo.date() if ultimo else date.today()
+
+
+def _casos(d1: date, d2: date, empleado: Empleado | None = None) -> List[Tuple[str, str]]:
+    """(caso, url) de cada vista a medir. Sin `empleado`, el que tiene más usuarios de dispositivo."""
+    rango = f"inicio={d1:%Y-%m-%d}&fin={d2:%Y-%m-%d}"
+    if empleado is None:
+        empleado = Empleado.objects.filter(activo=True).annotate(n=Count("usuarios_dispositivo")).order_by("-n", "pk").first()
+    emp = f"&empleado=emp-{empleado.pk}" if empleado else ""
+    depto = (
+        Empleado.objects.filter(activo=True).exclude(departamento="")
+        .values_list("departamento").annotate(n=Count("pk")).order_by("-n").first()
+    )
+    dep = f"&departamento={depto[0]}" if depto else ""
+
+    def r(nombre, query="", *args):
+        return reverse(f"reportes:{nombre}", args=args) + (f"?{query}" if query else "")
+
+    casos = [
+        ("dashboard", reverse("dashboard") + f"?fecha={d2:%Y-%m-%d}"),
+        *[
+            (f"dashboard_listado:{tipo}", r("dashboard_listado", f"fecha={d2:%Y-%m-%d}", tipo))
+            for tipo in ("activos", "firmaron", "tarde", "nofirmaron")
+        ],
+        ("asistencia_general", r("asistencia_general", f"desde={d1:%Y-%m-%d}&hasta={d2:%Y-%m-%d}")),
+        ("ausencias", r("ausencias", f"fecha={d2:%Y-%m-%d}")),
+    ]
+    for base in ("nomina_horas", "ausencias_totales", "solo_entrada", "nomina_calculo"):
+        for sufijo in ("form", "pdf", "xlsx"):
+            casos.append((f"{base}_{sufijo}", r(f"{base}_{sufijo}", rango)))
+    for base in ("rep_empleado", "rep_ausencias_empleado"):
+        for sufijo in ("form", "pdf", "xlsx"):
+            casos.append((f"{base}_{sufijo}", r(f"{base}_{sufijo}", rango + emp)))
+    casos += [
+        ("nomina_preview", r("nomina_preview", rango)),
+        ("nomina_archivo", r("nomina_archivo")),
+        ("lote_empleados_form", r("lote_empleados_form")),
+    ]
+    for tipo in ("asistencia", "ausencias"):
+        for formato in ("pdf", "zip"):
+            casos.append((
+                f"lote_empleados_export:{tipo}:{formato}",
+                r("lote_empleados_export", f"{rango}&tipo={tipo}&formato={formato}{dep}"),
+            ))
+    return casos
+
+
+def sin_caso() -> List[str]:
+    """Rutas de reportes que no tienen caso ni están excluidas (hay que añadirlas aquí)."""
+    cubiertas = {c.split(":")[0] for c, _ in _casos(date.today(), date.today())}
+    return sorted(p.name for p in urlpatterns if p.name not in cubiertas | EXCLUIDAS)
+
+
+def _consumir(response) -> int:
+    if response.streaming:
+        n = sum(len(trozo) for trozo in response.streaming_content)
+        response.close()
+        return n
+    return len(response.content)
+
+
+def _sumas() -> Dict[str, float]:
+    return {
+        nombre: sum(s for s, _ in metricas.totales(nombre).values())
+        for nombre in ("zk_reporte_calculo_segundos", "zk_reporte_render_segundos")
+    }
+
+
+def _medir(funcion: Callable[[], object], repeticiones: int) -> dict:
+    """Ejecuta `funcion` N veces. Devuelve tiempos, consultas y lo que devuelva la última."""
+    tiempos, consultas, calculo, render = [], 0, 0.0, 0.0
+    resultado = None
+    for _ in range(repeticiones):
+        antes = _sumas()
+        contador = _Consultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        despues = _sumas()
+        consultas = contador.n
+        calculo = (despues["zk_reporte_calculo_segundos"] - antes["zk_reporte_calculo_segundos"]) * 1000
+        render = (despues["zk_reporte_render_segundos"] - antes["zk_reporte_render_segundos"]) * 1000
+    return {
+        "repeticiones": repeticiones,
+        "ms_min": round(min(tiempos), 2),
+        "ms_mediana": round(statistics.median(tiempos), 2),
+        "ms_max": round(max(tiempos), 2),
+        "consultas": consultas,
+        "calculo_ms": round(calculo, 2),
+        "render_ms": round(render, 2),
+        "_resultado": resultado,
+    }
+
+
+def _vistas(client: Client, casos, repeticiones: int, filtro: str) -> List[dict]:
+    out = []
+    for caso, url in casos:
+        if filtro and filtro not in caso:
+            continue
+        tamano = {}
+
+        def _peticion():
+            response = client.get(url)
+            tamano["bytes"] = _consumir(response)
+            return response.status_code
+
+        fila = _medir(_peticion, repeticiones)
+        out.append({"grupo": "vista", "caso": caso, "url": url, "estado": fila.pop("_resultado"),
+                    "bytes": tamano["bytes"], **fila})
+    return out
+
+
+# --------------------------------------------------------------------------------------
+# Sincronización contra un dispositivo simulado
+# --------------------------------------------------------------------------------------
+class _Usuario:
+    def __init__(self, uid: int, user_id: str):
+        self.uid, self.user_id, self.name = uid, user_id, f"Usuario {user_id}"
+        self.privilege, self.group_id = 0, ""
+
+
+class ConexionSimulada:
+    """Lo que usan las dos vías de sincronización de una conexión pyzk."""
+
+    def __init__(self, usuarios: list, marcajes: list):
+        self.usuarios, self.marcajes = usuarios, marcajes
+
+    def read_sizes(self):
+        self.users, self.records = len(self.usuarios), len(self.marcajes)
+        return True
+
+    def get_users(self):
+        return list(self.usuarios)
+
+    def get_attendance(self):
+        return list(self.marcajes)
+
+    def disable_device(self):
+        pass
+
+    def enable_device(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def _sincronizacion(client: Client, empleados: int, d1: date, d2: date, repeticiones: int, filtro: str) -> List[dict]:
+    from dispositivos import views as vistas_dispositivos
+    from dispositivos.management.commands.sync_biometricos import Command as SyncCommand
+
+    marcajes = list(sintetico.marcajes_dispositivo(empleados, d1, d2))
+    usuarios = [_Usuario(i + 1, sintetico.user_id(i)) for i in range(empleados)]
+    conn = ConexionSimulada(usuarios, marcajes)
+    out = []
+
+    def _caso(nombre: str, funcion: Callable[[Dispositivo], object]):
+        if filtro and filtro not in nombre:
+            return
+        for fase in ("inicial", "repetida"):
+            with transaction.atomic():
+                disp = Dispositivo.objects.create(nombre="BENCH-SYNC", ip="10.255.255.254", activo=False)
+                if fase == "repetida":
+                    funcion(disp)  # precarga, sin medir
+                fila = _medir(lambda: funcion(disp), 1 if fase == "inicial" else repeticiones)
+                fila.pop("_resultado")
+                out.append({"grupo": "sync", "caso": f"{nombre}:{fase}", "marcajes": len(marcajes),
+                            "usuarios": len(usuarios), **fila})
+                transaction.set_rollback(True)
+
+    def _programada(disp):
+        # completa: la fase repetida mide el procesado, no la omisión por contadores
+        SyncCommand(stdout=io.StringIO())._sincronizar_usuarios_y_registros(conn, disp, completa=True)
+
+    def _manual(disp):
+        with mock.patch.object(vistas_dispositivos, "_conn_with_fallbacks", return_value=(conn, "")):
+            client.post(reverse("config:descargar_usuarios", args=[disp.pk]))
+            client.post(reverse("config:descargar_asistencia", args=[disp.pk]))
+
+    _caso("sync_programada", _programada)
+    _caso("sync_manual", _manual)
+    return out
+
+
+# --------------------------------------------------------------------------------------
+# Ejecución y comparación
+# --------------------------------------------------------------------------------------
+def ejecutar(
+    usuario, dias: int = 30, repeticiones: int = 3, filtro: str = "",
+    sync_empleados: int = 300, sync_dias: int = 90, hasta: date | None = None,
+) -> dict:
+    d2 = hasta or _fecha_fin()
+    d1 = d2 - timedelta(days=dias - 1)
+    # Sin muestras de rendimiento ni métricas del banco en las de producción
+    with override_settings(
+        RENDIMIENTO_ACTIVO=False,
+        METRICAS_DIR=tempfile.mkdtemp(prefix="benchmark-metricas-"),
+        ALLOWED_HOSTS=["testserver"],
+    ):
+        # Un error de una vista queda como estado 500 en su caso, no detiene el banco
+        client = Client(raise_request_exception=False)
+        client.force_login(usuario)
+        resultados = _vistas(client, _casos(d1, d2), repeticiones, filtro)
+        if sync_empleados:
+            resultados += _sincronizacion(
+                client, sync_empleados, d2 - timedelta(days=sync_dias - 1), d2, repeticiones, filtro,
+            )
+
+    return {
+        "version": VERSION,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "entorno": {
+            "python": platform.python_version(),
+            "motor_bd": connection.vendor,
+            "maquina": platform.node(),
+        },
+        "datos": {
+            "dispositivos": Dispositivo.objects.count(),
+            "empleados": Empleado.objects.filter(activo=True).count(),
+            "marcajes": AsistenciaCruda.objects.count(),
+        },
+        "parametros": {
+            "inicio": d1.isoformat(), "fin": d2.isoformat(), "repeticiones": repeticiones,
+            "sync_empleados": sync_empleados, "sync_dias": sync_dias,
+        },
+        "sin_caso": sin_caso(),
+        "resultados": resultados,
+    }
+
+
+def comparar(anterior: dict, actual: dict, tolerancia: float = 0.25, minimo_ms: float = 5.0) -> List[str]:
+    """
+    Regresiones de `actual` frente a `anterior`: mediana más de `tolerancia`
+    peor (ignorando diferencias menores que `minimo_ms`), más consultas, o un
+    estado HTTP distinto.
+    """
+    previos = {r["caso"]: r for r in anterior.get("resultados", [])}
+    out = []
+    for r in actual["resultados"]:
+        p = previos.get(r["caso"])
+        if p is None:
+            continue
+        if r.get("estado") != p.get("estado"):
+            out.append(f"{r['caso']}: estado {p.get('estado')} -> {r.get('estado')}")
+        delta = r["ms_mediana"] - p["ms_mediana"]
+        if delta > minimo_ms and r["ms_mediana"] > p["ms_mediana"] * (1 + tolerancia):
+            out.append(f"{r['caso']}: {p['ms_mediana']:.1f} ms -> {r['ms_mediana']:.1f} ms")
+        if r["consultas"] > p["consultas"]:
+            out.append(f"{r['caso']}: {p['consultas']} -> {r['consultas']} consultas")
+    return out
@@ -0,0 +1,242 @@
+"""
+Comparación diferencial entre motores de cálculo de reportes.
+
+Cada reporte tiene el motor "actual" (las implementaciones de reportes/views.py)
+y puede tener otros registrados con registrar(). ejecutar() genera conjuntos
+sintéticos aleatorios con dispositivos/sintetico.py (uno por semilla, dentro
+de una transacción que se revierte), elige rangos al azar y corre todos los
+motores de cada reporte sobre los mismos datos. Las salidas se comparan de
+forma exacta (fechas y horas con su zona, importes sin redondeo) y se anota
+cuánto tarda cada motor frente al actual.
+
+Un motor recibe (d1, d2) y devuelve la misma estructura que el adaptador del
+motor actual de su reporte (ver _ACTUALES). Los reportes por persona devuelven
+{empleado_id: {...}} para todos los empleados activos.
+"""
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Sequence
+
+from django.db import transaction
+
+from dispositivos import sintetico
+from dispositivos.models import Dispositivo
+from empleados import dimensiones
+from empleados.models import Empleado
+
+from . import views
+
+ACTUAL = "actual"
+MAX_DIFERENCIAS = 20
+
+Motor = Callable[[date, date], object]
+MOTORES: Dict[str, Dict[str, Motor]] = {}
+
+
+def registrar(reporte: str, nombre: str):
+    """Decorador: registra `nombre` como motor alternativo de `reporte`."""
+    if reporte not in MOTORES:
+        raise KeyError(f"Reporte desconocido: {reporte}")
+
+    def _decorador(funcion: Motor) -> Motor:
+        MOTORES[reporte][nombre] = funcion
+        return funcion
+    return _decorador
+
+
+# --------------------------------------------------------------------------------------
+# Motores actuales y el de lote (reportes por persona)
+# --------------------------------------------------------------------------------------
+def _activos() -> List[int]:
+    return list(Empleado.objects.filter(activo=True).order_by("pk").values_list("pk", flat=True))
+
+
+def _reporte_empleado(d1: date, d2: date) -> dict:
+    vista = views.ReporteEmpleadoPDFView()
+    out = {}
+    for pk in _activos():
+        rows, meta = vista._rows_for_person(d1, d2, "emp", emp_id=pk)
+        out[pk] = {"meta": meta, "rows": rows}
+    return out
+
+
+def _ausencias_empleado(d1: date, d2: date) -> dict:
+    vista = views.RepAusenciasEmpleadoPDFView()
+    out = {}
+    for pk in _activos():
+        rows, meta, total = vista._rows_for_person(d1, d2, "emp", emp_id=pk)
+        out[pk] = {"meta": meta, "rows": rows, "total_laborables": total}
+    return out
+
+
+_ACTUALES: Dict[str, Motor] = {
+    "nomina_horas": lambda d1, d2: views.NominaHorasPDFView()._compute_totals(d1, d2),
+    "ausencias_totales": lambda d1, d2: dict(zip(("rows", "total_dias"), views.AusenciasTotalesPDFView()._compute_rows(d1, d2))),
+    "solo_entrada": lambda d1, d2: views.SoloEntradaPDFView()._compute_rows(d1, d2),
+    "reporte_empleado": _reporte_empleado,
+    "ausencias_empleado": _ausencias_empleado,
+    "nomina_calculo": lambda d1, d2: views.NominaCalculoPDFView()._compute_nomina(d1, d2),
+}
+MOTORES.update({reporte: {ACTUAL: motor} for reporte, motor in _ACTUALES.items()})
+
+
+@registrar("reporte_empleado", "lote")
+def _reporte_empleado_lote(d1: date, d2: date) -> dict:
+    return {it["id"]: {"meta": it["meta"], "rows": it["rows"]} for it in views._rows_asistencia_lote(d1, d2)}
+
+
+@registrar("ausencias_empleado", "lote")
+def _ausencias_empleado_lote(d1: date, d2: date) -> dict:
+    return {
+        it["id"]: {"meta": it["meta"], "rows": it["rows"], "total_laborables": it["total_laborables"]}
+        for it in views._rows_ausencias_lote(d1, d2)
+    }
+
+
+# --------------------------------------------------------------------------------------
+# Comparación
+# --------------------------------------------------------------------------------------
+def normalizar(valor):
+    """Forma comparable y serializable: fechas con zona en ISO, duraciones en segundos, tuplas como listas."""
+    if isinstance(valor, dict):
+        return {str(k): normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [normalizar(v) for v in valor]
+    if isinstance(valor, (set, frozenset)):
+        return sorted(normalizar(v) for v in valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return valor.total_seconds()
+    return valor
+
+
+def diferencias(esperado, obtenido, ruta: str = "", limite: int = MAX_DIFERENCIAS) -> List[str]:
+    """Diferencias entre dos salidas ya normalizadas, como 'ruta: esperado != obtenido'."""
+    out: List[str] = []
+
+    def _comparar(a, b, r):
+        if len(out) >= limite:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for k in sorted(a.keys() | b.keys()):
+                if k not in b:
+                    out.append(f"{r}/{k}: falta")
+                elif k not in a:
+                    out.append(f"{r}/{k}: sobra")
+                else:
+                    _comparar(a[k], b[k], f"{r}/{k}")
+        elif isinstance(a, list) and isinstance(b, list):
+            if len(a) != len(b):
+                out.append(f"{r}: {len(a)} elementos != {len(b)}")
+            for i, (x, y) in enumerate(zip(a, b)):
+                _comparar(x, y, f"{r}[{i}]")
+        elif type(a) is not type(b) or a != b:
+            out.append(f"{r}: {a!r} != {b!r}")
+
+    _comparar(esperado, obtenido, ruta)
+    return out
+
+
+def _cronometrar(motor: Motor, d1: date, d2: date, repeticiones: int):
+    tiempos, resultado = [], None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = motor(d1, d2)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return normalizar(resultado), statistics.median(tiempos)
+
+
+def _filas(salida) -> int:
+    return len(salida["rows"]) if isinstance(salida, dict) and "rows" in salida else len(salida)
+
+
+def comparar(reporte: str, d1: date, d2: date, motores: Sequence[str] = (), repeticiones: int = 1) -> dict:
+    """Corre el motor actual y los demás (o los de `motores`) de `reporte` sobre (d1, d2)."""
+    disponibles = MOTORES[reporte]
+    esperado, ms_actual = _cronometrar(disponibles[ACTUAL], d1, d2, repeticiones)
+    fila = {
+        "reporte": reporte, "inicio": d1.isoformat(), "fin": d2.isoformat(),
+        "filas": _filas(esperado), "ms": {ACTUAL: round(ms_actual, 2)}, "ratio": {}, "diferencias": {},
+    }
+    for nombre, motor in disponibles.items():
+        if nombre == ACTUAL or (motores and nombre not in motores):
+            continue
+        obtenido, ms = _cronometrar(motor, d1, d2, repeticiones)
+        fila["ms"][nombre] = round(ms, 2)
+        fila["ratio"][nombre] = round(ms / ms_actual, 3) if ms_actual else None
+        fila["diferencias"][nombre] = diferencias(esperado, obtenido)
+    return fila
+
+
+def _rangos(rng: random.Random, desde: date, hasta: date, n: int) -> List[tuple]:
+    """El periodo completo y n-1 rangos al azar dentro de él (de un día a todo el periodo)."""
+    dias = (hasta - desde).days
+    out = [(desde, hasta)]
+    for _ in range(n - 1):
+        inicio = desde + timedelta(days=rng.randint(0, dias))
+        out.append((inicio, min(hasta, inicio + timedelta(days=rng.randint(0, dias)))))
+    return out
+
+
+def ejecutar(
+    semillas: Sequence[int] = (1, 2, 3), empleados: int = 30, dias: int = 90, rangos: int = 3,
+    reportes: Sequence[str] = (), motores: Sequence[str] = (), repeticiones: int = 1,
+    hasta: date | None = None, progreso: Callable[[str], None] | None = None,
+) -> dict:
+    """
+    Un conjunto sintético por semilla (entre la mitad y `empleados`, 1 a 3
+    dispositivos, `dias` de marcajes), revertido al terminar. Devuelve los
+    resultados de comparar() para cada reporte y rango.
+    """
+    hasta = hasta or date.today()
+    reportes = list(reportes) or list(MOTORES)
+    resultados = []
+    for semilla in semillas:
+        rng = random.Random(semilla)
+        n_emp = rng.randint(max(1, empleados // 2), max(1, empleados))
+        n_disp = rng.randint(1, 3)
+        with transaction.atomic():
+            sintetico.limpiar()
+            sintetico.generar(n_disp, n_emp, dias / 365, hasta=hasta, semilla=semilla)
+            # generar() los deja inactivos; algunos reportes solo cuentan dispositivos activos
+            Dispositivo.objects.filter(nombre__startswith=f"{sintetico.PREFIJO}-").update(activo=True)
+            for d1, d2 in _rangos(rng, hasta - timedelta(days=dias - 1), hasta, rangos):
+                for reporte in reportes:
+                    fila = comparar(reporte, d1, d2, motores, repeticiones)
+                    fila.update(semilla=semilla, empleados=n_emp, dispositivos=n_disp)
+                    resultados.append(fila)
+                    if progreso:
+                        progreso(_resumen_fila(fila))
+            transaction.set_rollback(True)
+        # La caché de departamentos pudo cargar filas revertidas
+        dimensiones.invalidar()
+    return {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parametros": {
+            "semillas": list(semillas), "empleados": empleados, "dias": dias, "rangos": rangos,
+            "repeticiones": repeticiones, "hasta": hasta.isoformat(),
+        },
+        "resultados": resultados,
+    }
+
+
+def _resumen_fila(fila: dict) -> str:
+    partes = [f"{fila['reporte']} {fila['inicio']}..{fila['fin']} ({fila['filas']} filas) actual {fila['ms'][ACTUAL]:.1f} ms"]
+    for nombre, ratio in fila["ratio"].items():
+        estado = "OK" if not fila["diferencias"][nombre] else f"{len(fila['diferencias'][nombre])} diferencias"
+        partes.append(f"{nombre} x{ratio} {estado}")
+    return " | ".join(partes)
+
+
+def con_diferencias(resultado: dict) -> List[str]:
+    """Líneas 'reporte/motor rango: diferencia' de todas las comparaciones que no coinciden."""
+    out = []
+    for fila in resultado["resultados"]:
+        for nombre, difs in fila["diferencias"].items():
+            out += [f"{fila['reporte']}/{nombre} s{fila['semilla']} {fila['inicio']}..{fila['fin']}{d}" for d in difs]
+    return out
@@ -0,0 +1,81 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from reportes import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de cada vista de reportes, el dashboard y las dos vías de sincronización "
+        "y escribe el resultado en JSON. Con --comparar falla si hay regresiones. Ver reportes/benchmark.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto, la salida estándar).")
+        parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones por caso (por defecto 3).")
+        parser.add_argument('--dias', type=int, default=30, help="Días del rango de los reportes (por defecto 30).")
+        parser.add_argument('--hasta', help="Último día del rango, YYYY-MM-DD (por defecto, el del último marcaje).")
+        parser.add_argument('--solo', default="", help="Solo los casos cuyo nombre contenga este texto.")
+        parser.add_argument('--sync-empleados', type=int, default=300,
+                            help="Usuarios del dispositivo simulado para medir la sincronización (0 = no medir).")
+        parser.add_argument('--sync-dias', type=int, default=90, help="Días de marcajes del dispositivo simulado.")
+        parser.add_argument('--usuario', help="Usuario con el que se hacen las peticiones (por defecto, el primer superusuario).")
+        parser.add_argument('--comparar', help="JSON de una ejecución anterior para detectar regresiones.")
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help="Empeoramiento relativo de la mediana que cuenta como regresión (por defecto 0.25).")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+        else:
+            usuario = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if usuario is None:
+            raise CommandError("No hay usuario para autenticar las peticiones (use --usuario).")
+        if options['repeticiones'] < 1 or options['dias'] < 1:
+            raise CommandError("Repeticiones y días deben ser mayores que cero.")
+        hasta = None
+        if options['hasta']:
+            hasta = parse_date(options['hasta'])
+            if hasta is None:
+                raise CommandError("Fecha --hasta inválida (YYYY-MM-DD).")
+
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as fh:
+                    anterior = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+
+        resultado = benchmark.ejecutar(
+            usuario,
+            dias=options['dias'],
+            repeticiones=options['repeticiones'],
+            filtro=options['solo'],
+            sync_empleados=options['sync_empleados'],
+            sync_dias=options['sync_dias'],
+            hasta=hasta,
+        )
+        texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as fh:
+                fh.write(texto + "\n")
+        else:
+            self.stdout.write(texto)
+
+        # El resumen va a stderr para no mezclarse con el JSON
+        for r in resultado['resultados']:
+            sys.stderr.write(f"{r['caso']:<45} {r['ms_mediana']:>10.1f} ms {r['consultas']:>6} consultas\n")
+        for nombre in resultado['sin_caso']:
+            sys.stderr.write(self.style.WARNING(f"Ruta sin caso de benchmark: {nombre}\n"))
+
+        if anterior is not None:
+            regresiones = benchmark.comparar(anterior, resultado, options['tolerancia'])
+            if regresiones:
+                raise CommandError("Regresiones:\n  " + "\n  ".join(regresiones))
+            sys.stderr.write(self.style.SUCCESS("Sin regresiones.\n"))
@@ -0,0 +1,74 @@
+import importlib
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from reportes import diferencial
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre el motor actual de cada reporte y los alternativos sobre conjuntos sintéticos aleatorios, "
+        "compara sus filas de forma exacta y anota la relación de tiempos. Falla si alguna salida difiere. "
+        "Ver reportes/diferencial.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semillas', default="1,2,3", help="Semillas separadas por comas, un conjunto por semilla (por defecto 1,2,3).")
+        parser.add_argument('--empleados', type=int, default=30, help="Máximo de empleados por conjunto (por defecto 30).")
+        parser.add_argument('--dias', type=int, default=90, help="Días de marcajes por conjunto (por defecto 90).")
+        parser.add_argument('--rangos', type=int, default=3,
+                            help="Rangos por conjunto: el periodo completo y el resto al azar (por defecto 3).")
+        parser.add_argument('--reporte', action='append', default=[],
+                            help=f"Solo este reporte (repetible). Disponibles: {', '.join(diferencial.MOTORES)}.")
+        parser.add_argument('--motor', action='append', default=[], help="Solo este motor alternativo (repetible).")
+        parser.add_argument('--motores-modulo', action='append', default=[],
+                            help="Módulo a importar antes de empezar que registra motores con diferencial.registrar (repetible).")
+        parser.add_argument('--repeticiones', type=int, default=1, help="Ejecuciones por motor; se toma la mediana (por defecto 1).")
+        parser.add_argument('--hasta', help="Último día de los marcajes, YYYY-MM-DD (por defecto, hoy).")
+        parser.add_argument('--salida', help="Archivo JSON con todas las comparaciones.")
+
+    def handle(self, *args, **options):
+        for modulo in options['motores_modulo']:
+            try:
+                importlib.import_module(modulo)
+            except ImportError as e:
+                raise CommandError(f"No se pudo importar {modulo}: {e}")
+        desconocidos = [r for r in options['reporte'] if r not in diferencial.MOTORES]
+        if desconocidos:
+            raise CommandError(f"Reportes desconocidos: {', '.join(desconocidos)}.")
+        try:
+            semillas = [int(s) for s in options['semillas'].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--semillas debe ser una lista de enteros separados por comas.")
+        if not semillas:
+            raise CommandError("Indique al menos una semilla.")
+        if min(options['empleados'], options['dias'], options['rangos'], options['repeticiones']) < 1:
+            raise CommandError("Empleados, días, rangos y repeticiones deben ser mayores que cero.")
+        hasta = None
+        if options['hasta']:
+            hasta = parse_date(options['hasta'])
+            if hasta is None:
+                raise CommandError("Fecha --hasta inválida (YYYY-MM-DD).")
+
+        resultado = diferencial.ejecutar(
+            semillas=semillas,
+            empleados=options['empleados'],
+            dias=options['dias'],
+            rangos=options['rangos'],
+            reportes=options['reporte'],
+            motores=options['motor'],
+            repeticiones=options['repeticiones'],
+            hasta=hasta,
+            progreso=lambda linea: sys.stderr.write(linea + "\n"),
+        )
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as fh:
+                fh.write(json.dumps(resultado, ensure_ascii=False, indent=2) + "\n")
+
+        fallos = diferencial.con_diferencias(resultado)
+        if fallos:
+            raise CommandError("Salidas distintas del motor actual:\n  " + "\n  ".join(fallos))
+        self.stdout.write(self.style.SUCCESS(f"{len(resultado['resultados'])} comparaciones sin diferencias."))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MuestraRendimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado_en', models.DateTimeField(db_index=True)),
+                ('vista', models.CharField(max_length=200)),
+                ('metodo', models.CharField(max_length=8)),
+                ('estado', models.PositiveSmallIntegerField()),
+                ('duracion_ms', models.FloatField()),
+                ('consultas', models.PositiveIntegerField(default=0)),
+                ('tiempo_bd_ms', models.FloatField(default=0)),
+                ('bytes', models.BigIntegerField(blank=True, help_text='Vacío si no se conoce el tamaño de la respuesta', null=True)),
+                ('consulta_lenta', models.TextField(blank=True)),
+                ('consulta_lenta_ms', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Muestra de rendimiento',
+                'verbose_name_plural': 'Rendimiento de vistas',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['vista', 'creado_en'], name='reportes_mu_vista_f3ac7c_idx')],
+            },
+        ),
+    ]
@@ -60,3 +60,29 @@ class NominaEmpleado(models.Model):
 
     def __str__(self):
         return f"{self.empleado} - {self.periodo}"
+
+
+class MuestraRendimiento(models.Model):
+    """
+    Una petición HTTP medida por reportes.rendimiento.RendimientoMiddleware.
+    Se escriben por lotes desde el buffer en memoria de cada proceso.
+    """
+    creado_en = models.DateTimeField(db_index=True)
+    vista = models.CharField(max_length=200)
+    metodo = models.CharField(max_length=8)
+    estado = models.PositiveSmallIntegerField()
+    duracion_ms = models.FloatField()
+    consultas = models.PositiveIntegerField(default=0)
+    tiempo_bd_ms = models.FloatField(default=0)
+    bytes = models.BigIntegerField(null=True, blank=True, help_text="Vacío si no se conoce el tamaño de la respuesta")
+    consulta_lenta = models.TextField(blank=True)
+    consulta_lenta_ms = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ["-creado_en"]
+        indexes = [models.Index(fields=["vista", "creado_en"])]
+        verbose_name = "Muestra de rendimiento"
+        verbose_name_plural = "Rendimiento de vistas"
+
+    def __str__(self):
+        return f"{self.vista} {self.duracion_ms:.0f} ms"
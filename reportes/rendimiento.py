@@ -0,0 +1,228 @@
+"""
+Medición del rendimiento de cada petición.
+
+RendimientoMiddleware anota por petición:
+- la vista (nombre de URL),
+- el tiempo total,
+- el número y tiempo de consultas SQL y la más lenta,
+- el tamaño de la respuesta.
+
+En las respuestas en streaming (exportaciones CSV, ZIP por lotes) el trabajo
+ocurre al iterar el contenido, así que la muestra se anota al terminar la
+iteración, con las consultas hechas mientras tanto y los bytes enviados.
+
+Coste por petición: un execute_wrapper de Django (dos perf_counter por
+consulta) y un append a un deque acotado.
+
+Cada proceso guarda las muestras en un buffer circular en memoria (BUFFER
+entradas; si se llena, se pierden las más antiguas). Un hilo las vuelca en
+MuestraRendimiento cada RENDIMIENTO_INTERVALO segundos con un bulk_create, y
+borra las de más de RENDIMIENTO_RETENCION_DIAS. Así se agregan en el admin
+los datos de todos los procesos web.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BUFFER = 10_000
+MAX_SQL = 2000
+
+_buffer: deque = deque(maxlen=BUFFER)
+_hilo_lock = threading.Lock()
+_hilo: threading.Thread | None = None
+_ultima_limpieza = 0.0
+
+
+class _Consultas:
+    """execute_wrapper que cuenta consultas y guarda la más lenta."""
+    __slots__ = ("n", "total", "lenta", "lenta_s")
+
+    def __init__(self):
+        self.n, self.total, self.lenta, self.lenta_s = 0, 0.0, "", 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            t = time.perf_counter() - inicio
+            self.n += 1
+            self.total += t
+            if t > self.lenta_s:
+                self.lenta, self.lenta_s = sql, t
+
+
+class RendimientoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.activo = getattr(settings, "RENDIMIENTO_ACTIVO", True)
+
+    def __call__(self, request):
+        if not self.activo:
+            return self.get_response(request)
+
+        consultas = _Consultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(consultas):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async and getattr(response, "file_to_stream", None) is None:
+            # El trabajo de las exportaciones en streaming ocurre al iterar: se mide hasta el último trozo
+            contenido = response.streaming_content
+            response.streaming_content = self._medir_stream(request, response, contenido, consultas, inicio)
+            return response
+
+        if response.streaming:
+            tamano = int(response["Content-Length"]) if response.has_header("Content-Length") else None
+        else:
+            tamano = len(response.content)
+        _anotar(request, response, consultas, time.perf_counter() - inicio, tamano)
+        return response
+
+    @staticmethod
+    def _medir_stream(request, response, contenido, consultas, inicio):
+        tamano = 0
+        try:
+            with connection.execute_wrapper(consultas):
+                for trozo in contenido:
+                    tamano += len(trozo)
+                    yield trozo
+        finally:
+            _anotar(request, response, consultas, time.perf_counter() - inicio, tamano)
+
+
+def _anotar(request, response, consultas: _Consultas, duracion: float, tamano: int | None):
+    match = getattr(request, "resolver_match", None)
+    _buffer.append((
+        timezone.now(),
+        (match.view_name if match else "") or "<sin ruta>",
+        request.method,
+        response.status_code,
+        duracion * 1000,
+        consultas.n,
+        consultas.total * 1000,
+        tamano,
+        consultas.lenta[:MAX_SQL],
+        consultas.lenta_s * 1000,
+    ))
+    _asegurar_hilo()
+
+
+# --------------------------------------------------------------------------------------
+# Volcado a la base de datos
+# --------------------------------------------------------------------------------------
+def _asegurar_hilo():
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    with _hilo_lock:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_bucle, name="rendimiento-volcado", daemon=True)
+            _hilo.start()
+
+
+def _bucle():
+    intervalo = getattr(settings, "RENDIMIENTO_INTERVALO", 30)
+    while True:
+        time.sleep(intervalo)
+        try:
+            volcar()
+        except Exception:
+            logger.exception("No se pudieron guardar las muestras de rendimiento")
+        finally:
+            close_old_connections()
+
+
+def volcar() -> int:
+    """Escribe las muestras pendientes de este proceso. Devuelve cuántas."""
+    from .models import MuestraRendimiento
+
+    global _ultima_limpieza
+    filas = []
+    while _buffer:
+        try:
+            filas.append(_buffer.popleft())
+        except IndexError:
+            break
+    if filas:
+        campos = ("creado_en", "vista", "metodo", "estado", "duracion_ms", "consultas",
+                  "tiempo_bd_ms", "bytes", "consulta_lenta", "consulta_lenta_ms")
+        MuestraRendimiento.objects.bulk_create(
+            [MuestraRendimiento(**dict(zip(campos, f))) for f in filas], batch_size=1000
+        )
+
+    if time.monotonic() - _ultima_limpieza > 3600:
+        _ultima_limpieza = time.monotonic()
+        dias = getattr(settings, "RENDIMIENTO_RETENCION_DIAS", 7)
+        MuestraRendimiento.objects.filter(creado_en__lt=timezone.now() - timedelta(days=dias)).delete()
+    return len(filas)
+
+
+# --------------------------------------------------------------------------------------
+# Resumen para el admin
+# --------------------------------------------------------------------------------------
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenados:
+        return 0.0
+    k = math.ceil(p / 100 * len(ordenados)) - 1
+    return ordenados[max(0, min(k, len(ordenados) - 1))]
+
+
+def resumen(horas: int = 24) -> Dict[str, list]:
+    """
+    {"vistas": [...], "consultas": [...]} de las últimas `horas`.
+    Vistas ordenadas por p95 descendente; consultas = las 20 más lentas.
+    """
+    from .models import MuestraRendimiento
+
+    volcar()  # incluye lo pendiente de este proceso
+    desde = timezone.now() - timedelta(hours=horas)
+    qs = MuestraRendimiento.objects.filter(creado_en__gte=desde)
+
+    por_vista: Dict[str, dict] = {}
+    for vista, dur, n, bd, tam in qs.values_list("vista", "duracion_ms", "consultas", "tiempo_bd_ms", "bytes").iterator():
+        v = por_vista.setdefault(vista, {"duraciones": [], "consultas": 0, "bd": 0.0, "bytes": 0, "con_bytes": 0})
+        v["duraciones"].append(dur)
+        v["consultas"] += n
+        v["bd"] += bd
+        if tam is not None:
+            v["bytes"] += tam
+            v["con_bytes"] += 1
+
+    vistas = []
+    for vista, v in por_vista.items():
+        d = sorted(v["duraciones"])
+        total = len(d)
+        vistas.append({
+            "vista": vista,
+            "peticiones": total,
+            "p50": _percentil(d, 50),
+            "p95": _percentil(d, 95),
+            "p99": _percentil(d, 99),
+            "maximo": d[-1],
+            "consultas_media": v["consultas"] / total,
+            "bd_media_ms": v["bd"] / total,
+            # Solo las respuestas de tamaño conocido
+            "kb_medio": v["bytes"] / v["con_bytes"] / 1024 if v["con_bytes"] else 0.0,
+        })
+    vistas.sort(key=lambda r: r["p95"], reverse=True)
+
+    consultas = list(
+        qs.exclude(consulta_lenta="")
+        .order_by("-consulta_lenta_ms")
+        .values("creado_en", "vista", "consulta_lenta", "consulta_lenta_ms")[:20]
+    )
+    return {"vistas": vistas, "consultas": consultas}
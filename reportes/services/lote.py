@@ -0,0 +1,116 @@
+"""
+Exportación por lotes de los reportes individuales (un PDF por trabajador).
+
+El render de reportlab es Python puro y no escala con hilos, así que los PDFs se
+generan en un pool de procesos. El ZIP se escribe y se envía a medida que llegan
+los PDFs, con una ventana acotada de trabajos en vuelo para no acumular el lote
+entero en memoria.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Iterator, List, Tuple
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.http import StreamingHttpResponse
+from django.utils.text import slugify
+
+from .pdf_generator import _generado_por, pdf_lote_item_bytes
+
+
+class _BufferZip:
+    """Destino no posicionable para ZipFile: acumula bytes hasta que se vacían."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._partes.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        data = b"".join(self._partes)
+        self._partes.clear()
+        return data
+
+
+def _num_workers(total: int) -> int:
+    n = getattr(settings, "REPORTES_LOTE_WORKERS", 0) or os.cpu_count() or 1
+    return max(1, min(n, total))
+
+
+def disposicion_lote(tipo: str, d1: date, formato: str) -> str:
+    """Content-Disposition del lote: ZIP como descarga, PDF combinado en línea."""
+    if formato == "pdf":
+        return f'inline; filename="lote_{tipo}_{d1.strftime("%Y-%m")}.pdf"'
+    return f'attachment; filename="lote_{tipo}_{d1.strftime("%Y-%m")}.zip"'
+
+
+def _nombre_archivo(tipo: str, d1: date, item: dict) -> str:
+    nombre = slugify(item["meta"].get("nombre") or "") or "trabajador"
+    return f"{tipo}_{nombre}_{item['id']}_{d1.strftime('%Y-%m')}.pdf"
+
+
+def render_pdfs_lote(tipo: str, d1: date, d2: date, items: list, usuario: str) -> Iterator[Tuple[dict, bytes]]:
+    """
+    Genera (item, pdf_bytes) en el mismo orden de `items`.
+    Con un solo worker (o un solo trabajador, o desde un proceso daemon) se
+    renderiza en el proceso actual.
+    """
+    logo_path = finders.find("img/cndes-logo.png")
+    workers = _num_workers(len(items))
+
+    # Un proceso daemon no puede tener hijos: entonces se renderiza aquí mismo
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        for item in items:
+            yield item, pdf_lote_item_bytes(tipo, d1, d2, item, usuario, logo_path)
+        return
+
+    # 'spawn' evita heredar hilos y conexiones de BD del servidor (y es lo único disponible en Windows)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    en_vuelo: deque = deque()
+    pendientes = iter(items)
+    try:
+        for item in pendientes:
+            en_vuelo.append((item, pool.submit(pdf_lote_item_bytes, tipo, d1, d2, item, usuario, logo_path)))
+            if len(en_vuelo) >= workers * 2:
+                break
+        while en_vuelo:
+            item, futuro = en_vuelo.popleft()
+            siguiente = next(pendientes, None)
+            if siguiente is not None:
+                en_vuelo.append((siguiente, pool.submit(pdf_lote_item_bytes, tipo, d1, d2, siguiente, usuario, logo_path)))
+            yield item, futuro.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def respuesta_zip_lote(request, tipo: str, d1: date, d2: date, items: list) -> StreamingHttpResponse:
+    """ZIP en streaming con un PDF por trabajador."""
+    usuario = _generado_por(request)
+
+    def _stream():
+        buffer = _BufferZip()
+        with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for item, pdf in render_pdfs_lote(tipo, d1, d2, items, usuario):
+                zf.writestr(_nombre_archivo(tipo, d1, item), pdf)
+                yield buffer.vaciar()
+        yield buffer.vaciar()
+
+    resp = StreamingHttpResponse(_stream(), content_type="application/zip")
+    resp["Content-Disposition"] = disposicion_lote(tipo, d1, "zip")
+    return resp
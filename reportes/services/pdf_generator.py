@@ -1,3 +1,6 @@
+from __future__ import annotations
+
+from datetime import timedelta
 from typing import Sequence, List
 from django.contrib.staticfiles import finders
 from reportlab.lib import colors
@@ -12,8 +15,21 @@ from reportlab.platypus import (
     TableStyle,
 )
 
-def _header_pdf_story(titulo_mayus: str, periodo_txt: str, usuario_txt: str) -> List:
-    """Crea encabezado común con logo centrado, título y subtítulos."""
+from zkmanager import metricas
+
+
+def _hhmm(td: timedelta | None) -> str:
+    if not td:
+        return "00:00"
+    mins = int(td.total_seconds() // 60)
+    return f"{mins // 60:02d}:{mins % 60:02d}"
+
+
+def _header_pdf_story(titulo_mayus: str, periodo_txt: str, usuario_txt: str, logo_path: str | None = None) -> List:
+    """
+    Crea encabezado común con logo centrado, título y subtítulos.
+    `logo_path` permite pasar la ruta ya resuelta (procesos sin settings de Django).
+    """
     styles = getSampleStyleSheet()
     estilo_titulo = ParagraphStyle(
         "Titulo",
@@ -36,7 +52,8 @@ def _header_pdf_story(titulo_mayus: str, periodo_txt: str, usuario_txt: str) ->
     )
 
     story = []
-    logo_path = finders.find("img/cndes-logo.png")
+    if logo_path is None:
+        logo_path = finders.find("img/cndes-logo.png")
     if logo_path:
         img = RLImage(logo_path, width=50 * mm, height=25 * mm)
         img.hAlign = "CENTER"
@@ -75,11 +92,13 @@ def _tabla_estilizada(headers: Sequence[str], rows: Sequence[Sequence], col_widt
     table.setStyle(TableStyle(base_style))
     return table
 
+import io
 from django.http import HttpResponse
 from datetime import date, datetime
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate
+from reportlab.platypus import Flowable, PageBreak, SimpleDocTemplate
 
+@metricas.medir("zk_reporte_render_segundos", reporte="nomina_horas", formato="pdf")
 def build_pdf_nomina_horas(request, d1: date, d2: date, rows: list, _hhmm_func) -> HttpResponse:
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="reporte_horas_{d1.strftime("%Y-%m")}.pdf"'
@@ -110,6 +129,7 @@ def build_pdf_nomina_horas(request, d1: date, d2: date, rows: list, _hhmm_func)
     doc.build(story)
     return response
 
+@metricas.medir("zk_reporte_render_segundos", reporte="ausencias_totales", formato="pdf")
 def build_pdf_ausencias_totales(request, d1: date, d2: date, rows: list) -> HttpResponse:
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="reporte_ausencias_{d1.strftime("%Y-%m")}.pdf"'
@@ -137,6 +157,7 @@ def build_pdf_ausencias_totales(request, d1: date, d2: date, rows: list) -> Http
     doc.build(story)
     return response
 
+@metricas.medir("zk_reporte_render_segundos", reporte="solo_entrada", formato="pdf")
 def build_pdf_solo_entrada(request, d1: date, d2: date, rows: list) -> HttpResponse:
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="reporte_solo_entrada_{d1.strftime("%Y-%m")}.pdf"'
@@ -166,19 +187,21 @@ def build_pdf_solo_entrada(request, d1: date, d2: date, rows: list) -> HttpRespo
     doc.build(story)
     return response
 
-def build_pdf_reporte_empleado(request, d1: date, d2: date, meta: dict, rows: list, _hhmm_func) -> HttpResponse:
-    response = HttpResponse(content_type="application/pdf")
-    filename = f"reporte_{meta.get('nombre','usuario')}_{d1.strftime('%Y-%m')}.pdf"
-    response["Content-Disposition"] = f'inline; filename="{filename}"'
+def _generado_por(request) -> str:
+    return f"GENERADO POR: {request.user.get_username().upper()}  |  FECHA: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
 
-    doc = SimpleDocTemplate(
-        response, pagesize=A4,
+
+def _doc_trabajador(destino) -> SimpleDocTemplate:
+    return SimpleDocTemplate(
+        destino, pagesize=A4,
         leftMargin=20*mm, rightMargin=20*mm, topMargin=25*mm, bottomMargin=20*mm
     )
 
+
+def _story_reporte_empleado(d1: date, d2: date, meta: dict, rows: list, _hhmm_func, usuario: str, logo_path: str | None = None) -> List:
+    """Contenido del reporte de asistencia de un trabajador (sin construir el documento)."""
     periodo = f"PERIODO: {d1.strftime('%d/%m/%Y')}  AL  {d2.strftime('%d/%m/%Y')}"
-    usuario = f"GENERADO POR: {request.user.get_username().upper()}  |  FECHA: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    story = _header_pdf_story("REPORTE DE ASISTENCIA POR TRABAJADOR", periodo, usuario)
+    story = _header_pdf_story("REPORTE DE ASISTENCIA POR TRABAJADOR", periodo, usuario, logo_path)
 
     # Info trabajador
     styles = getSampleStyleSheet()
@@ -226,10 +249,139 @@ def build_pdf_reporte_empleado(request, d1: date, d2: date, meta: dict, rows: li
     ]))
 
     story.extend([table, Spacer(1, 10), Paragraph("Consejo Nacional para el Desarrollo Económico y Social", styles["Normal"])])
+    return story
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="reporte_empleado", formato="pdf")
+def build_pdf_reporte_empleado(request, d1: date, d2: date, meta: dict, rows: list, _hhmm_func) -> HttpResponse:
+    response = HttpResponse(content_type="application/pdf")
+    filename = f"reporte_{meta.get('nombre','usuario')}_{d1.strftime('%Y-%m')}.pdf"
+    response["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    doc = _doc_trabajador(response)
+    doc.build(_story_reporte_empleado(d1, d2, meta, rows, _hhmm_func, _generado_por(request)))
+    return response
+
+
+def _story_ausencias_empleado(d1: date, d2: date, meta: dict, rows: list, total_laborables: int, usuario: str, logo_path: str | None = None) -> List:
+    """Contenido del reporte de ausencias de un trabajador (sin construir el documento)."""
+    periodo = f"PERIODO: {d1.strftime('%d/%m/%Y')}  AL  {d2.strftime('%d/%m/%Y')} (solo días laborables)"
+    story = _header_pdf_story("REPORTE DE AUSENCIAS POR TRABAJADOR", periodo, usuario, logo_path)
+
+    styles = getSampleStyleSheet()
+    info_txt = (
+        f"<b>Trabajador:</b> {meta.get('nombre','').upper()} &nbsp; "
+        f"<b>Departamento:</b> {meta.get('departamento','')} &nbsp; "
+        f"<b>Tipo:</b> {meta.get('tipo','')} &nbsp; "
+        f"<b>Puesto:</b> {meta.get('puesto','')}"
+    )
+    story.append(Paragraph(info_txt, styles["Normal"]))
+    story.append(Spacer(1, 4))
+
+    total_ausencias = len(rows)
+    resumen = f"Total días de ausencia: {total_ausencias} de {total_laborables} días laborables en el período."
+    story.append(Paragraph(resumen, styles["Normal"]))
+    story.append(Spacer(1, 8))
+
+    # Tabla de días ausentes + fila TOTAL
+    body_rows = []
+    for r in rows:
+        fecha_txt = r["fecha"].strftime("%d/%m/%Y")
+        body_rows.append([fecha_txt, r["estado"]])
+
+    # Fila de totales al final
+    body_rows.append(["TOTAL", f"{total_ausencias} días"])
+
+    table = _tabla_estilizada(
+        headers=["Fecha", "Estado"],
+        rows=body_rows,
+        col_widths=[40 * mm, 80 * mm],
+        style_overrides=[
+            ("ALIGN", (0, 1), (0, -1), "LEFT"),
+            ("LEFTPADDING", (0, 1), (0, -1), 6),
+        ]
+    )
+
+    n_rows = len(body_rows)
+    last_idx = n_rows  # cabecera 0 + n_rows
+    table.setStyle(TableStyle([
+        ("FONTNAME", (0, last_idx), (1, last_idx), "Helvetica-Bold"),
+        ("BACKGROUND", (0, last_idx), (1, last_idx), colors.HexColor("#F1F3F4")),
+    ]))
+
+    story.extend(
+        [
+            table,
+            Spacer(1, 10),
+            Paragraph("Consejo Nacional para el Desarrollo Económico y Social", styles["Normal"]),
+        ]
+    )
+    return story
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="ausencias_empleado", formato="pdf")
+def build_pdf_ausencias_empleado(request, d1: date, d2: date, meta: dict, rows: list, total_laborables: int) -> HttpResponse:
+    response = HttpResponse(content_type="application/pdf")
+    filename = f"reporte_ausencias_{meta.get('nombre','trabajador')}_{d1.strftime('%Y-%m')}.pdf"
+    response["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    doc = _doc_trabajador(response)
+    doc.build(_story_ausencias_empleado(d1, d2, meta, rows, total_laborables, _generado_por(request)))
+    return response
+
+
+class _Marcador(Flowable):
+    """Flowable invisible que registra un marcador (bookmark) en el índice del PDF."""
+
+    def __init__(self, clave: str, titulo: str):
+        super().__init__()
+        self.clave = clave
+        self.titulo = titulo
+
+    def wrap(self, *args):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.clave)
+        self.canv.addOutlineEntry(self.titulo, self.clave, level=0)
+
+
+def _story_lote_item(tipo: str, d1: date, d2: date, item: dict, usuario: str, logo_path: str | None = None) -> List:
+    if tipo == "ausencias":
+        return _story_ausencias_empleado(d1, d2, item["meta"], item["rows"], item["total_laborables"], usuario, logo_path)
+    return _story_reporte_empleado(d1, d2, item["meta"], item["rows"], _hhmm, usuario, logo_path)
+
+
+def pdf_lote_item_bytes(tipo: str, d1: date, d2: date, item: dict, usuario: str, logo_path: str | None = None) -> bytes:
+    """
+    Renderiza el PDF individual de un trabajador del lote y devuelve los bytes.
+    No toca la BD ni los settings: puede ejecutarse en un proceso hijo.
+    """
+    buffer = io.BytesIO()
+    _doc_trabajador(buffer).build(_story_lote_item(tipo, d1, d2, item, usuario, logo_path))
+    return buffer.getvalue()
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="lote_combinado", formato="pdf")
+def build_pdf_lote_combinado(request, d1: date, d2: date, tipo: str, items: list) -> HttpResponse:
+    """Un único PDF con un trabajador por sección y un marcador por trabajador."""
+    response = HttpResponse(content_type="application/pdf")
+    response["Content-Disposition"] = f'inline; filename="lote_{tipo}_{d1.strftime("%Y-%m")}.pdf"'
+
+    usuario = _generado_por(request)
+    logo_path = finders.find("img/cndes-logo.png")
+    story = []
+    for idx, item in enumerate(items):
+        if idx:
+            story.append(PageBreak())
+        story.append(_Marcador(f"emp{item['id']}", item["meta"].get("nombre") or f"Empleado {item['id']}"))
+        story.extend(_story_lote_item(tipo, d1, d2, item, usuario, logo_path))
 
+    doc = _doc_trabajador(response)
     doc.build(story)
     return response
 
+@metricas.medir("zk_reporte_render_segundos", reporte="nomina_calculo", formato="pdf")
 def build_pdf_nomina_calculo(request, d1: date, d2: date, rows: list) -> HttpResponse:
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="descuentos_nomina_{d1.strftime("%Y-%m")}.pdf"'
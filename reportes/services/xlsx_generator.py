@@ -0,0 +1,181 @@
+"""
+Exportación XLSX de los reportes, con las mismas filas que usan los PDF.
+
+Se usa el modo write-only de openpyxl: las filas se vuelcan a disco a medida que
+se agregan, así que la memoria no crece con el número de filas. El libro se
+guarda en un archivo temporal que se envía en bloques con FileResponse.
+"""
+from __future__ import annotations
+
+import tempfile
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Sequence
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from zkmanager import metricas
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_FMT_FECHA = "dd/mm/yyyy"
+_FMT_HORA = "hh:mm"
+_FMT_DURACION = "[h]:mm"
+_FMT_MONEDA = "#,##0"
+
+
+def _celda(ws, valor, negrita: bool = False, fondo: str | None = None):
+    """Convierte un valor Python en celda write-only con el formato numérico adecuado."""
+    if isinstance(valor, datetime):
+        # Excel no admite zona horaria: se escribe la hora local
+        valor = valor.replace(tzinfo=None).time() if valor.tzinfo else valor.time()
+    cell = WriteOnlyCell(ws, value=valor)
+    if isinstance(valor, timedelta):
+        cell.number_format = _FMT_DURACION
+    elif isinstance(valor, date):
+        cell.number_format = _FMT_FECHA
+    elif isinstance(valor, time):
+        cell.number_format = _FMT_HORA
+    elif isinstance(valor, float):
+        cell.number_format = _FMT_MONEDA
+    if negrita:
+        cell.font = Font(bold=True, color="FFFFFF" if fondo == "18A052" else None)
+    if fondo:
+        cell.fill = PatternFill("solid", fgColor=fondo)
+    return cell
+
+
+def _xlsx_response(
+    filename: str,
+    titulo: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    col_widths: Sequence[int],
+    encabezado: Iterable[Sequence] = (),
+    totales: Sequence | None = None,
+) -> FileResponse:
+    """
+    Construye el libro en modo write-only y lo devuelve como descarga.
+    `encabezado`: filas informativas antes de la tabla (periodo, trabajador...).
+    `totales`: fila final resaltada, como en los PDF.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo[:31])
+    for idx, ancho in enumerate(col_widths, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = ancho
+
+    for fila in encabezado:
+        ws.append([_celda(ws, v, negrita=(i == 0)) for i, v in enumerate(fila)])
+    if encabezado:
+        ws.append([])
+
+    ws.append([_celda(ws, h, negrita=True, fondo="18A052") for h in headers])
+    for r in rows:
+        ws.append([_celda(ws, v) for v in r])
+    if totales is not None:
+        ws.append([_celda(ws, v, negrita=True, fondo="F1F3F4") for v in totales])
+
+    tmp = tempfile.TemporaryFile(suffix=".xlsx")
+    wb.save(tmp)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def _periodo(d1: date, d2: date) -> list:
+    return ["Periodo", d1, d2]
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="nomina_horas", formato="xlsx")
+def build_xlsx_nomina_horas(d1: date, d2: date, rows: list) -> FileResponse:
+    return _xlsx_response(
+        f"reporte_horas_{d1.strftime('%Y-%m')}.xlsx",
+        "Horas trabajadas",
+        ["Empleado / Usuario", "Departamento", "Tipo", "Puesto", "Horas Totales"],
+        ([r["nombre"], r["departamento"], r["tipo"], r["puesto"], r["total"]] for r in rows),
+        [40, 35, 10, 30, 15],
+        encabezado=[_periodo(d1, d2)],
+    )
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="ausencias_totales", formato="xlsx")
+def build_xlsx_ausencias_totales(d1: date, d2: date, rows: list, total_dias: int) -> FileResponse:
+    return _xlsx_response(
+        f"reporte_ausencias_{d1.strftime('%Y-%m')}.xlsx",
+        "Ausencias",
+        ["Empleado / Usuario", "Departamento", "Tipo", "Puesto", "Ausencias", "Bajas"],
+        ([r["nombre"], r["departamento"], r["tipo"], r["puesto"], r["ausencias"], r["bajas"]] for r in rows),
+        [40, 35, 10, 30, 12, 10],
+        encabezado=[_periodo(d1, d2), ["Días laborables", total_dias]],
+    )
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="solo_entrada", formato="xlsx")
+def build_xlsx_solo_entrada(d1: date, d2: date, rows: list) -> FileResponse:
+    return _xlsx_response(
+        f"reporte_solo_entrada_{d1.strftime('%Y-%m')}.xlsx",
+        "Solo entrada",
+        ["Empleado / Usuario", "Departamento", "Tipo", "Puesto", "Días con solo entrada"],
+        ([r["nombre"], r["departamento"], r["tipo"], r["puesto"], r["dias_solo_entrada"]] for r in rows),
+        [40, 35, 10, 30, 20],
+        encabezado=[_periodo(d1, d2)],
+    )
+
+
+def _encabezado_trabajador(d1: date, d2: date, meta: dict) -> list:
+    return [
+        _periodo(d1, d2),
+        ["Trabajador", meta.get("nombre", "")],
+        ["Departamento", meta.get("departamento", "")],
+        ["Tipo", meta.get("tipo", "")],
+        ["Puesto", meta.get("puesto", "")],
+    ]
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="reporte_empleado", formato="xlsx")
+def build_xlsx_reporte_empleado(d1: date, d2: date, meta: dict, rows: list) -> FileResponse:
+    total = sum((r["total"] for r in rows), timedelta())
+    return _xlsx_response(
+        f"reporte_{meta.get('nombre', 'usuario')}_{d1.strftime('%Y-%m')}.xlsx",
+        "Asistencia",
+        ["Fecha", "Entrada", "Salida", "Horas Trabajadas"],
+        ([r["fecha"], r["entrada"], r["salida"], r["total"]] for r in rows),
+        [14, 12, 12, 18],
+        encabezado=_encabezado_trabajador(d1, d2, meta),
+        totales=["TOTAL", None, None, total],
+    )
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="ausencias_empleado", formato="xlsx")
+def build_xlsx_ausencias_empleado(d1: date, d2: date, meta: dict, rows: list, total_laborables: int) -> FileResponse:
+    return _xlsx_response(
+        f"reporte_ausencias_{meta.get('nombre', 'trabajador')}_{d1.strftime('%Y-%m')}.xlsx",
+        "Ausencias",
+        ["Fecha", "Estado"],
+        ([r["fecha"], r["estado"]] for r in rows),
+        [14, 40],
+        encabezado=_encabezado_trabajador(d1, d2, meta) + [["Días laborables", total_laborables]],
+        totales=["TOTAL", f"{len(rows)} días"],
+    )
+
+
+@metricas.medir("zk_reporte_render_segundos", reporte="nomina_calculo", formato="xlsx")
+def build_xlsx_nomina_calculo(d1: date, d2: date, rows: list) -> FileResponse:
+    return _xlsx_response(
+        f"descuentos_nomina_{d1.strftime('%Y-%m')}.xlsx",
+        "Descuentos nómina",
+        ["Empleado", "Departamento", "Salario Base", "Ausencias", "B. Aut.", "Descuento", "S. Neto Estimado"],
+        (
+            [r["nombre"], r["departamento"], float(r["salario_base"]), r["ausencias"], r["bajas"], float(r["descuento"]), float(r["neto"])]
+            for r in rows
+        ),
+        [40, 35, 15, 12, 10, 15, 18],
+        encabezado=[_periodo(d1, d2)],
+        totales=[
+            "TOTAL GENERAL", None, None,
+            sum(r["ausencias"] for r in rows), sum(r["bajas"] for r in rows),
+            float(sum(r["descuento"] for r in rows)), float(sum(r["neto"] for r in rows)),
+        ],
+    )
@@ -1,3 +1,125 @@
-from django.test import TestCase
+import io
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from dispositivos.models import AsistenciaCruda, Dispositivo, UsuarioDispositivo
+from empleados import dimensiones
+from empleados.models import Empleado
+from zkmanager.pruebas import HASTA, Caso, PresupuestoConsultas
+
+from . import diferencial, rendimiento
+from .benchmark import _casos
+from .models import MuestraRendimiento
+from .urls import urlpatterns
+
+
+class PresupuestoConsultasReportesTests(PresupuestoConsultas, TestCase):
+    """Todas las rutas de reportes (y el dashboard) con los casos del banco de rendimiento."""
+    urlpatterns = urlpatterns
+    EXCLUIDAS = {"nomina_guardar": "escribe el histórico; su cálculo es el de nomina_preview"}
+
+    def casos(self, datos):
+        return [
+            Caso(ruta=nombre.split(":")[0], etiqueta=":".join(nombre.split(":")[1:]), url=url)
+            for nombre, url in _casos(datos.d1, datos.d2, datos.empleado)
+        ]
+
+
+class DiferencialReportesTests(TestCase):
+    """Los motores alternativos devuelven exactamente lo mismo que el actual."""
+
+    def test_motores_coinciden(self):
+        resultado = diferencial.ejecutar(semillas=(1, 2), empleados=6, dias=30, rangos=2, hasta=HASTA)
+        self.assertTrue(resultado["resultados"])
+        self.assertEqual(diferencial.con_diferencias(resultado), [])
+
+    def test_detecta_diferencias(self):
+        esperado = diferencial.normalizar({1: {"rows": [{"fecha": HASTA, "horas": 8}]}})
+        obtenido = diferencial.normalizar({1: {"rows": [{"fecha": HASTA, "horas": 7}]}})
+        self.assertEqual(diferencial.diferencias(esperado, obtenido), ["/1/rows[0]/horas: 8 != 7"])
+
+
+class RendimientoStreamingTests(TestCase):
+    """Las respuestas en streaming se miden al terminar de iterar su contenido."""
+
+    def setUp(self):
+        rendimiento._buffer.clear()
+
+    def test_mide_la_iteracion(self):
+        def _contenido():
+            yield b"cabecera\n"
+            yield f"{User.objects.count()}\n".encode()
+
+        middleware = rendimiento.RendimientoMiddleware(lambda request: StreamingHttpResponse(_contenido()))
+        response = middleware(RequestFactory().get("/exportar/"))
+        self.assertFalse(rendimiento._buffer)
+
+        cuerpo = b"".join(response.streaming_content)
+        (muestra,) = rendimiento._buffer
+        self.assertEqual(muestra[5], 1)             # la consulta hecha al iterar
+        self.assertEqual(muestra[7], len(cuerpo))
+
+    def test_kb_medio_sin_tamanos_desconocidos(self):
+        for tamano in (2048, None):
+            MuestraRendimiento.objects.create(creado_en=timezone.now(), vista="v", metodo="GET", estado=200, duracion_ms=1, consultas=0,
+                                              tiempo_bd_ms=0, bytes=tamano)
+        (vista,) = rendimiento.resumen()["vistas"]
+        self.assertEqual(vista["kb_medio"], 2.0)
+
+
+class LoteEmpleadosTests(TestCase):
+    """Exportación por lotes: un PDF por trabajador en un ZIP en streaming."""
+
+    def setUp(self):
+        dimensiones.invalidar()
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        for i in (1, 2):
+            Empleado.objects.create(numero=f"L{i}", nombre=f"Lote{i}", apellido="Prueba", doc_id=f"L{i}",
+                                    departamento="Lotes")
+        self.url = reverse("reportes:lote_empleados_export")
+        self.params = {"inicio": "2025-03-01", "fin": "2025-03-31", "departamento": "Lotes"}
+
+    @override_settings(REPORTES_LOTE_WORKERS=2)
+    def test_zip_en_streaming_con_varios_procesos(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as zf:
+            nombres = zf.namelist()
+            self.assertEqual(len(nombres), 2)
+            for nombre in nombres:
+                self.assertTrue(zf.read(nombre).startswith(b"%PDF"))
+
+    def test_head_sin_calculo(self):
+        with mock.patch("reportes.views._rows_asistencia_lote", side_effect=AssertionError("calculado")):
+            response = self.client.head(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="lote_asistencia_2025-03.zip"')
+        self.assertEqual(response.content, b"")
+        # Mismas validaciones que GET
+        for params in ({**self.params, "formato": "doc"}, {**self.params, "departamento": "Ninguno"}):
+            self.assertEqual(self.client.head(self.url, params).status_code, 400)
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class BusquedaAsistenciaGeneralTests(TestCase):
+    """Los marcajes sin FK usuario se emparejan por (dispositivo, user_id) del usuario encontrado."""
+
+    def test_no_mezcla_user_id_de_otro_dispositivo(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        ts = timezone.make_aware(timezone.datetime(2025, 3, 3, 8, 0))
+        for i, nombre in ((1, "Buscado"), (2, "Otro")):
+            disp = Dispositivo.objects.create(nombre=f"D{i}", ip=f"10.0.0.{i}")
+            emp = Empleado.objects.create(numero=f"B{i}", nombre=nombre, apellido="Prueba", doc_id=f"B{i}")
+            UsuarioDispositivo.objects.create(dispositivo=disp, user_id="77", empleado=emp)
+            AsistenciaCruda.objects.create(dispositivo=disp, user_id="77", ts=ts, status=0)
+
+        response = self.client.get(reverse("reportes:asistencia_general"),
+                                   {"desde": "2025-03-01", "hasta": "2025-03-31", "q": "buscado"})
+        self.assertEqual([f["nombre"] for f in response.context["page_obj"]], ["Buscado Prueba"])
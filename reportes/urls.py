@@ -10,6 +10,8 @@ from .views import (
     ReporteEmpleadoPDFView,
     RepAusenciasEmpleadoFormView,
     RepAusenciasEmpleadoPDFView,  # <- importar
+    LoteEmpleadosFormView,
+    LoteEmpleadosExportView,
     NominaCalculoFormView,
     NominaCalculoPDFView,
     NominaCalculoPreviewView,
@@ -25,16 +27,24 @@ urlpatterns = [
     path("ausencias/",            ReporteAusenciasView.as_view(),         name="ausencias"),
     path("nomina/horas/",         NominaHorasFormView.as_view(),          name="nomina_horas_form"),
     path("nomina/horas/pdf/",     NominaHorasPDFView.as_view(),           name="nomina_horas_pdf"),
+    path("nomina/horas/xlsx/",    NominaHorasPDFView.as_view(formato="xlsx"), name="nomina_horas_xlsx"),
     path("nomina/ausencias/",     AusenciasTotalesFormView.as_view(),     name="ausencias_totales_form"),
     path("nomina/ausencias/pdf/", AusenciasTotalesPDFView.as_view(),      name="ausencias_totales_pdf"),
+    path("nomina/ausencias/xlsx/", AusenciasTotalesPDFView.as_view(formato="xlsx"), name="ausencias_totales_xlsx"),
     path("nomina/solo-entrada/",     SoloEntradaFormView.as_view(), name="solo_entrada_form"),
     path("nomina/solo-entrada/pdf/", SoloEntradaPDFView.as_view(),  name="solo_entrada_pdf"),
+    path("nomina/solo-entrada/xlsx/", SoloEntradaPDFView.as_view(formato="xlsx"), name="solo_entrada_xlsx"),
     # Reportes de Asistencia por Empleado
     path("trabajador/asistencia/",     ReporteEmpleadoFormView.as_view(), name="rep_empleado_form"),
     path("trabajador/asistencia/pdf/", ReporteEmpleadoPDFView.as_view(),  name="rep_empleado_pdf"),
+    path("trabajador/asistencia/xlsx/", ReporteEmpleadoPDFView.as_view(formato="xlsx"), name="rep_empleado_xlsx"),
     # Reportes de Ausencias por Empleado
     path("trabajador/ausencias/",      RepAusenciasEmpleadoFormView.as_view(), name="rep_ausencias_empleado_form"),
     path("trabajador/ausencias/pdf/",  RepAusenciasEmpleadoPDFView.as_view(),  name="rep_ausencias_empleado_pdf"),
+    path("trabajador/ausencias/xlsx/", RepAusenciasEmpleadoPDFView.as_view(formato="xlsx"), name="rep_ausencias_empleado_xlsx"),
+    # Reportes individuales por lote (departamento o todos)
+    path("trabajador/lote/",           LoteEmpleadosFormView.as_view(),   name="lote_empleados_form"),
+    path("trabajador/lote/export/",    LoteEmpleadosExportView.as_view(), name="lote_empleados_export"),
       path(
         "dashboard/listado/<str:tipo>/",
         DashboardListView.as_view(),
@@ -42,6 +52,7 @@ urlpatterns = [
     ),
     path("nomina/calculo/",       NominaCalculoFormView.as_view(),        name="nomina_calculo_form"),
     path("nomina/calculo/pdf/",   NominaCalculoPDFView.as_view(),         name="nomina_calculo_pdf"),
+    path("nomina/calculo/xlsx/",  NominaCalculoPDFView.as_view(formato="xlsx"), name="nomina_calculo_xlsx"),
     path("nomina/preview/",       NominaCalculoPreviewView.as_view(),     name="nomina_preview"),
     path("nomina/guardar/",       NominaGuardarView.as_view(),            name="nomina_guardar"),
     path("nomina/historico/",     NominaArchivoView.as_view(),            name="nomina_archivo"),
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import logging
 from calendar import monthrange
 from datetime import date, datetime, timedelta
 from typing import Dict, Iterable, List, Sequence, Tuple
@@ -19,17 +20,28 @@ from django.utils import timezone
 from django.utils.timezone import make_aware
 from django.views import View
 
+from dispositivos import archivo
 from dispositivos.models import AsistenciaCruda, UsuarioDispositivo
+from empleados import busqueda, dimensiones
 from empleados.models import Empleado, BajaAutorizada
+from zkmanager import metricas
+
+logger = logging.getLogger(__name__)
 
 
 # ======================================================================================
 # Utilidades comunes
 # Configuración
 from .services.pdf_generator import (
-    _header_pdf_story, _tabla_estilizada, 
+    _header_pdf_story, _tabla_estilizada, _hhmm,
     build_pdf_nomina_horas, build_pdf_ausencias_totales, build_pdf_solo_entrada,
-    build_pdf_reporte_empleado, build_pdf_nomina_calculo
+    build_pdf_reporte_empleado, build_pdf_ausencias_empleado, build_pdf_nomina_calculo,
+    build_pdf_lote_combinado,
+)
+from .services.lote import disposicion_lote, respuesta_zip_lote
+from .services.xlsx_generator import (
+    build_xlsx_nomina_horas, build_xlsx_ausencias_totales, build_xlsx_solo_entrada,
+    build_xlsx_reporte_empleado, build_xlsx_ausencias_empleado, build_xlsx_nomina_calculo,
 )
 
 
@@ -53,6 +65,52 @@ def _range_default_mes_actual() -> Tuple[date, date]:
     return inicio, fin
 
 
+def _ts_rango(d1: date, d2: date) -> Q:
+    """
+    Filtro por días locales [d1, d2] como rango semiabierto sobre `ts`.
+    A diferencia de ts__date, compara la columna directamente: usa el índice y,
+    en PostgreSQL, limita la consulta a las particiones mensuales del rango.
+    """
+    inicio = make_aware(datetime(d1.year, d1.month, d1.day))
+    fin_dia = d2 + timedelta(days=1)
+    fin = make_aware(datetime(fin_dia.year, fin_dia.month, fin_dia.day))
+    return Q(ts__gte=inicio, ts__lt=fin)
+
+
+def _archivados_persona(
+    d1: date, d2: date, kind: str, emp_id: int | None, did: int | None, uid: str | None
+) -> Dict[date, list]:
+    """
+    {fecha: [min_ts, max_ts, n]} de los marcajes ya movidos al archivo histórico
+    (dispositivos/archivo.py), con el mismo criterio de pertenencia que las
+    consultas sobre AsistenciaCruda. Vacío si el rango no toca meses archivados.
+    """
+    if kind == "emp" and emp_id:
+        uds = list(UsuarioDispositivo.objects.filter(empleado_id=emp_id).values_list("id", "dispositivo_id", "user_id"))
+        ud_ids = {u[0] for u in uds}
+        pares = {(u[1], u[2]) for u in uds}
+        return archivo.resumen_diario(d1, d2, lambda d, u, usuario_id: usuario_id in ud_ids or (d, u) in pares)
+    if kind == "usr" and did is not None and uid is not None:
+        return archivo.resumen_diario(d1, d2, lambda d, u, _: d == did and u == uid, dispositivo_ids=[did])
+    return {}
+
+
+def _con_archivados(agg: Iterable[dict], archivados: Dict[date, list]) -> Iterable[dict]:
+    """Fusiona el agregado diario de la BD (fecha, entrada, salida, n) con el del archivo."""
+    if not archivados:
+        return agg
+    por_fecha = {r["fecha"]: dict(r) for r in agg}
+    for fecha, (entrada, salida, n) in archivados.items():
+        r = por_fecha.get(fecha)
+        if r is None:
+            por_fecha[fecha] = {"fecha": fecha, "entrada": entrada, "salida": salida, "n": n}
+        else:
+            r["entrada"] = min(r["entrada"], entrada)
+            r["salida"] = max(r["salida"], salida)
+            r["n"] += n
+    return [por_fecha[f] for f in sorted(por_fecha)]
+
+
 def _parse_rango_request(request, ini_key: str, fin_key: str) -> Tuple[date, date]:
     """Lee dos fechas del request. Si faltan, devuelve el mes actual."""
     d1 = _parse_date_yyyy_mm_dd(request.GET.get(ini_key))
@@ -62,13 +120,6 @@ def _parse_rango_request(request, ini_key: str, fin_key: str) -> Tuple[date, dat
     return d1, d2
 
 
-def _hhmm(td: timedelta | None) -> str:
-    if not td:
-        return "00:00"
-    mins = int(td.total_seconds() // 60)
-    return f"{mins // 60:02d}:{mins % 60:02d}"
-
-
 def _laborables(d1: date, d2: date) -> Tuple[List[date], set]:
     """Devuelve lista y set de días laborables [L–V] en el rango."""
     cur, out = d1, []
@@ -199,13 +250,19 @@ class ReporteAsistenciaGeneralView(View):
             base = base.filter(ts__lte=hasta)
 
         if q:
+            # Se resuelve primero a usuarios de dispositivo (por su texto o el de su empleado);
+            # los marcajes sin FK usuario se buscan por el par (dispositivo, user_id) de esos
+            # usuarios o por subcadena de user_id, como antes.
+            uds = busqueda.usuarios_dispositivo(q)
+            ud_par = UsuarioDispositivo.objects.filter(
+                pk__in=[u[0] for u in uds],
+                dispositivo_id=OuterRef("dispositivo_id"),
+                user_id=OuterRef("user_id"),
+            )
             base = base.filter(
-                Q(usuario__empleado__nombre__icontains=q)
-                | Q(usuario__empleado__apellido__icontains=q)
-                | Q(usuario__empleado__numero__icontains=q)
-                | Q(usuario__empleado__doc_id__icontains=q)
-                | Q(usuario__nombre__icontains=q)
-                | Q(user_id__icontains=q)
+                Q(usuario_id__in=[u[0] for u in uds])
+                | Q(usuario__isnull=True, user_id__icontains=q)
+                | Q(Exists(ud_par), usuario__isnull=True)
             )
 
         # Filtro por empleado: cubre registros con y sin FK usuario
@@ -219,7 +276,7 @@ class ReporteAsistenciaGeneralView(View):
             base = base.filter(Q(usuario__empleado_id=emp_id) | Exists(ud_exists))
 
         if depto:
-            base = base.filter(usuario__empleado__departamento=depto)
+            base = base.filter(dimensiones.filtro_departamento(depto, "usuario__empleado__departamento_ref"))
 
         # Pares presentes
         pares = list(base.values_list("dispositivo_id", "user_id").distinct())
@@ -297,7 +354,7 @@ class ReporteAsistenciaGeneralView(View):
             "page_obj": page_obj,
             "total": len(filas),
             "empleados": empleados,
-            "departamentos": sorted([d for d in Empleado.objects.values_list("departamento", flat=True).distinct() if d]),
+            "departamentos": dimensiones.departamentos(),
             "depto_sel": depto,
         }
         return render(request, self.template_name, ctx)
@@ -575,7 +632,7 @@ class ReporteAusenciasView(View):
         )
         
         if depto:
-            uds = uds.filter(empleado__departamento=depto)
+            uds = uds.filter(dimensiones.filtro_departamento(depto, "empleado__departamento_ref"))
 
         # Existe algún marcaje ese día
         asistencia_qs = AsistenciaCruda.objects.filter(
@@ -588,12 +645,17 @@ class ReporteAusenciasView(View):
         ausentes = uds.annotate(tiene_firma=Exists(asistencia_qs)).filter(tiene_firma=False)
 
         if q:
-            ausentes = ausentes.filter(
-                Q(empleado__nombre__icontains=q)
-                | Q(empleado__apellido__icontains=q)
-                | Q(nombre__icontains=q)
-                | Q(user_id__icontains=q)
-            )
+            ausentes = ausentes.filter(busqueda.filtro(q) | busqueda.filtro(q, "empleado__busqueda"))
+
+        ausentes = list(ausentes)
+        # Bajas autorizadas del día en una consulta; gana la de inicio más reciente (orden del modelo)
+        bajas: Dict[int, BajaAutorizada] = {}
+        for b in BajaAutorizada.objects.filter(
+            empleado_id__in={u.empleado_id for u in ausentes if u.empleado_id},
+            fecha_inicio__lte=fecha,
+            fecha_fin__gte=fecha,
+        ).order_by("-fecha_inicio"):
+            bajas.setdefault(b.empleado_id, b)
 
         filas = []
         for u in ausentes:
@@ -602,11 +664,7 @@ class ReporteAusenciasView(View):
                 depto = u.empleado.departamento or ""
                 
                 # Verificar si tiene baja autorizada para ese día
-                baja = BajaAutorizada.objects.filter(
-                    empleado_id=u.empleado_id,
-                    fecha_inicio__lte=fecha,
-                    fecha_fin__gte=fecha
-                ).first()
+                baja = bajas.get(u.empleado_id)
                 
                 if baja:
                     estado = f"Baja Autorizada: {baja.get_tipo_display()}"
@@ -627,7 +685,7 @@ class ReporteAusenciasView(View):
             "q": q, 
             "page_obj": page_obj, 
             "total": len(filas),
-            "departamentos": sorted([d for d in Empleado.objects.values_list("departamento", flat=True).distinct() if d]),
+            "departamentos": dimensiones.departamentos(),
             "depto_sel": depto,
         }
         return render(request, self.template_name, ctx)
@@ -648,7 +706,7 @@ class NominaHorasFormView(LoginRequiredMixin, StaffOnlyMixin, View):
         order = (request.GET.get("order") or "asc").strip()
         pdf_view = NominaHorasPDFView()
         rows = pdf_view._compute_totals(d1, d2)
-        departamentos = sorted({r["departamento"] for r in rows if r["departamento"]})
+        departamentos = dimensiones.departamentos()
         rows = _filter_and_sort_rows(rows, q=q, depto=depto, sort=sort, order=order)
 
         # Formatear total de timedelta a HH:MM para la vista
@@ -667,12 +725,14 @@ class NominaHorasPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
     Identidad: Empleado si existe; si no, UsuarioDispositivo (nombre o user_id).
     """
     http_method_names = ["get", "head"]
+    formato = "pdf"  # urls.py registra la variante "xlsx" con las mismas filas
 
     def head(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
 
+    @metricas.medir("zk_reporte_calculo_segundos", reporte="nomina_horas")
     def _compute_totals(self, d1: date, d2: date) -> List[dict]:
-        base = AsistenciaCruda.objects.filter(ts__date__gte=d1, ts__date__lte=d2)
+        base = AsistenciaCruda.objects.filter(_ts_rango(d1, d2))
 
         # Pares presentes para mapa UD
         pares = base.values_list("dispositivo_id", "user_id").distinct()
@@ -771,6 +831,8 @@ class NominaHorasPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         rows = self._compute_totals(d1, d2)
         rows = _filter_and_sort_rows(rows, q=q, depto=depto, sort=sort, order=order)
 
+        if self.formato == "xlsx":
+            return build_xlsx_nomina_horas(d1, d2, rows)
         return self._build_pdf(request, d1, d2, rows)
 
 
@@ -791,7 +853,7 @@ class AusenciasTotalesFormView(LoginRequiredMixin, StaffOnlyMixin, View):
         pdf_view = AusenciasTotalesPDFView()
         rows, total_dias = pdf_view._compute_rows(d1, d2)
 
-        departamentos = sorted({r["departamento"] for r in rows if r["departamento"]})
+        departamentos = dimensiones.departamentos()
         rows = _filter_and_sort_rows(rows, q=q, depto=depto, sort=sort, order=order)
 
         ctx = {
@@ -804,10 +866,12 @@ class AusenciasTotalesFormView(LoginRequiredMixin, StaffOnlyMixin, View):
 
 class AusenciasTotalesPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
     http_method_names = ["get", "head"]
+    formato = "pdf"
 
     def head(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
 
+    @metricas.medir("zk_reporte_calculo_segundos", reporte="ausencias_totales")
     def _compute_rows(self, d1: date, d2: date) -> Tuple[List[dict], int]:
         tz = timezone.get_current_timezone()
         laborables_list, laborables_set = _laborables(d1, d2)
@@ -830,7 +894,7 @@ class AusenciasTotalesPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         # 3) Días con presencia (solo laborables)
         presentes = (
             AsistenciaCruda.objects
-            .filter(ts__date__gte=d1, ts__date__lte=d2)
+            .filter(_ts_rango(d1, d2))
             .annotate(fecha=TruncDate("ts", tzinfo=tz))
             .values("fecha", "usuario__empleado_id", "dispositivo_id", "user_id")
             .distinct()
@@ -845,43 +909,28 @@ class AusenciasTotalesPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
                 if key in roster:
                     roster[key]["presentes"].add(f)
 
-        # 4) Filas: ausencias = laborables - presentes
+        # 4) Bajas autorizadas del rango en una consulta
+        bajas_por_emp: Dict[int, list] = {}
+        for b in BajaAutorizada.objects.filter(fecha_inicio__lte=d2, fecha_fin__gte=d1).only("empleado_id", "fecha_inicio", "fecha_fin"):
+            bajas_por_emp.setdefault(b.empleado_id, []).append(b)
+
+        # 5) Filas: ausencias = laborables - presentes
         rows = []
         for key, info in roster.items():
             dias_pres = len(info["presentes"])
             # Dias ausentes base
             dias_aus_bruto = max(total_dias - dias_pres, 0)
             
-            # Contar bajas autorizadas en días laborables no presentes
-            dias_baja = 0
-            if key[0] == "emp":
-                emp_id = key[1]
-                ausencias_list = [d for d in laborables_list if d not in info["presentes"]]
-                if ausencias_list:
-                    dias_baja = BajaAutorizada.objects.filter(
-                        empleado_id=emp_id,
-                        fecha_inicio__lte=max(ausencias_list),
-                        fecha_fin__gte=min(ausencias_list)
-                    ).filter(
-                        # Filtro manual para días exactos si es necesario, 
-                        # pero por simplicidad y eficiencia usaremos una lógica de intersección
-                    ).count()
-                    
-                    # Refinamiento: contar días exactos que son laborables Y están en el rango de alguna baja
-                    bajas_obj = BajaAutorizada.objects.filter(
-                        empleado_id=emp_id,
-                        fecha_inicio__lte=d2,
-                        fecha_fin__gte=d1
-                    )
-                    dias_baja_set = set()
-                    for b in bajas_obj:
-                        curr = max(b.fecha_inicio, d1)
-                        last = min(b.fecha_fin, d2)
-                        while curr <= last:
-                            if curr in laborables_set and curr not in info["presentes"]:
-                                dias_baja_set.add(curr)
-                            curr += timedelta(days=1)
-                    dias_baja = len(dias_baja_set)
+            # Días exactos laborables, sin presencia y dentro de alguna baja
+            dias_baja_set = set()
+            for b in bajas_por_emp.get(key[1], []):
+                curr = max(b.fecha_inicio, d1)
+                last = min(b.fecha_fin, d2)
+                while curr <= last:
+                    if curr in laborables_set and curr not in info["presentes"]:
+                        dias_baja_set.add(curr)
+                    curr += timedelta(days=1)
+            dias_baja = len(dias_baja_set)
 
             dias_aus_neto = max(dias_aus_bruto - dias_baja, 0)
             
@@ -913,6 +962,8 @@ class AusenciasTotalesPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         rows, total_dias = self._compute_rows(d1, d2)
         rows = _filter_and_sort_rows(rows, q=q, depto=depto, sort=sort, order=order)
 
+        if self.formato == "xlsx":
+            return build_xlsx_ausencias_totales(d1, d2, rows, total_dias)
         return self._build_pdf(request, d1, d2, rows)
 
 class SoloEntradaFormView(LoginRequiredMixin, StaffOnlyMixin, View):
@@ -928,7 +979,7 @@ class SoloEntradaFormView(LoginRequiredMixin, StaffOnlyMixin, View):
         pdf_view = SoloEntradaPDFView()
         rows = pdf_view._compute_rows(d1, d2)
 
-        departamentos = sorted({r["departamento"] for r in rows if r["departamento"]})
+        departamentos = dimensiones.departamentos()
         rows = _filter_and_sort_rows(rows, q=q, depto=depto, sort=sort, order=order)
 
         ctx = {
@@ -945,12 +996,14 @@ class SoloEntradaPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
     Identidad: Empleado si existe; si no, UsuarioDispositivo. Agrupa correctamente aunque un mismo usuario marque en varios dispositivos.
     """
     http_method_names = ["get", "head"]
+    formato = "pdf"
 
     def head(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
 
+    @metricas.medir("zk_reporte_calculo_segundos", reporte="solo_entrada")
     def _compute_rows(self, d1: date, d2: date):
-        base = AsistenciaCruda.objects.filter(ts__date__gte=d1, ts__date__lte=d2)
+        base = AsistenciaCruda.objects.filter(_ts_rango(d1, d2))
 
         # Mapa UD para resolver identidad y metadatos
         pares = base.values_list("dispositivo_id", "user_id").distinct()
@@ -1021,6 +1074,8 @@ class SoloEntradaPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         rows = self._compute_rows(d1, d2)
         rows = _filter_and_sort_rows(rows, q=q, depto=depto, sort=sort, order=order)
 
+        if self.formato == "xlsx":
+            return build_xlsx_solo_entrada(d1, d2, rows)
         return self._build_pdf(request, d1, d2, rows)
 
 class ReporteEmpleadoFormView(LoginRequiredMixin, StaffOnlyMixin, View):
@@ -1078,6 +1133,7 @@ class ReporteEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
     """
 
     http_method_names = ["get", "head"]
+    formato = "pdf"
 
     def head(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
@@ -1113,6 +1169,7 @@ class ReporteEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
 
         return d1, d2, kind, emp_id, did, uid
 
+    @metricas.medir("zk_reporte_calculo_segundos", reporte="reporte_empleado")
     def _rows_for_person(
         self,
         d1: date,
@@ -1127,7 +1184,7 @@ class ReporteEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         meta: {nombre, departamento, tipo, puesto}
         rows: [{fecha, entrada, salida, total}]
         """
-        base = AsistenciaCruda.objects.filter(ts__date__gte=d1, ts__date__lte=d2)
+        base = AsistenciaCruda.objects.filter(_ts_rango(d1, d2))
 
         meta = {
             "nombre": "",
@@ -1195,6 +1252,8 @@ class ReporteEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         else:
             return [], meta
 
+        agg = _con_archivados(agg, _archivados_persona(d1, d2, kind, emp_id, did, uid))
+
         rows: list[dict] = []
         for r in agg:
             entrada = r["entrada"]
@@ -1237,6 +1296,8 @@ class ReporteEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         if d1 > d2:
             return HttpResponseBadRequest("Rango inválido.")
         rows, meta = self._rows_for_person(d1, d2, kind, emp_id, did, uid)
+        if self.formato == "xlsx":
+            return build_xlsx_reporte_empleado(d1, d2, meta, rows)
         return self._build_pdf(request, d1, d2, meta, rows)
 
 
@@ -1291,6 +1352,7 @@ class RepAusenciasEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
     """
 
     http_method_names = ["get", "head"]
+    formato = "pdf"
 
     def head(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
@@ -1326,6 +1388,7 @@ class RepAusenciasEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
 
         return d1, d2, kind, emp_id, did, uid
 
+    @metricas.medir("zk_reporte_calculo_segundos", reporte="ausencias_empleado")
     def _rows_for_person(
         self,
         d1: date,
@@ -1351,7 +1414,7 @@ class RepAusenciasEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
             "puesto": "",
         }
 
-        base = AsistenciaCruda.objects.filter(ts__date__gte=d1, ts__date__lte=d2)
+        base = AsistenciaCruda.objects.filter(_ts_rango(d1, d2))
 
         if kind == "emp" and emp_id:
             # Metadatos desde Empleado
@@ -1401,19 +1464,19 @@ class RepAusenciasEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
 
         # Conjunto de días con presencia (solo laborables)
         presentes = {r["fecha"] for r in presentes_qs if r["fecha"] in laborables_set}
+        presentes |= set(_archivados_persona(d1, d2, kind, emp_id, did, uid)) & laborables_set
+
+        # Bajas del rango en una consulta; a igualdad de día gana la de inicio más reciente (orden del modelo)
+        bajas = []
+        if kind == "emp" and emp_id:
+            bajas = list(BajaAutorizada.objects.filter(empleado_id=emp_id, fecha_inicio__lte=d2, fecha_fin__gte=d1).order_by("-fecha_inicio"))
 
         # Días de ausencia = laborables sin presencia
         rows = []
         for f in laborables_list:
             if f not in presentes:
                 # Verificar si tiene baja autorizada para ese día
-                baja = None
-                if kind == "emp" and emp_id:
-                    baja = BajaAutorizada.objects.filter(
-                        empleado_id=emp_id,
-                        fecha_inicio__lte=f,
-                        fecha_fin__gte=f
-                    ).first()
+                baja = next((b for b in bajas if b.fecha_inicio <= f <= b.fecha_fin), None)
                 
                 rows.append({
                     "fecha": f,
@@ -1423,74 +1486,7 @@ class RepAusenciasEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         return rows, meta, total_laborables
 
     def _build_pdf(self, request, d1: date, d2: date, meta: dict, rows, total_laborables: int):
-        response = HttpResponse(content_type="application/pdf")
-        filename = f"reporte_ausencias_{meta.get('nombre','trabajador')}_{d1.strftime('%Y-%m')}.pdf"
-        response["Content-Disposition"] = f'inline; filename="{filename}"'
-
-        doc = SimpleDocTemplate(
-            response,
-            pagesize=A4,
-            leftMargin=20 * mm,
-            rightMargin=20 * mm,
-            topMargin=25 * mm,
-            bottomMargin=20 * mm,
-        )
-
-        periodo = f"PERIODO: {d1.strftime('%d/%m/%Y')}  AL  {d2.strftime('%d/%m/%Y')} (solo días laborables)"
-        usuario = f"GENERADO POR: {request.user.get_username().upper()}  |  FECHA: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-        story = _header_pdf_story("REPORTE DE AUSENCIAS POR TRABAJADOR", periodo, usuario)
-
-        styles = getSampleStyleSheet()
-        info_txt = (
-            f"<b>Trabajador:</b> {meta.get('nombre','').upper()} &nbsp; "
-            f"<b>Departamento:</b> {meta.get('departamento','')} &nbsp; "
-            f"<b>Tipo:</b> {meta.get('tipo','')} &nbsp; "
-            f"<b>Puesto:</b> {meta.get('puesto','')}"
-        )
-        story.append(Paragraph(info_txt, styles["Normal"]))
-        story.append(Spacer(1, 4))
-
-        total_ausencias = len(rows)
-        resumen = f"Total días de ausencia: {total_ausencias} de {total_laborables} días laborables en el período."
-        story.append(Paragraph(resumen, styles["Normal"]))
-        story.append(Spacer(1, 8))
-
-        # Tabla de días ausentes + fila TOTAL
-        body_rows = []
-        for r in rows:
-            fecha_txt = r["fecha"].strftime("%d/%m/%Y")
-            body_rows.append([fecha_txt, r["estado"]])
-
-        # Fila de totales al final
-        body_rows.append(["TOTAL", f"{total_ausencias} días"])
-
-        table = _tabla_estilizada(
-            headers=["Fecha", "Estado"],
-            rows=body_rows,
-            col_widths=[40 * mm, 80 * mm],
-            style_overrides=[
-                ("ALIGN", (0, 1), (0, -1), "LEFT"),
-                ("LEFTPADDING", (0, 1), (0, -1), 6),
-            ]
-        )
-
-        n_rows = len(body_rows)
-        last_idx = n_rows  # cabecera 0 + n_rows
-        table.setStyle(TableStyle([
-            ("FONTNAME", (0, last_idx), (1, last_idx), "Helvetica-Bold"),
-            ("BACKGROUND", (0, last_idx), (1, last_idx), colors.HexColor("#F1F3F4")),
-        ]))
-
-        story.extend(
-            [
-                table,
-                Spacer(1, 10),
-                Paragraph("Consejo Nacional para el Desarrollo Económico y Social", styles["Normal"]),
-            ]
-        )
-
-        doc.build(story)
-        return response
+        return build_pdf_ausencias_empleado(request, d1, d2, meta, rows, total_laborables)
 
     def get(self, request):
         d1, d2, kind, emp_id, did, uid = self._parse_params(request)
@@ -1499,9 +1495,197 @@ class RepAusenciasEmpleadoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         if d1 > d2:
             return HttpResponseBadRequest("Rango inválido.")
         rows, meta, total_laborables = self._rows_for_person(d1, d2, kind, emp_id, did, uid)
+        if self.formato == "xlsx":
+            return build_xlsx_ausencias_empleado(d1, d2, meta, rows, total_laborables)
         return self._build_pdf(request, d1, d2, meta, rows, total_laborables)
 
 
+# ======================================================================================
+# Reportes individuales por lote (departamento completo o todos los empleados)
+# ======================================================================================
+
+def _empleados_lote(depto: str = "") -> List[dict]:
+    """Empleados activos (opcionalmente de un departamento) con los metadatos del PDF individual."""
+    qs = Empleado.objects.filter(activo=True)
+    if depto:
+        qs = qs.filter(dimensiones.filtro_departamento(depto))
+    out = []
+    for e in qs.order_by("apellido", "nombre").values("id", "nombre", "apellido", "departamento", "tipo_vinculacion", "puesto"):
+        out.append({
+            "id": e["id"],
+            "meta": {
+                "nombre": f"{e['nombre']} {e['apellido']}".strip() or "(sin nombre)",
+                "departamento": e["departamento"] or "",
+                "tipo": e["tipo_vinculacion"] or "",
+                "puesto": e["puesto"] or "",
+            },
+        })
+    return out
+
+
+def _marcajes_lote(d1: date, d2: date, emp_ids: Sequence[int]) -> Dict[int, Dict[date, list]]:
+    """
+    Una sola pasada sobre AsistenciaCruda para todos los empleados del lote.
+    Devuelve {empleado_id: {fecha_local: [min_ts, max_ts, n]}}.
+    Un marcaje cuenta para el empleado de su FK usuario y para el del UD de su par
+    (dispositivo_id, user_id), igual que los reportes individuales.
+    """
+    ids = set(emp_ids)
+    if not ids:
+        return {}
+
+    uds = list(
+        UsuarioDispositivo.objects
+        .filter(empleado_id__in=ids)
+        .values_list("id", "dispositivo_id", "user_id", "empleado_id")
+    )
+    mapa_ud_emp = {(did, uid): eid for _, did, uid, eid in uds}
+    mapa_udid_emp = {ud_id: eid for ud_id, _, _, eid in uds}
+    ud_exists = UsuarioDispositivo.objects.filter(
+        empleado_id__in=ids,
+        dispositivo_id=OuterRef("dispositivo_id"),
+        user_id=OuterRef("user_id"),
+    )
+    qs = (
+        AsistenciaCruda.objects
+        .filter(_ts_rango(d1, d2))
+        .filter(Q(usuario__empleado_id__in=ids) | Exists(ud_exists))
+        .values_list("dispositivo_id", "user_id", "usuario__empleado_id", "ts")
+    )
+
+    out: Dict[int, Dict[date, list]] = {}
+
+    def _sumar(duenos, ts):
+        fecha = timezone.localtime(ts).date()
+        for eid in duenos:
+            if eid not in ids:
+                continue
+            dia = out.setdefault(eid, {}).get(fecha)
+            if dia is None:
+                out[eid][fecha] = [ts, ts, 1]
+            else:
+                if ts < dia[0]:
+                    dia[0] = ts
+                if ts > dia[1]:
+                    dia[1] = ts
+                dia[2] += 1
+
+    for did, uid, fk_eid, ts in qs.iterator(chunk_size=5000):
+        _sumar({fk_eid, mapa_ud_emp.get((did, uid))}, ts)
+    # Meses movidos al archivo histórico
+    for did, uid, usuario_id, ts in archivo.marcajes(d1, d2):
+        _sumar({mapa_udid_emp.get(usuario_id), mapa_ud_emp.get((did, uid))}, ts)
+    return out
+
+
+@metricas.medir("zk_reporte_calculo_segundos", reporte="lote_asistencia")
+def _rows_asistencia_lote(d1: date, d2: date, depto: str = "") -> List[dict]:
+    """Filas de ReporteEmpleadoPDFView para todos los empleados del lote."""
+    items = _empleados_lote(depto)
+    marcajes = _marcajes_lote(d1, d2, [it["id"] for it in items])
+    for it in items:
+        rows = []
+        for fecha, (ts_min, ts_max, n) in sorted(marcajes.get(it["id"], {}).items()):
+            entrada = timezone.localtime(ts_min)
+            salida = timezone.localtime(ts_max) if n >= 2 else None
+            total = (salida - entrada) if (salida and salida >= entrada) else timedelta(0)
+            rows.append({"fecha": fecha, "entrada": entrada, "salida": salida, "total": total})
+        it["rows"] = rows
+    return items
+
+
+@metricas.medir("zk_reporte_calculo_segundos", reporte="lote_ausencias")
+def _rows_ausencias_lote(d1: date, d2: date, depto: str = "") -> List[dict]:
+    """Filas de RepAusenciasEmpleadoPDFView para todos los empleados del lote."""
+    laborables_list, laborables_set = _laborables(d1, d2)
+    items = _empleados_lote(depto)
+    emp_ids = [it["id"] for it in items]
+    marcajes = _marcajes_lote(d1, d2, emp_ids)
+
+    # Bajas del rango en una consulta; a igualdad de día gana la de inicio más reciente (orden del modelo)
+    bajas_por_emp: Dict[int, list] = {}
+    for b in BajaAutorizada.objects.filter(empleado_id__in=emp_ids, fecha_inicio__lte=d2, fecha_fin__gte=d1).order_by("-fecha_inicio"):
+        bajas_por_emp.setdefault(b.empleado_id, []).append(b)
+
+    for it in items:
+        presentes = {f for f in marcajes.get(it["id"], {}) if f in laborables_set}
+        bajas = bajas_por_emp.get(it["id"], [])
+        rows = []
+        for f in laborables_list:
+            if f in presentes:
+                continue
+            baja = next((b for b in bajas if b.fecha_inicio <= f <= b.fecha_fin), None)
+            rows.append({
+                "fecha": f,
+                "estado": f"Baja Autorizada: {baja.get_tipo_display()}" if baja else "Sin marcaje"
+            })
+        it["rows"] = rows
+        it["total_laborables"] = len(laborables_list)
+    return items
+
+
+class LoteEmpleadosFormView(LoginRequiredMixin, StaffOnlyMixin, View):
+    template_name = "reportes/lote_empleados_form.html"
+
+    def get(self, request):
+        d1, d2 = _parse_rango_request(request, "inicio", "fin")
+        ctx = {
+            "inicio": d1,
+            "fin": d2,
+            "departamentos": dimensiones.departamentos(),
+        }
+        return render(request, self.template_name, ctx)
+
+
+class LoteEmpleadosExportView(LoginRequiredMixin, StaffOnlyMixin, View):
+    """
+    Reportes individuales (asistencia o ausencias) de un departamento o de todos los empleados activos.
+    - tipo: asistencia | ausencias
+    - formato: zip (un PDF por trabajador, generados en paralelo) | pdf (un único PDF con marcadores)
+    """
+    http_method_names = ["get", "head"]
+
+    def _parse_params(self, request):
+        """(d1, d2, tipo, formato, depto, error): error es la respuesta 400 si algo no es válido."""
+        d1, d2 = _parse_rango_request(request, "inicio", "fin")
+        tipo = (request.GET.get("tipo") or "asistencia").strip()
+        formato = (request.GET.get("formato") or "zip").strip()
+        depto = (request.GET.get("departamento") or "").strip()
+        error = None
+        if d1 > d2:
+            error = HttpResponseBadRequest("Rango inválido.")
+        elif tipo not in {"asistencia", "ausencias"} or formato not in {"zip", "pdf"}:
+            error = HttpResponseBadRequest("Parámetros inválidos.")
+        return d1, d2, tipo, formato, depto, error
+
+    def head(self, request, *args, **kwargs):
+        # Mismas validaciones y cabeceras que get(), sin calcular filas ni generar PDFs
+        d1, d2, tipo, formato, depto, error = self._parse_params(request)
+        if error:
+            return error
+        if not _empleados_lote(depto):
+            return HttpResponseBadRequest("No hay empleados activos para el filtro seleccionado.")
+        resp = HttpResponse(content_type="application/pdf" if formato == "pdf" else "application/zip")
+        resp["Content-Disposition"] = disposicion_lote(tipo, d1, formato)
+        return resp
+
+    def get(self, request):
+        d1, d2, tipo, formato, depto, error = self._parse_params(request)
+        if error:
+            return error
+
+        if tipo == "ausencias":
+            items = _rows_ausencias_lote(d1, d2, depto)
+        else:
+            items = _rows_asistencia_lote(d1, d2, depto)
+        if not items:
+            return HttpResponseBadRequest("No hay empleados activos para el filtro seleccionado.")
+
+        if formato == "pdf":
+            return build_pdf_lote_combinado(request, d1, d2, tipo, items)
+        return respuesta_zip_lote(request, tipo, d1, d2, items)
+
+
 # ======================================================================================
 # Nómina: Cálculo Salarial
 # ======================================================================================
@@ -1524,10 +1708,12 @@ class NominaCalculoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
     5) Neto = SalarioBase - Descuento.
     """
     http_method_names = ["get", "head"]
+    formato = "pdf"
 
     def head(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
 
+    @metricas.medir("zk_reporte_calculo_segundos", reporte="nomina_calculo")
     def _compute_nomina(self, d1: date, d2: date) -> List[dict]:
         laborables_list, laborables_set = _laborables(d1, d2)
         total_laborables = len(laborables_list)
@@ -1541,7 +1727,7 @@ class NominaCalculoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         
         # 2) Presencia en el rango
         presentes_qs = (
-            AsistenciaCruda.objects.filter(ts__date__gte=d1, ts__date__lte=d2)
+            AsistenciaCruda.objects.filter(_ts_rango(d1, d2))
             .values("usuario__empleado_id", "dispositivo_id", "user_id", "ts__date")
             .distinct()
         )
@@ -1605,9 +1791,7 @@ class NominaCalculoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
                 "neto": neto,
             })
         
-        print(f"[DEBUG] Computed rows: {len(rows)}")
-        for r in rows:
-            print(f" -> Emp: {r['nombre']} (ID {r['id']}) | Base: {r['salario_base']} | Aus: {r['ausencias']} | Desc: {r['descuento']} | Neto: {r['neto']}")
+        logger.debug("Nómina %s..%s: %s filas", d1, d2, len(rows))
 
         return sorted(rows, key=lambda x: x["nombre"].lower())
 
@@ -1619,6 +1803,8 @@ class NominaCalculoPDFView(LoginRequiredMixin, StaffOnlyMixin, View):
         if d1 > d2:
             return HttpResponseBadRequest("Rango inválido")
         rows = self._compute_nomina(d1, d2)
+        if self.formato == "xlsx":
+            return build_xlsx_nomina_calculo(d1, d2, rows)
         return self._build_pdf(request, d1, d2, rows)
 
 from .models import NominaPeriodo, NominaEmpleado
@@ -1,22 +1,169 @@
-from waitress import serve
-from zkmanager.wsgi import application
+"""
+Production launcher: N Waitress worker processes + one supervised scheduler.
+
+- The listening socket is opened once here and handed to every web worker, so
+  the kernel spreads connections across processes (one GIL per worker).
+- The scheduler (manage.py run_sync_scheduler) runs as a child process and is
+  restarted with backoff if it dies.
+- Crashed web workers are restarted too.
+- SIGINT/SIGTERM (Ctrl+C) stop everything gracefully: the scheduler gets
+  SIGINT so it can shut down its jobs, workers get terminated, and anything
+  still alive after SHUTDOWN_TIMEOUT is killed.
+
+Environment:
+  PORT           listening port (8000)
+  WEB_WORKERS    web processes (default: 2)
+  DB_POOL_WEB    threads per web process (see zkmanager/conexiones.py)
+  DB_MAX_CONNECTIONS
+                 PostgreSQL max_connections (100); the startup log compares
+                 the total connection budget against it
+  RUN_SCHEDULER  set to False to run only the web workers
+"""
+import multiprocessing
 import os
+import signal
+import socket
 import subprocess
 import sys
+import time
+
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+SHUTDOWN_TIMEOUT = 10
+RESTART_BACKOFF_MAX = 60
+
+
+def serve_worker(sock, threads):
+    """Entry point of each web worker process."""
+    from waitress import serve
+    from zkmanager.wsgi import application
+
+    # Let the supervisor decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    serve(application, sockets=[sock], threads=threads, ident="SGAsistencia")
+
+
 def start_scheduler():
     """Starts the Django APScheduler in the background."""
     print("Starting background scheduler...")
     # Use sys.executable to ensure we use the same Python environment
-    subprocess.Popen([sys.executable, "manage.py", "run_sync_scheduler"])
+    return subprocess.Popen([sys.executable, "manage.py", "run_sync_scheduler"])
+
+
+class Supervisor:
+    def __init__(self, port, workers, threads, run_scheduler=True):
+        self.port = port
+        self.n_workers = workers
+        self.threads = threads
+        self.run_scheduler = run_scheduler
+        self.ctx = multiprocessing.get_context("spawn")
+        self.sock = None
+        self.workers = []
+        self.scheduler = None
+        self.scheduler_backoff = 1
+        self.scheduler_restart_at = 0.0
+        self.stopping = False
+
+    def _start_worker(self, i):
+        # Not a daemon: daemonic processes cannot start children, and the batch PDF
+        # export renders in a process pool. shutdown() terminates/joins/kills them.
+        p = self.ctx.Process(target=serve_worker, args=(self.sock, self.threads), name=f"web-{i}")
+        p.start()
+        return p
+
+    def start(self):
+        self.sock = socket.create_server(("0.0.0.0", self.port), backlog=1024)
+        print(f"Starting {self.n_workers} Waitress workers x {self.threads} threads on http://0.0.0.0:{self.port}")
+        self.workers = [self._start_worker(i) for i in range(self.n_workers)]
+        if self.run_scheduler:
+            self.scheduler = start_scheduler()
+
+    def _check_workers(self):
+        for i, p in enumerate(self.workers):
+            if not p.is_alive():
+                print(f"Web worker {p.name} exited with code {p.exitcode}; restarting.")
+                self.workers[i] = self._start_worker(i)
+
+    def _check_scheduler(self):
+        if not self.run_scheduler:
+            return
+        now = time.monotonic()
+        if self.scheduler is not None:
+            code = self.scheduler.poll()
+            if code is None:
+                # Healthy for a while: reset the backoff
+                if now - self.scheduler_restart_at > RESTART_BACKOFF_MAX:
+                    self.scheduler_backoff = 1
+                return
+            print(f"Scheduler exited with code {code}; restarting in {self.scheduler_backoff}s.")
+            self.scheduler = None
+            self.scheduler_restart_at = now + self.scheduler_backoff
+            self.scheduler_backoff = min(self.scheduler_backoff * 2, RESTART_BACKOFF_MAX)
+        elif now >= self.scheduler_restart_at:
+            self.scheduler = start_scheduler()
+            self.scheduler_restart_at = now
+
+    def run(self):
+        self.start()
+        while not self.stopping:
+            time.sleep(1)
+            if not self.stopping:
+                self._check_workers()
+                self._check_scheduler()
+        self.shutdown()
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def shutdown(self):
+        print("Shutting down...")
+        if self.scheduler is not None and self.scheduler.poll() is None:
+            # run_sync_scheduler stops its jobs cleanly on KeyboardInterrupt
+            if os.name == "nt":
+                self.scheduler.terminate()
+            else:
+                self.scheduler.send_signal(signal.SIGINT)
+        for p in self.workers:
+            p.terminate()
+
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for p in self.workers:
+            p.join(max(0, deadline - time.monotonic()))
+            if p.is_alive():
+                p.kill()
+        if self.scheduler is not None:
+            try:
+                self.scheduler.wait(max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                self.scheduler.kill()
+        self.sock.close()
+        print("Stopped.")
+
 
 if __name__ == '__main__':
-    start_scheduler()
-    
-    port = os.getenv('PORT', '8000')
-    print(f"Starting Waitress server on http://0.0.0.0:{port}")
-    serve(application, host='0.0.0.0', port=port)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "zkmanager.settings")
+    from django.conf import settings
+
+    port = int(os.getenv('PORT', '8000'))
+    total = settings.DB_CONEXIONES_TOTALES
+    print(
+        f"DB connection budget: {settings.WEB_WORKERS} web x {settings.DB_POOL_WEB}"
+        f" + scheduler {settings.DB_POOL_SCHEDULER} + capture {settings.DB_POOL_SCHEDULER + 1}"
+        f" = {total} (max_connections {settings.DB_MAX_CONNECTIONS})"
+    )
+    if total > settings.DB_MAX_CONNECTIONS:
+        print("WARNING: the connection budget exceeds DB_MAX_CONNECTIONS; "
+              "lower WEB_WORKERS or DB_POOL_WEB.")
+    supervisor = Supervisor(
+        port,
+        settings.WEB_WORKERS,
+        # Un hilo por conexión persistente a la BD (DB_POOL_WEB, ver zkmanager/conexiones.py)
+        threads=settings.DB_POOL_WEB,
+        run_scheduler=os.getenv('RUN_SCHEDULER', 'True') == 'True',
+    )
+    signal.signal(signal.SIGINT, supervisor.stop)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    supervisor.run()
@@ -1,45 +1,53 @@
-
 import os
 import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "zkmanager.settings")
 django.setup()
 
-from empleados.views import _siguiente_user_id
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import get_runner
+
+from empleados import user_ids
+from empleados.models import Empleado, SecuenciaUserId, UserIdLiberado
 from dispositivos.models import UsuarioDispositivo, Dispositivo
-from empleados.models import Empleado
-
-def test_id_generation():
-    print("--- Testing ID Generation ---")
-    
-    # 1. Get next ID
-    next_id = _siguiente_user_id()
-    print(f"Next available ID: {next_id}")
-    
-    # 2. Simulate ID usage
-    # If next_id is '200', let's say we have '200' used in Empleados but not devices
-    # We can't easily create dummy data without messing up DB, so we just check logic.
-    
-    # Let's perform a dry run matching the logic
-    used_ids = set(UsuarioDispositivo.objects.values_list('user_id', flat=True))
-    used_ids.update(Empleado.objects.exclude(user_id="").values_list('user_id', flat=True))
-    
-    print(f"Used IDs in DB: {sorted(list(used_ids))}")
-    
-    if next_id in used_ids:
-        print("[!] FAIL: Generated ID is already in use!")
-    else:
-        print("[OK] Generated ID is unique.")
-        
-    # Check strict sequence
-    base = 200
-    while str(base) in used_ids:
-        base += 10
-        
-    if str(base) == next_id:
-        print(f"[OK] ID {next_id} is the correct next sequence number.")
-    else:
-        print(f"[!] FAIL: Expected {base}, got {next_id}")
+
+
+class IdGenerationTests(TestCase):
+    """reservar() sobre la BD de pruebas: cada test se revierte y no consume IDs reales."""
+
+    def setUp(self):
+        disp = Dispositivo.objects.create(nombre="D1", ip="10.0.0.1")
+        UsuarioDispositivo.objects.create(dispositivo=disp, user_id="200")
+        Empleado.objects.create(numero="E1", nombre="Uno", apellido="Prueba", doc_id="E1", user_id="220")
+
+    def test_id_generation(self):
+        # Sin secuencia: arranca tras el mayor ID usado y deja el hueco 210 como reutilizable
+        SecuenciaUserId.objects.all().delete()
+        UserIdLiberado.objects.all().delete()
+        (primero,) = user_ids.reservar(1)
+        self.assertEqual(primero, "230")
+        self.assertEqual(SecuenciaUserId.objects.get(pk=1).siguiente, 240)
+
+        # Los liberados se entregan antes que la secuencia, que no avanza
+        UserIdLiberado.objects.create(user_id=210)
+        self.assertEqual(user_ids.reservar(1), ["210"])
+        self.assertFalse(UserIdLiberado.objects.exists())
+        self.assertEqual(SecuenciaUserId.objects.get(pk=1).siguiente, 240)
+
+        # Un ID de la secuencia ya usado a mano se salta
+        Empleado.objects.create(numero="E2", nombre="Dos", apellido="Prueba", doc_id="E2", user_id="240")
+        self.assertEqual(user_ids.reservar(2), ["250", "260"])
+        self.assertEqual(SecuenciaUserId.objects.get(pk=1).siguiente, 270)
+
+        usados = set(UsuarioDispositivo.objects.values_list("user_id", flat=True))
+        usados.update(Empleado.objects.exclude(user_id="").values_list("user_id", flat=True))
+        for valor in (primero, "210", "250", "260"):
+            self.assertTrue(user_ids.en_serie(valor))
+            self.assertNotIn(valor, usados)
+
 
 if __name__ == "__main__":
-    test_id_generation()
+    # Crea y destruye su propia BD de pruebas; no toca la de producción
+    fallos = get_runner(settings)().run_tests(["test_id_gen"])
+    raise SystemExit(bool(fallos))
@@ -0,0 +1,33 @@
+"""
+Backend PostgreSQL de Django con contadores de conexión (ver zkmanager/conexiones.py).
+
+Mide cuánto tarda cada obtención de conexión (apertura TCP + autenticación, o
+espera en el pool si está activo) y cuenta los fallos y las comprobaciones de
+salud (CONN_HEALTH_CHECKS) que descartan una conexión persistente.
+"""
+import time
+
+from django.db.backends.postgresql import base
+
+from zkmanager import conexiones
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        inicio = time.perf_counter()
+        try:
+            conn = super().get_new_connection(conn_params)
+        except Exception:
+            conexiones.registrar_obtencion(time.perf_counter() - inicio, ok=False)
+            raise
+        conexiones.registrar_obtencion(time.perf_counter() - inicio, ok=True)
+        return conn
+
+    def is_usable(self):
+        usable = super().is_usable()
+        conexiones.registrar_comprobacion(usable)
+        return usable
+
+    def _close(self):
+        conexiones.registrar_cierre()
+        return super()._close()
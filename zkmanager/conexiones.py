@@ -0,0 +1,79 @@
+"""
+Estadísticas de las conexiones a la base de datos de este proceso.
+
+En PostgreSQL las conexiones son persistentes (CONN_MAX_AGE) con comprobación
+de salud antes de reutilizarlas (CONN_HEALTH_CHECKS). Cada hilo del servidor o
+del scheduler conserva la suya, así que el número de hilos (DB_POOL_WEB,
+DB_POOL_SCHEDULER) limita las conexiones de cada proceso; la captura en vivo
+usa el tamaño del scheduler más una para el volcado. Con psycopg 3 y
+DB_POOL=True se usa además el pool nativo de Django con esos mismos tamaños
+(DB_POOL_MAX).
+
+El backend zkmanager.backends.postgresql alimenta los contadores. Los de
+este proceso se consultan en /estado/conexiones/ (web) y en el log del
+scheduler; como con varios procesos web cada petición la atiende uno
+cualquiera, también se publican en las métricas (zk_bd_*), que /metrics
+suma entre todos los procesos.
+"""
+from __future__ import annotations
+
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+from zkmanager import metricas
+
+_lock = threading.Lock()
+_stats = {
+    "obtenciones": 0,
+    "fallos": 0,
+    "espera_total_ms": 0.0,
+    "espera_max_ms": 0.0,
+    "comprobaciones_fallidas": 0,
+    "cierres": 0,
+}
+
+
+def registrar_obtencion(segundos: float, ok: bool):
+    ms = segundos * 1000
+    with _lock:
+        if ok:
+            _stats["obtenciones"] += 1
+        else:
+            _stats["fallos"] += 1
+        _stats["espera_total_ms"] += ms
+        _stats["espera_max_ms"] = max(_stats["espera_max_ms"], ms)
+    metricas.observar("zk_bd_obtencion_segundos", segundos, proceso=settings.PROCESO, resultado="ok" if ok else "error")
+
+
+def registrar_comprobacion(ok: bool):
+    if not ok:
+        with _lock:
+            _stats["comprobaciones_fallidas"] += 1
+        metricas.inc("zk_bd_comprobaciones_fallidas_total", proceso=settings.PROCESO)
+
+
+def registrar_cierre():
+    with _lock:
+        _stats["cierres"] += 1
+    metricas.inc("zk_bd_cierres_total", proceso=settings.PROCESO)
+
+
+def estadisticas() -> dict:
+    with _lock:
+        out = dict(_stats)
+    intentos = out["obtenciones"] + out["fallos"]
+    out["espera_media_ms"] = round(out["espera_total_ms"] / intentos, 2) if intentos else 0.0
+    out["espera_total_ms"] = round(out["espera_total_ms"], 2)
+    out["espera_max_ms"] = round(out["espera_max_ms"], 2)
+
+    db = settings.DATABASES["default"]
+    out["proceso"] = settings.PROCESO
+    out["hilos"] = settings.DB_POOL_MAX
+    out["conexiones_totales"] = settings.DB_CONEXIONES_TOTALES
+    out["conn_max_age"] = db.get("CONN_MAX_AGE", 0)
+    if "pool" in db.get("OPTIONS", {}):
+        pool = getattr(connections["default"], "pool", None)
+        out["pool"] = pool.get_stats() if pool is not None else {}
+    return out
@@ -0,0 +1,273 @@
+"""
+Registro de métricas (contadores, indicadores e histogramas) para la
+sincronización de biométricos y los reportes.
+
+El servidor web y el scheduler son procesos distintos. Cada uno acumula en
+memoria y escribe una instantánea JSON en METRICAS_DIR/<proceso>-<pid>.json:
+el scheduler al terminar cada sincronización, la captura en vivo en cada
+volcado y la web como mucho cada INTERVALO_ESCRITURA segundos.
+
+/metrics une los archivos y responde en formato de texto de Prometheus:
+- Contadores e histogramas se suman. Los de procesos ya terminados siguen
+  contando, así los totales no retroceden al reiniciar.
+- Los indicadores toman, serie a serie, el valor fijado más recientemente
+  (cada instantánea guarda cuándo se fijó cada uno).
+- El proceso que responde usa su estado en memoria en lugar de su archivo.
+- zk_ingesta_retraso_segundos se calcula en cada consulta a partir del
+  último marcaje recibido de cada terminal.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+
+INTERVALO_ESCRITURA = 15
+RETENCION_ARCHIVOS = 30 * 24 * 3600
+
+_SEGUNDOS_SYNC = (1, 2, 5, 10, 30, 60, 120, 300, 600)
+_SEGUNDOS_BLOQUEO = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+_SEGUNDOS_REPORTE = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_SEGUNDOS_CONEXION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# nombre: (tipo, ayuda, límites del histograma)
+DEFINICIONES = {
+    "zk_sync_duracion_segundos": ("histogram", "Duración de la sincronización de un dispositivo.", _SEGUNDOS_SYNC),
+    "zk_sync_bloqueo_segundos": ("histogram", "Tiempo con el terminal deshabilitado durante la sincronización.", _SEGUNDOS_BLOQUEO),
+    "zk_sync_total": ("counter", "Sincronizaciones de dispositivo por resultado (ok, error, sin_conexion).", None),
+    "zk_sync_fallos_conexion_total": ("counter", "Intentos de conexión fallidos con un dispositivo.", None),
+    "zk_sync_registros_leidos_total": ("counter", "Marcajes leídos del dispositivo.", None),
+    "zk_sync_registros_insertados_total": ("counter", "Marcajes nuevos guardados en la base de datos.", None),
+    "zk_sync_usuarios_leidos_total": ("counter", "Usuarios leídos del dispositivo.", None),
+    "zk_sync_omitidos_total": ("counter", "Descargas de usuarios o marcajes omitidas porque los contadores del terminal no cambiaron.", None),
+    "zk_transferencia_reintentos_total": ("counter", "Bloques de una descarga del buffer del terminal que fallaron y se pidieron de nuevo.", None),
+    "zk_transferencia_bloque_bytes": ("gauge", "Tamaño de bloque con mejor rendimiento en la última descarga del dispositivo.", None),
+    "zk_sync_ultimo_ok_timestamp": ("gauge", "Fin de la última sincronización correcta (epoch).", None),
+    "zk_ingesta_ultimo_marcaje_timestamp": ("gauge", "Hora del marcaje más reciente leído del dispositivo (epoch).", None),
+    "zk_captura_conectado": ("gauge", "1 si hay una sesión de captura en vivo abierta con el dispositivo.", None),
+    "zk_captura_eventos_total": ("counter", "Marcajes recibidos por captura en vivo.", None),
+    "zk_captura_insertados_total": ("counter", "Marcajes de la captura en vivo guardados en la base de datos.", None),
+    "zk_captura_reconexiones_total": ("counter", "Sesiones de captura en vivo interrumpidas o que no se pudieron abrir.", None),
+    "zk_captura_recuperaciones_total": ("counter", "Descargas incrementales tras un hueco en la captura en vivo.", None),
+    "zk_adms_peticiones_total": ("counter", "Peticiones ADMS (iclock) de un dispositivo por tipo.", None),
+    "zk_adms_registros_recibidos_total": ("counter", "Marcajes recibidos por ADMS y encolados.", None),
+    "zk_adms_insertados_total": ("counter", "Marcajes recibidos por ADMS guardados en la base de datos.", None),
+    "zk_reporte_calculo_segundos": ("histogram", "Tiempo de cálculo de los datos de un reporte.", _SEGUNDOS_REPORTE),
+    "zk_reporte_render_segundos": ("histogram", "Tiempo de generación del PDF/XLSX de un reporte.", _SEGUNDOS_REPORTE),
+    "zk_bd_obtencion_segundos": ("histogram", "Tiempo para obtener una conexión a la BD por proceso y resultado (ok, error).", _SEGUNDOS_CONEXION),
+    "zk_bd_comprobaciones_fallidas_total": ("counter", "Conexiones persistentes descartadas por la comprobación de salud.", None),
+    "zk_bd_cierres_total": ("counter", "Conexiones a la BD cerradas.", None),
+}
+
+_lock = threading.Lock()
+_contadores: Dict[Tuple[str, tuple], float] = {}
+_indicadores: Dict[Tuple[str, tuple], Tuple[float, float]] = {}  # (valor, epoch en que se fijó)
+_histogramas: Dict[Tuple[str, tuple], list] = {}  # [cuentas por límite (+Inf al final), suma, n]
+_ultima_escritura = 0.0
+
+
+def _clave(nombre: str, etiquetas: dict) -> Tuple[str, tuple]:
+    if nombre not in DEFINICIONES:
+        raise KeyError(f"Métrica no definida: {nombre}")
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+# --------------------------------------------------------------------------------------
+# Registro
+# --------------------------------------------------------------------------------------
+def inc(nombre: str, valor: float = 1, **etiquetas):
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+    _guardar_si_toca()
+
+
+def fijar(nombre: str, valor: float, **etiquetas):
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _indicadores[clave] = (valor, time.time())
+    _guardar_si_toca()
+
+
+def observar(nombre: str, valor: float, **etiquetas):
+    clave = _clave(nombre, etiquetas)
+    limites = DEFINICIONES[nombre][2]
+    with _lock:
+        h = _histogramas.get(clave)
+        if h is None:
+            h = _histogramas[clave] = [[0] * (len(limites) + 1), 0.0, 0]
+        for i, limite in enumerate(limites):
+            if valor <= limite:
+                h[0][i] += 1
+                break
+        else:
+            h[0][-1] += 1
+        h[1] += valor
+        h[2] += 1
+    _guardar_si_toca()
+
+
+class medir(ContextDecorator):
+    """Observa la duración del bloque o función en el histograma `nombre`."""
+
+    def __init__(self, nombre: str, **etiquetas):
+        self.nombre, self.etiquetas = nombre, etiquetas
+
+    def _recreate_cm(self):
+        # Como decorador, cada llamada usa su propia instancia (vistas en varios hilos)
+        return medir(self.nombre, **self.etiquetas)
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observar(self.nombre, time.perf_counter() - self._inicio, **self.etiquetas)
+        return False
+
+
+def totales(nombre: str) -> Dict[tuple, Tuple[float, int]]:
+    """(suma, observaciones) de cada serie del histograma `nombre` en este proceso."""
+    with _lock:
+        return {e: (h[1], h[2]) for (n, e), h in _histogramas.items() if n == nombre}
+
+
+# --------------------------------------------------------------------------------------
+# Instantáneas por proceso
+# --------------------------------------------------------------------------------------
+def _directorio() -> Path:
+    return Path(settings.METRICAS_DIR)
+
+
+def _instantanea() -> dict:
+    with _lock:
+        return {
+            "escrito": time.time(),
+            "contadores": [[n, dict(e), v] for (n, e), v in _contadores.items()],
+            "indicadores": [[n, dict(e), v, t] for (n, e), (v, t) in _indicadores.items()],
+            "histogramas": [[n, dict(e), list(h[0]), h[1], h[2]] for (n, e), h in _histogramas.items()],
+        }
+
+
+def guardar():
+    """Escribe la instantánea de este proceso (escritura atómica)."""
+    global _ultima_escritura
+    _ultima_escritura = time.monotonic()
+    directorio = _directorio()
+    directorio.mkdir(parents=True, exist_ok=True)
+    destino = _archivo_propio()
+    tmp = destino.with_suffix(".tmp")
+    tmp.write_text(json.dumps(_instantanea()), encoding="utf-8")
+    os.replace(tmp, destino)
+
+
+def _guardar_si_toca():
+    if time.monotonic() - _ultima_escritura >= INTERVALO_ESCRITURA:
+        try:
+            guardar()
+        except OSError:
+            pass  # las métricas nunca deben romper una petición
+
+
+def _archivo_propio() -> Path:
+    return _directorio() / f"{settings.PROCESO}-{os.getpid()}.json"
+
+
+def _leer_instantaneas() -> List[dict]:
+    # La de este proceso sale de memoria (su archivo puede estar atrasado) y sin reescribirlo
+    out = [_instantanea()]
+    propio = _archivo_propio()
+    limite = time.time() - RETENCION_ARCHIVOS
+    for ruta in _directorio().glob("*.json"):
+        if ruta == propio:
+            continue
+        try:
+            if ruta.stat().st_mtime < limite:
+                ruta.unlink()
+                continue
+            out.append(json.loads(ruta.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+# --------------------------------------------------------------------------------------
+# Exposición
+# --------------------------------------------------------------------------------------
+def _etiquetas_txt(etiquetas: Iterable[Tuple[str, str]]) -> str:
+    partes = []
+    for k, v in etiquetas:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+def exposicion() -> str:
+    contadores: Dict[Tuple[str, tuple], float] = {}
+    indicadores: Dict[Tuple[str, tuple], float] = {}
+    fijados: Dict[Tuple[str, tuple], float] = {}
+    histogramas: Dict[Tuple[str, tuple], list] = {}
+    for snap in _leer_instantaneas():
+        for n, e, v in snap.get("contadores", []):
+            if n in DEFINICIONES:
+                k = (n, tuple(sorted(e.items())))
+                contadores[k] = contadores.get(k, 0) + v
+        for n, e, v, *t in snap.get("indicadores", []):
+            if n in DEFINICIONES:
+                k = (n, tuple(sorted(e.items())))
+                # Instantáneas antiguas sin hora por serie: la de escritura del archivo
+                t = t[0] if t else snap.get("escrito", 0)
+                if t >= fijados.get(k, float("-inf")):
+                    indicadores[k], fijados[k] = v, t
+        for n, e, cuentas, suma, total in snap.get("histogramas", []):
+            if n not in DEFINICIONES or len(cuentas) != len(DEFINICIONES[n][2]) + 1:
+                continue
+            h = histogramas.setdefault((n, tuple(sorted(e.items()))), [[0] * len(cuentas), 0.0, 0])
+            h[0] = [a + b for a, b in zip(h[0], cuentas)]
+            h[1] += suma
+            h[2] += total
+
+    ahora = time.time()
+    retrasos = {
+        e: max(0.0, ahora - v) for (n, e), v in indicadores.items() if n == "zk_ingesta_ultimo_marcaje_timestamp"
+    }
+
+    lineas: List[str] = []
+    for nombre, (tipo, ayuda, limites) in DEFINICIONES.items():
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        if tipo == "counter":
+            for (n, e), v in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}{_etiquetas_txt(e)} {_num(v)}")
+        elif tipo == "gauge":
+            for (n, e), v in sorted(indicadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}{_etiquetas_txt(e)} {_num(v)}")
+        else:
+            for (n, e), (cuentas, suma, total) in sorted(histogramas.items()):
+                if n != nombre:
+                    continue
+                acumulado = 0
+                for limite, c in zip([*limites, "+Inf"], cuentas):
+                    acumulado += c
+                    le = limite if limite == "+Inf" else _num(limite)
+                    lineas.append(f"{nombre}_bucket{_etiquetas_txt([*e, ('le', le)])} {acumulado}")
+                lineas.append(f"{nombre}_sum{_etiquetas_txt(e)} {_num(suma)}")
+                lineas.append(f"{nombre}_count{_etiquetas_txt(e)} {total}")
+
+    lineas.append("# HELP zk_ingesta_retraso_segundos Segundos desde el último marcaje recibido de cada dispositivo.")
+    lineas.append("# TYPE zk_ingesta_retraso_segundos gauge")
+    for e, v in sorted(retrasos.items()):
+        lineas.append(f"zk_ingesta_retraso_segundos{_etiquetas_txt(e)} {_num(round(v, 1))}")
+    return "\n".join(lineas) + "\n"
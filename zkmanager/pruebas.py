@@ -0,0 +1,244 @@
+"""
+Presupuesto de consultas para los tests de las apps.
+
+PresupuestoConsultas recorre todas las rutas de un urls.py contra el conjunto
+sintético de dispositivos/sintetico.py generado a dos tamaños (empleados y
+días de marcajes) y falla si el número de consultas SQL de alguna vista
+cambia entre ambos: una vista cuyo coste en consultas crece con las filas es
+un N+1. Un caso también puede ser una función (p. ej. la sincronización
+programada, que no tiene URL). Las vistas que hablan con un dispositivo lo hacen contra un terminal
+de dispositivos/simulador.py con tantos usuarios y marcajes como el tamaño.
+
+Cada app define en su tests.py los casos (una o más peticiones por ruta) y
+las rutas que no se miden, con el motivo. Una ruta nueva sin caso hace fallar
+el test hasta que se añada.
+"""
+from __future__ import annotations
+
+import io
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from dispositivos import sintetico
+from dispositivos.models import Dispositivo, UsuarioDispositivo
+from dispositivos.simulador import Config, Simulador
+from empleados import dimensiones
+from empleados.models import BajaAutorizada, Candidato, Documento, Empleado
+
+# (empleados, días de marcajes): el segundo triplica filas de empleados y marcajes
+TAMANOS = ((4, 14), (12, 42))
+DISPOSITIVOS = 2
+HASTA = date(2025, 3, 28)
+_INSERT = re.compile(r'^INSERT\s+(?:OR\s+IGNORE\s+)?INTO\s+"?(\w+)"?', re.I)
+_VARIAS_FILAS = re.compile(r"\)\s*,\s*\(")
+
+
+class MetricasTemporales:
+    """Mixin para tests que guardan métricas: METRICAS_DIR en un directorio temporal."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._metricas = tempfile.mkdtemp(prefix="tests-metricas-")
+        cls._ajustes_metricas = override_settings(METRICAS_DIR=cls._metricas)
+        cls._ajustes_metricas.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._ajustes_metricas.disable()
+        shutil.rmtree(cls._metricas, ignore_errors=True)
+        super().tearDownClass()
+
+
+@dataclass
+class Caso:
+    ruta: str                 # nombre en urls.py (sin namespace)
+    url: str
+    metodo: str = "get"
+    datos: dict = field(default_factory=dict)
+    etiqueta: str = ""        # distingue varios casos de una misma ruta
+    funcion: Callable[[], object] | None = None   # en lugar de una petición (p. ej. un comando)
+
+    @property
+    def nombre(self) -> str:
+        return f"{self.ruta}:{self.etiqueta}" if self.etiqueta else self.ruta
+
+
+@dataclass
+class Datos:
+    """Lo que se generó para un tamaño: objetos de referencia para construir las URLs."""
+    d1: date
+    d2: date
+    empleados: int
+    empleado: Empleado
+    dispositivo: Dispositivo
+    terminales: List[Dispositivo]   # cada uno con su terminal simulado, sin datos en la base
+    usuario: UsuarioDispositivo
+    baja: BajaAutorizada
+    candidato: Candidato
+    documento: Documento
+
+
+def _jpeg() -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32), (200, 200, 200)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class PresupuestoConsultas:
+    """
+    Mixin para django.test.TestCase. Las subclases definen `urlpatterns`,
+    `EXCLUIDAS` ({ruta: motivo}) y `casos(datos)`; el test es
+    test_consultas_constantes.
+    """
+    urlpatterns: list = []
+    EXCLUIDAS: Dict[str, str] = {}
+
+    def casos(self, datos: Datos) -> List[Caso]:
+        raise NotImplementedError
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media = tempfile.mkdtemp(prefix="presupuesto-media-")
+        cls._ajustes = override_settings(
+            MEDIA_ROOT=cls._media,
+            RENDIMIENTO_ACTIVO=False,
+            METRICAS_DIR=cls._media,
+        )
+        cls._ajustes.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._ajustes.disable()
+        shutil.rmtree(cls._media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(User.objects.create_superuser("presupuesto", "p@example.com", "x"))
+        self._simuladores = []
+
+    def tearDown(self):
+        for s in self._simuladores:
+            s.detener()
+
+    # ---- Datos ----
+    def _generar(self, empleados: int, dias: int) -> Datos:
+        dimensiones.invalidar()
+        sintetico.limpiar()
+        Candidato.objects.all().delete()
+        d2 = HASTA
+        d1 = d2 - timedelta(days=dias - 1)
+        sintetico.generar(DISPOSITIVOS, empleados, dias / 365, hasta=d2)
+        # generar() los deja inactivos para que no los toque la sincronización; aquí no corre
+        Dispositivo.objects.filter(nombre__startswith=f"{sintetico.PREFIJO}-").update(activo=True)
+
+        empleado = (
+            Empleado.objects.filter(numero__startswith=f"{sintetico.PREFIJO}-")
+            .annotate(n=Count("bajas_autorizadas")).order_by("-n", "pk").first()
+        )
+        empleado.foto.save("foto.jpg", ContentFile(_jpeg()), save=True)
+        # Bajas, documentos y candidatos también crecen con el tamaño
+        BajaAutorizada.objects.bulk_create(
+            BajaAutorizada(empleado=empleado, fecha_inicio=d1 + timedelta(days=k), fecha_fin=d1 + timedelta(days=k + 1), tipo="PERM")
+            for k in range(0, dias, 7)
+        )
+        for i in range(empleados):
+            Documento.objects.create(
+                empleado=empleado, tipo="OTRO", descripcion=f"Documento {i}",
+                archivo=ContentFile(f"documento {i}".encode(), name=f"doc{i}.txt"),
+            )
+        candidatos = Candidato.objects.bulk_create(
+            Candidato(nombre=f"Cand{i}", apellido="Prueba", doc_id=f"CAND-{i}") for i in range(empleados)
+        )
+        documento = None
+        for i, cand in enumerate(candidatos):
+            documento = Documento.objects.create(
+                candidato=cand, tipo="CV", archivo=ContentFile(f"cv {i}".encode(), name=f"cv{i}.txt"),
+            )
+
+        terminales = []
+        for i in range(2):
+            nombre = f"{sintetico.PREFIJO}-SIM-TEST-{i + 1}"
+            sim = Simulador(
+                nombre, "127.0.0.1", 0,
+                Config(usuarios=empleados, registros=empleados * dias * 2, hasta=d2), protocolos=("tcp",),
+            ).iniciar()
+            self._simuladores.append(sim)
+            terminales.append(Dispositivo.objects.create(
+                nombre=nombre, ip="127.0.0.1", puerto=sim.puerto, omitir_ping=True, timeout=3,
+            ))
+        # Cada tamaño empieza con la caché de departamentos vacía (y sin restos de otro test)
+        dimensiones.invalidar()
+        return Datos(
+            d1=d1, d2=d2, empleados=empleados, empleado=empleado,
+            dispositivo=Dispositivo.objects.filter(nombre=f"{sintetico.PREFIJO}-01").get(),
+            terminales=terminales,
+            usuario=UsuarioDispositivo.objects.filter(empleado=empleado).first(),
+            baja=BajaAutorizada.objects.filter(empleado=empleado).first(),
+            candidato=candidatos[0],
+            documento=documento,
+        )
+
+    # ---- Medición ----
+    @staticmethod
+    def _contar(ctx: CaptureQueriesContext) -> int:
+        # Un bulk_create son INSERT de varias filas seguidos (y quizá uno final de una fila):
+        # cuántos hacen falta depende del límite de parámetros del motor (en SQLite ~100
+        # filas por lote), no de un N+1. Cada tanda cuenta como una consulta.
+        n, tanda = 0, None
+        for q in ctx.captured_queries:
+            m = _INSERT.match(q["sql"])
+            if m and m.group(1) == tanda:
+                continue
+            tanda = m.group(1) if m and _VARIAS_FILAS.search(q["sql"]) else None
+            n += 1
+        return n
+
+    def _medir(self, caso: Caso) -> tuple:
+        with CaptureQueriesContext(connection) as ctx:
+            if caso.funcion is not None:
+                caso.funcion()
+                estado = 200
+            else:
+                response = getattr(self.client, caso.metodo)(caso.url, caso.datos)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                    response.close()
+                estado = response.status_code
+        return self._contar(ctx), estado
+
+    def medir_tamano(self, empleados: int, dias: int) -> Dict[str, tuple]:
+        datos = self._generar(empleados, dias)
+        return {caso.nombre: self._medir(caso) for caso in self.casos(datos)}
+
+    def test_consultas_constantes(self):
+        resultados = [self.medir_tamano(*t) for t in TAMANOS]
+
+        cubiertas = {nombre.split(":")[0] for nombre in resultados[0]}
+        sin_caso = sorted(p.name for p in self.urlpatterns if p.name not in cubiertas | set(self.EXCLUIDAS))
+        self.assertEqual(sin_caso, [], "Rutas sin caso en el presupuesto de consultas")
+
+        errores = []
+        for nombre, (consultas, estado) in resultados[0].items():
+            consultas_g, estado_g = resultados[-1][nombre]
+            if estado >= 500 or estado_g >= 500:
+                errores.append(f"{nombre}: estado {estado}/{estado_g}")
+            elif consultas != consultas_g:
+                errores.append(f"{nombre}: {consultas} -> {consultas_g} consultas")
+        self.assertEqual(errores, [], "Vistas cuyas consultas crecen con los datos (N+1)")
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Tiempos por vista (ver reportes/rendimiento.py); después de WhiteNoise para no medir estáticos
+    'reportes.rendimiento.RendimientoMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # Zona horaria y localización
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +91,57 @@ else:
         }
     }
 
+# Conexiones a la base de datos (ver zkmanager/conexiones.py)
+# Cada proceso (servidor web o scheduler) tiene su propio tamaño de pool: es el
+# número de hilos que atienden peticiones o trabajos, y por tanto de conexiones.
+if 'run_sync_scheduler' in sys.argv:
+    PROCESO = 'scheduler'
+elif 'captura_en_vivo' in sys.argv:
+    PROCESO = 'captura'
+else:
+    PROCESO = 'web'
+DB_POOL_WEB = int(os.getenv('DB_POOL_WEB', '8'))
+DB_POOL_SCHEDULER = int(os.getenv('DB_POOL_SCHEDULER', '2'))
+# Procesos web de run_waitress.py: número fijo y pequeño, no uno por CPU, para que
+# el total de conexiones quepa en max_connections de PostgreSQL (100 por defecto)
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '2'))
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '100'))
+# Conexiones del despliegue completo: web, scheduler y captura_en_vivo
+DB_CONEXIONES_TOTALES = WEB_WORKERS * DB_POOL_WEB + DB_POOL_SCHEDULER + (DB_POOL_SCHEDULER + 1)
+# captura_en_vivo: hasta DB_POOL_SCHEDULER descargas de recuperación a la vez y el volcado del hilo principal
+DB_POOL_MAX = {
+    'web': DB_POOL_WEB,
+    'scheduler': DB_POOL_SCHEDULER,
+    'captura': DB_POOL_SCHEDULER + 1,
+}[PROCESO]
+
+if DB_ENGINE in ('django.db.backends.postgresql', 'django.db.backends.postgresql_psycopg2'):
+    _db = DATABASES['default']
+    # Mismo backend con contadores de conexión
+    _db['ENGINE'] = 'zkmanager.backends.postgresql'
+    _db['OPTIONS'] = {
+        'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+        # keepalives TCP: detecta antes los cortes de red en la LAN
+        'keepalives': 1,
+        'keepalives_idle': 60,
+        'keepalives_interval': 10,
+        'keepalives_count': 3,
+    }
+    if os.getenv('DB_POOL', 'False') == 'True':
+        # Pool nativo de Django (requiere psycopg 3 y psycopg-pool)
+        from psycopg_pool import ConnectionPool
+
+        _db['OPTIONS']['pool'] = {
+            'min_size': 1,
+            'max_size': DB_POOL_MAX,
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'check': ConnectionPool.check_connection,
+        }
+    else:
+        # Conexión persistente por hilo, comprobada antes de reutilizarla
+        _db['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+        _db['CONN_HEALTH_CHECKS'] = True
+
 # Validadores por defecto
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -118,6 +172,33 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Archivos subidos (documentos, fotos). Por defecto la raíz del proyecto, donde
+# ya estaban documentos/ y empleados/fotos/; se sirven con vistas protegidas.
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR))
+
+# Procesos para generar PDFs individuales por lote (0 = número de CPUs)
+REPORTES_LOTE_WORKERS = int(os.getenv('REPORTES_LOTE_WORKERS', '0'))
+
+# Medición de rendimiento por petición (admin > Rendimiento de vistas)
+RENDIMIENTO_ACTIVO = os.getenv('RENDIMIENTO_ACTIVO', 'True') == 'True'
+RENDIMIENTO_INTERVALO = int(os.getenv('RENDIMIENTO_INTERVALO', '30'))
+RENDIMIENTO_RETENCION_DIAS = int(os.getenv('RENDIMIENTO_RETENCION_DIAS', '7'))
+
+# Métricas de sincronización y reportes en /metrics (ver zkmanager/metricas.py).
+# Con METRICAS_TOKEN, el recolector se autentica con "Authorization: Bearer <token>".
+METRICAS_DIR = Path(os.getenv('METRICAS_DIR', BASE_DIR / 'metricas'))
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+
+# Sincronización completa programada (run_sync_scheduler). Con el servicio
+# captura_en_vivo en marcha solo recoge lo que se le escape; puede espaciarse.
+SYNC_INTERVALO_MINUTOS = int(os.getenv('SYNC_INTERVALO_MINUTOS', '60'))
+# Cada cuánto el scheduler guarda los envíos ADMS (/iclock/) recibidos por la web
+ADMS_VOLCADO_SEGUNDOS = int(os.getenv('ADMS_VOLCADO_SEGUNDOS', '5'))
+
+# Archivo histórico de marcajes (comando archivar_asistencias)
+ASISTENCIA_ARCHIVO_DIR = Path(os.getenv('ASISTENCIA_ARCHIVO_DIR', BASE_DIR / 'archivo_asistencias'))
+ASISTENCIA_RETENCION_MESES = int(os.getenv('ASISTENCIA_RETENCION_MESES', '12'))
+
 # Ruta de login para proteger /config/
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/dashboard/"
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth.views import LoginView
 from reportes.views import dashboard
-from .views import logout_now
+from dispositivos.views import iclock_cdata, iclock_devicecmd, iclock_getrequest
+from .views import estado_conexiones, logout_now, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -18,7 +19,13 @@ urlpatterns = [
     ),
 
     path("logout/", logout_now, name="logout"),
+    path("estado/conexiones/", estado_conexiones, name="estado_conexiones"),
+    path("metrics", metrics, name="metrics"),
     path("dashboard/", dashboard, name="dashboard"),
+    # Envíos ADMS de los terminales (rutas fijas del firmware, sin barra final)
+    path("iclock/cdata", iclock_cdata, name="iclock_cdata"),
+    path("iclock/getrequest", iclock_getrequest, name="iclock_getrequest"),
+    path("iclock/devicecmd", iclock_devicecmd, name="iclock_devicecmd"),
     path("config/", include(("dispositivos.urls","config"), namespace="config")),
     path("empleados/", include(("empleados.urls","empleados"), namespace="empleados")),
     path("reportes/", include("reportes.urls", namespace="reportes")),
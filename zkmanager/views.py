@@ -1,4 +1,9 @@
 from django.contrib.auth import logout
+from django.contrib.auth.decorators import login_required, user_passes_test
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import redirect
 from django.views.decorators.http import require_GET
 from datetime import datetime, timedelta
@@ -8,7 +13,9 @@ from django.core.paginator import Paginator
 from django.db.models import Min, Max, Count, Q
 from django.db.models.functions import TruncDate
 from dispositivos.models import AsistenciaCruda
+from empleados import busqueda
 from empleados.models import Empleado
+from . import conexiones, metricas
 
 
 
@@ -63,12 +70,7 @@ class ReporteAsistenciaGeneralView(View):
             base = base.filter(usuario__empleado_id=int(empleado_id))
 
         if q:
-            base = base.filter(
-                Q(usuario__empleado__nombre__icontains=q) |
-                Q(usuario__empleado__apellido__icontains=q) |
-                Q(usuario__empleado__numero__icontains=q) |
-                Q(usuario__empleado__doc_id__icontains=q)
-            )
+            base = base.filter(usuario__empleado_id__in=busqueda.ids_empleados(q))
 
         # Agregado por empleado + día
         agg = (base
@@ -128,6 +130,32 @@ class ReporteAsistenciaGeneralView(View):
 
 
 
+@login_required
+@user_passes_test(lambda u: u.is_staff or u.is_superuser)
+@require_GET
+def estado_conexiones(request):
+    """Contadores de conexiones a la BD de este proceso; el total de todos está en /metrics (zk_bd_*)."""
+    return JsonResponse(conexiones.estadisticas())
+
+
+def _token_metricas_valido(request) -> bool:
+    esperado = settings.METRICAS_TOKEN
+    if not esperado:
+        return False
+    auth = request.headers.get("Authorization", "")
+    recibido = auth[7:] if auth.startswith("Bearer ") else ""
+    return hmac.compare_digest(recibido.encode(), esperado.encode())
+
+
+@require_GET
+def metrics(request):
+    """Métricas en formato de texto de Prometheus. Acceso con METRICAS_TOKEN o sesión de staff."""
+    user = request.user
+    if not (_token_metricas_valido(request) or (user.is_authenticated and user.is_staff)):
+        return HttpResponseForbidden("Acceso denegado")
+    return HttpResponse(metricas.exposicion(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @require_GET
 def logout_now(request):
     logout(request)